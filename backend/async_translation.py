@@ -0,0 +1,185 @@
+"""
+Loop assíncrono das chamadas ao modelo
+
+Com TRANSLATION_ASYNC=1, os lotes deixam de ocupar uma thread cada
+enquanto esperam a API: todos rodam como tarefas de um único event loop
+por processo, numa thread própria, com o cliente assíncrono sobre um pool
+httpx compartilhado (HTTP/2 quando disponível). As threads de tradução
+só enviam lotes ao loop e recebem futures. O limite de requisições e
+tokens por minuto e o teto de requisições em voo valem para o processo
+inteiro; cancelar um future cancela a requisição correspondente.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Coroutine, Optional
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Caminho assíncrono ligado (1) ou threads com o cliente síncrono (0)
+TRANSLATION_ASYNC = os.getenv("TRANSLATION_ASYNC", "0") == "1"
+# Requisições ao modelo em voo por processo
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "32"))
+# Limites da conta no provedor (0 = sem limite local; o provedor ainda pode responder 429)
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "0"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "0"))
+
+class AsyncRateLimiter:
+    """
+    Baldes de requisições e tokens por minuto para as tarefas do loop
+
+    Quem chega primeiro é atendido primeiro: um lote grande esperando
+    tokens não é ultrapassado pelos pequenos. Um 429 pausa todos os envios
+    pelo tempo pedido pelo provedor.
+    """
+
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int):
+        """Aguarda vaga para uma requisição de ~tokens tokens"""
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+
+    def pause(self, seconds: float):
+        """Suspende novos envios (limite de taxa atingido no provedor)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class AsyncTranslationLoop:
+    """Event loop de um processo para as chamadas ao modelo, iniciado no primeiro uso"""
+
+    def __init__(self, max_in_flight: int = ASYNC_MAX_IN_FLIGHT, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM):
+        self.max_in_flight = max(1, max_in_flight)
+        self.rpm = rpm
+        self.tpm = tpm
+        self.limiter: Optional[AsyncRateLimiter] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self.limiter = AsyncRateLimiter(self.rpm, self.tpm)
+                    self._semaphore = asyncio.Semaphore(self.max_in_flight)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, daemon=True, name="translation-loop")
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                logger.info(f"🔄 Loop assíncrono de tradução iniciado (até {self.max_in_flight} requisições em voo)")
+            return self._loop
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """
+        Agenda a corrotina no loop; retorna um future para a thread que chamou
+
+        A tarefa herda o contexto de quem chamou (span atual do rastreamento).
+        future.cancel() cancela a tarefa.
+        """
+        loop = self._ensure_started()
+        context = contextvars.copy_context()
+        future: concurrent.futures.Future = concurrent.futures.Future()
+
+        def start():
+            if future.cancelled():
+                coro.close()
+                return
+            task = loop.create_task(coro, context=context)
+
+            def on_done(done: asyncio.Task):
+                if future.cancelled():
+                    return
+                if done.cancelled():
+                    future.cancel()
+                elif done.exception() is not None:
+                    future.set_exception(done.exception())
+                else:
+                    future.set_result(done.result())
+
+            task.add_done_callback(on_done)
+            future.add_done_callback(lambda f: f.cancelled() and loop.call_soon_threadsafe(task.cancel))
+
+        loop.call_soon_threadsafe(start)
+        return future
+
+    @asynccontextmanager
+    async def slot(self, tokens: int):
+        """Vaga para uma requisição: teto de requisições em voo e limite de taxa"""
+        async with self._semaphore:
+            await self.limiter.acquire(tokens)
+            metrics.add_gauge("translation_api_in_flight", 1)
+            try:
+                yield
+            finally:
+                metrics.add_gauge("translation_api_in_flight", -1)
+
+    def stop(self, timeout: float = 10.0):
+        """Cancela as tarefas pendentes, fecha as conexões e para o loop"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def shutdown():
+            from translation_backends import get_backend
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await get_backend().aclose()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Erro ao encerrar o loop assíncrono de tradução: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=timeout)
+        loop.close()
+
+# Instância global do loop assíncrono
+async_loop = AsyncTranslationLoop()
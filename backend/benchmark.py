@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos motores de tradução com documentos sintéticos
+
+Gera documentos de tamanho e forma controlados (prosa longa, DOCX com
+muitas tabelas e células mescladas, apresentação de 200 slides, planilha
+de 100 mil células), traduz cada um com os motores disponíveis usando o
+backend mock (sem rede) e mede tempo por etapa (parse, collect,
+translate, apply, save), pico de memória, requisições e tokens.
+
+Uso:
+    python benchmark.py                         # corpus completo
+    python benchmark.py --scale 0.1             # corpus reduzido
+    python benchmark.py --save base             # guarda benchmarks/base.json
+    python benchmark.py --compare base          # compara com a linha de base
+"""
+
+import os
+
+# Antes dos tradutores: backend local, sem memória de tradução entre execuções
+os.environ.setdefault("TRANSLATION_BACKEND", "mock")
+os.environ["TRANSLATION_MEMORY"] = "0"
+
+import argparse
+import json
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from docx import Document
+from openpyxl import Workbook
+from pptx import Presentation
+from pptx.util import Inches
+
+from translation_backends import MockBackend, set_backend
+from translator_core_pro import DocumentTranslator
+from translator_openai_official import translate_docx_multi
+
+BASELINE_DIR = Path(__file__).parent / "benchmarks"
+STAGES = ("parse", "collect", "translate", "apply", "save")
+
+WORDS = ("contrato parte cláusula pagamento prazo obrigação serviço entrega valor multa rescisão "
+         "cliente fornecedor documento anexo vigência garantia responsabilidade notificação acordo "
+         "termo condição direito dever execução").split()
+
+# ----- Corpus sintético -----
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def make_prose_docx(path: Path, scale: float, rng: random.Random):
+    """Prosa longa: parágrafos de várias frases, com alguns parágrafos repetidos (modelos)"""
+    doc = Document()
+    repeated = [_sentence(rng, 12) for _ in range(20)]
+    for i in range(int(2000 * scale) or 1):
+        if i % 10 == 0:
+            doc.add_heading(_sentence(rng, 5), level=2)
+        text = rng.choice(repeated) if i % 7 == 0 else " ".join(_sentence(rng, 15) for _ in range(4))
+        doc.add_paragraph(text)
+    doc.save(path)
+
+def make_tables_docx(path: Path, scale: float, rng: random.Random):
+    """DOCX com muitas tabelas, células mescladas e números"""
+    doc = Document()
+    for t in range(int(40 * scale) or 1):
+        doc.add_paragraph(f"Tabela {t + 1}: {_sentence(rng, 6)}")
+        table = doc.add_table(rows=20, cols=6)
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = str(rng.randint(1, 99999)) if c == 5 else _sentence(rng, 4)
+        # Mesclas horizontais e verticais
+        table.cell(0, 0).merge(table.cell(0, 2))
+        table.cell(2, 1).merge(table.cell(6, 1))
+        table.cell(10, 3).merge(table.cell(12, 4))
+    doc.save(path)
+
+def make_deck_pptx(path: Path, scale: float, rng: random.Random):
+    """Apresentação de 200 slides com título e corpo"""
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(int(200 * scale) or 1):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"{_sentence(rng, 4)} ({i + 1})"
+        slide.placeholders[1].text = "\n".join(_sentence(rng, 10) for _ in range(4))
+        box = slide.shapes.add_textbox(Inches(1), Inches(6), Inches(6), Inches(1))
+        box.text = _sentence(rng, 6)
+    prs.save(path)
+
+def make_workbook_xlsx(path: Path, scale: float, rng: random.Random):
+    """Planilha de 100 mil células (texto, números e rótulos repetidos)"""
+    wb = Workbook()
+    ws = wb.active
+    labels = [_sentence(rng, 2) for _ in range(50)]
+    rows = int(1000 * scale) or 1
+    for r in range(1, rows + 1):
+        for c in range(1, 101):
+            kind = (r * 101 + c) % 5
+            if kind == 0:
+                ws.cell(row=r, column=c, value=rng.randint(0, 10 ** 6))
+            elif kind in (1, 2):
+                ws.cell(row=r, column=c, value=rng.choice(labels))
+            else:
+                ws.cell(row=r, column=c, value=_sentence(rng, 3))
+    wb.save(path)
+
+CORPUS: Dict[str, tuple] = {
+    "prose_docx": (".docx", make_prose_docx),
+    "tables_docx": (".docx", make_tables_docx),
+    "deck_pptx": (".pptx", make_deck_pptx),
+    "workbook_xlsx": (".xlsx", make_workbook_xlsx),
+}
+
+# ----- Motores -----
+
+def run_docx_batch(input_path: Path, output_path: Path, target_lang: str, workdir: Path):
+    """Tradutor DOCX em lotes (o da fila)"""
+    results = translate_docx_multi(str(input_path), {target_lang: str(output_path)}, "pt",
+                                   checkpoint_paths={target_lang: str(workdir / "bench_runs.jsonl")})
+    result = results[target_lang]
+    return result.success, result.translated_segments, result.stage_times or {}
+
+def run_core(input_path: Path, output_path: Path, target_lang: str, workdir: Path):
+    """Tradutor por elemento (DOCX, PPTX, XLSX)"""
+    results = DocumentTranslator().translate_multi(str(input_path), {target_lang: str(output_path)}, "pt")
+    result = results[target_lang]
+    return result.success, result.original_elements, result.stage_times or {}
+
+ENGINES: Dict[str, tuple] = {
+    "docx_batch": ((".docx",), run_docx_batch),
+    "core": ((".docx", ".pptx", ".xlsx"), run_core),
+}
+
+# ----- Execução -----
+
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+def measure(engine: Callable, input_path: Path, workdir: Path, backend: MockBackend, trace_memory: bool) -> Dict:
+    """Executa um motor sobre um documento e coleta as métricas"""
+    output_path = workdir / f"out{input_path.suffix}"
+    backend.reset_stats()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        success, segments, stages = engine(input_path, output_path, "en", workdir)
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+        if trace_memory:
+            tracemalloc.stop()
+    usage = backend.stats()
+    return {
+        "success": success,
+        "segments": segments,
+        "total_s": round(elapsed, 4),
+        "stages_s": {stage: round(stages.get(stage, 0.0), 4) for stage in STAGES},
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "max_rss_mb": round(_max_rss_mb(), 1),
+        "requests": usage["requests"],
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "errors": usage["errors"],
+        "input_bytes": input_path.stat().st_size,
+    }
+
+def run_benchmark(scale: float, documents: List[str], engines: List[str], latency_s: float,
+                  error_rate: float, trace_memory: bool, seed: int) -> Dict:
+    backend = MockBackend(latency_s=latency_s, error_rate=error_rate, seed=str(seed))
+    set_backend(backend)
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        tmp = Path(tmp)
+        for doc_name in documents:
+            ext, generator = CORPUS[doc_name]
+            input_path = tmp / f"{doc_name}{ext}"
+            start = time.perf_counter()
+            generator(input_path, scale, random.Random(seed))
+            print(f"📄 {doc_name}: {input_path.stat().st_size / 1024:.0f}KB gerado em {time.perf_counter() - start:.1f}s")
+
+            for engine_name in engines:
+                formats, engine = ENGINES[engine_name]
+                if ext not in formats:
+                    continue
+                workdir = tmp / f"{doc_name}_{engine_name}"
+                workdir.mkdir()
+                metrics = measure(engine, input_path, workdir, backend, trace_memory)
+                results.append({"document": doc_name, "engine": engine_name, **metrics})
+                print_result(results[-1])
+
+    return {
+        "created_at": time.time(),
+        "scale": scale,
+        "latency_s": latency_s,
+        "error_rate": error_rate,
+        "trace_memory": trace_memory,
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+
+def print_result(r: Dict):
+    stages = " ".join(f"{s}={r['stages_s'][s]:.2f}" for s in STAGES)
+    status = "✅" if r["success"] else "❌"
+    print(f"  {status} {r['engine']:<10} {r['total_s']:>7.2f}s [{stages}] "
+          f"pico={r['peak_memory_mb']:.0f}MB req={r['requests']} "
+          f"tokens={r['prompt_tokens']}+{r['completion_tokens']} segmentos={r['segments']}")
+
+def compare(current: Dict, baseline: Dict):
+    """Diferença percentual de cada métrica em relação à linha de base"""
+    base = {(r["document"], r["engine"]): r for r in baseline["results"]}
+    print(f"\nComparação com a linha de base (escala {baseline['scale']}, latência {baseline['latency_s']}s):")
+    if (baseline["scale"], baseline["latency_s"]) != (current["scale"], current["latency_s"]):
+        print("  ⚠️ Escala ou latência diferentes; a comparação não é direta")
+    if baseline.get("trace_memory") != current["trace_memory"]:
+        print("  ⚠️ Rastreio de memória diferente (tracemalloc deixa os tempos mais lentos)")
+
+    def delta(new: float, old: float) -> str:
+        if not old:
+            return "   n/d"
+        return f"{(new - old) / old * 100:+6.1f}%"
+
+    for r in current["results"]:
+        old = base.get((r["document"], r["engine"]))
+        if not old:
+            print(f"  {r['document']}/{r['engine']}: sem linha de base")
+            continue
+        print(f"  {r['document']}/{r['engine']}: total {delta(r['total_s'], old['total_s'])} "
+              + " ".join(f"{s} {delta(r['stages_s'][s], old['stages_s'][s])}" for s in STAGES)
+              + f" memória {delta(r['peak_memory_mb'], old['peak_memory_mb'])}"
+              + f" req {delta(r['requests'], old['requests'])}"
+              + f" tokens {delta(r['prompt_tokens'] + r['completion_tokens'], old['prompt_tokens'] + old['completion_tokens'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos motores de tradução (backend mock)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Fator de tamanho do corpus (1.0 = completo)")
+    parser.add_argument("--documents", default=",".join(CORPUS), help="Documentos, separados por vírgula")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Motores, separados por vírgula")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência do mock por requisição (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de requisições com erro no mock")
+    parser.add_argument("--no-memory", action="store_true", help="Sem tracemalloc (tempos sem o custo do rastreio)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="Guarda o resultado em benchmarks/<nome>.json")
+    parser.add_argument("--compare", help="Compara com benchmarks/<nome>.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    documents = [d.strip() for d in args.documents.split(",") if d.strip()]
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = [d for d in documents if d not in CORPUS] + [e for e in engines if e not in ENGINES]
+    if unknown:
+        parser.error(f"Desconhecidos: {', '.join(unknown)}")
+
+    baseline: Optional[Dict] = None
+    if args.compare:
+        baseline_path = BASELINE_DIR / f"{args.compare}.json"
+        if not baseline_path.exists():
+            parser.error(f"Linha de base não encontrada: {baseline_path}")
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+
+    report = run_benchmark(args.scale, documents, engines, args.latency, args.error_rate,
+                           not args.no_memory, args.seed)
+
+    if baseline:
+        compare(report, baseline)
+    if args.save:
+        BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+        path = BASELINE_DIR / f"{args.save}.json"
+        path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n💾 Linha de base salva em {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Cancelamento cooperativo de um job em processamento
+
+O worker perde o lease quando o heartbeat falha (outro worker pode ter
+reservado o job); a partir daí nada do que ele fizer vale. O evento de
+cancelamento segue o contexto como o UsageMeter: threads iniciadas com
+contextvars.copy_context() enxergam o mesmo evento, e os tradutores
+chamam check_cancelled() entre arquivos e entre lotes.
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+class JobCancelled(Exception):
+    """O job foi cancelado (lease perdido); o trabalho em andamento deve parar"""
+
+_current_cancel: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("job_cancel", default=None)
+
+@contextmanager
+def cancellable(event: Optional[threading.Event]):
+    """Associa o evento de cancelamento ao trabalho feito no bloco"""
+    token = _current_cancel.set(event)
+    try:
+        yield event
+    finally:
+        _current_cancel.reset(token)
+
+def check_cancelled():
+    """Levanta JobCancelled se o trabalho do contexto atual foi cancelado"""
+    event = _current_cancel.get()
+    if event is not None and event.is_set():
+        raise JobCancelled("Lease do job perdido; processamento interrompido")
@@ -5,9 +5,10 @@ Configurações centralizadas - Versão 2.0 Limpa
 
 import os
 import logging
+import importlib.util
 import openai as openai_pkg
 import httpx as httpx_pkg
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -22,9 +23,17 @@ DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1")
 MODEL_RAPIDO = os.getenv("MODEL_RAPIDO", "o4-mini")
 BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "80000"))
 MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "300"))
+# Token dos endpoints administrativos (relatório de uso); vazio = endpoints desligados
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Pool de conexões do cliente assíncrono (conexões mantidas abertas entre requisições)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "600"))
+# HTTP/2 exige o pacote h2 (httpx[http2]); sem ele, HTTP/1.1 com keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 # Cliente global único
 _openai_client = None
+_async_openai_client = None
 
 def get_openai_client():
     """Retorna cliente OpenAI inicializado"""
@@ -42,7 +51,7 @@ def get_openai_client():
             # Se precisar de proxy, usar http_client em vez de proxies
             proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("HTTP_PROXY")
             if proxy:
-                http_client = httpx.Client(proxies=proxy, timeout=60.0)
+                http_client = httpx_pkg.Client(proxy=proxy, timeout=60.0)
                 config["http_client"] = http_client
             
             # Filtrar apenas argumentos permitidos
@@ -57,6 +66,38 @@ def get_openai_client():
     
     return _openai_client
 
+def get_async_openai_client():
+    """
+    Cliente OpenAI assíncrono sobre um pool httpx compartilhado
+
+    Fica preso ao event loop em que é usado pela primeira vez: use só a
+    partir do loop de async_translation.
+    """
+    global _async_openai_client
+    
+    if _async_openai_client is None and OPENAI_API_KEY:
+        proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("HTTP_PROXY")
+        limits = httpx_pkg.Limits(max_connections=OPENAI_MAX_CONNECTIONS,
+                                  max_keepalive_connections=OPENAI_MAX_CONNECTIONS)
+        http_client = httpx_pkg.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=limits,
+            timeout=httpx_pkg.Timeout(OPENAI_TIMEOUT_S, connect=10.0),
+            proxy=proxy or None
+        )
+        _async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+        logger.info(f"✅ Cliente OpenAI assíncrono inicializado (HTTP/{'2' if HTTP2_AVAILABLE else '1.1'}, "
+                    f"até {OPENAI_MAX_CONNECTIONS} conexões)")
+    
+    return _async_openai_client
+
+async def close_async_openai_client():
+    """Fecha o pool do cliente assíncrono (no encerramento do loop)"""
+    global _async_openai_client
+    if _async_openai_client is not None:
+        client, _async_openai_client = _async_openai_client, None
+        await client.close()
+
 def validate_openai_config():
     """Valida configuração OpenAI"""
     logger.info("🔍 Validando configuração OpenAI...")
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Estatísticas rápidas de documentos OOXML (DOCX, PPTX, XLSX)
+
+Lê apenas as partes XML com texto dentro do pacote zip, sem carregar o
+documento com python-docx/python-pptx/openpyxl, para estimar o volume de
+tokens de um job já no momento do envio.
+"""
+
+import math
+import re
+import zipfile
+import logging
+from html import unescape
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Partes do pacote que contêm texto traduzível, por formato
+TEXT_PARTS = {
+    '.docx': re.compile(r'^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$'),
+    '.pptx': re.compile(r'^ppt/(slides/slide\d+|notesSlides/notesSlide\d+)\.xml$'),
+    '.xlsx': re.compile(r'^xl/(sharedStrings|worksheets/sheet\d+)\.xml$'),
+}
+
+# Nós de texto por formato (w:t no Word, a:t no PowerPoint, t no Excel)
+TEXT_NODES = {
+    '.docx': re.compile(r'<w:t(?:\s[^>]*)?>([^<]*)</w:t>'),
+    '.pptx': re.compile(r'<a:t(?:\s[^>]*)?>([^<]*)</a:t>'),
+    '.xlsx': re.compile(r'<(?:\w+:)?t(?:\s[^>]*)?>([^<]*)</(?:\w+:)?t>'),
+}
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa conservadora: ~4 chars = 1 token"""
+    return max(1, math.ceil(len(text) / 4))
+
+def estimate_document_tokens(path: str) -> Dict[str, int]:
+    """
+    Estima segmentos e tokens de um documento OOXML.
+
+    Retorna {"segments": n, "tokens": t, "chars": c}. Em caso de erro de
+    leitura, estima pelo tamanho do arquivo para não bloquear o envio.
+    """
+    ext = Path(path).suffix.lower()
+    stats = {"segments": 0, "tokens": 0, "chars": 0}
+
+    parts = TEXT_PARTS.get(ext)
+    nodes = TEXT_NODES.get(ext)
+    if not parts:
+        return stats
+
+    try:
+        with zipfile.ZipFile(path) as z:
+            for name in z.namelist():
+                if not parts.match(name):
+                    continue
+                xml = z.read(name).decode('utf-8', errors='ignore')
+                for match in nodes.finditer(xml):
+                    text = unescape(match.group(1)).strip()
+                    if text:
+                        stats["segments"] += 1
+                        stats["chars"] += len(text)
+                        stats["tokens"] += estimate_tokens(text)
+    except Exception as e:
+        logger.warning(f"Não foi possível estimar tokens de {path}: {e}")
+        size = Path(path).stat().st_size if Path(path).exists() else 0
+        stats["tokens"] = max(1, size // 16)
+
+    return stats
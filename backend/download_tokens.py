@@ -0,0 +1,236 @@
+import heapq
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre varreduras de tokens expirados
+DOWNLOAD_SWEEP_INTERVAL_S = int(os.getenv("DOWNLOAD_SWEEP_INTERVAL_S", "60"))
+# Entradas no log antes de consolidar em um novo snapshot
+DOWNLOAD_LOG_COMPACT_ENTRIES = int(os.getenv("DOWNLOAD_LOG_COMPACT_ENTRIES", "500"))
+
+def token_paths(info: Dict) -> List[str]:
+    """Arquivos de um token (tokens antigos apontam para um ZIP pronto em "path")"""
+    return info.get("paths") or ([info["path"]] if info.get("path") else [])
+
+class DownloadTokenStore:
+    """
+    Índice em memória dos tokens de download
+
+    Consultas são um acesso ao dicionário; a expiração fica num heap
+    ordenado por prazo. A persistência é um snapshot JSON (o mesmo formato
+    do antigo download_tokens.json) mais um log só de acréscimos, com uma
+    linha por inclusão ou remoção. Outros processos (workers do uvicorn)
+    leem o log a partir do último offset quando não encontram um token.
+    Arquivos de tokens expirados são apagados pela thread de varredura,
+    nunca durante uma requisição.
+    """
+
+    def __init__(self, snapshot_file: str = "data/download_tokens.json"):
+        self.snapshot_file = Path(snapshot_file)
+        self.snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+        self.log_file = self.snapshot_file.with_suffix('.log')
+        self._lock_file = self.snapshot_file.with_suffix('.lock')
+        self._lock = threading.RLock()
+        self._tokens: Dict[str, Dict] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._log_inode: Optional[int] = None
+        self._log_offset = 0
+        self._log_entries = 0
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+
+        with self._lock:
+            self._reload()
+
+    @contextmanager
+    def _file_lock(self):
+        """Lock entre processos para escrita no log e no snapshot"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_file, 'a') as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def _reload(self):
+        """Recarrega snapshot e log do disco"""
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                self._tokens = json.load(f)
+        except FileNotFoundError:
+            self._tokens = {}
+        except Exception as e:
+            logger.warning(f"Erro ao carregar tokens: {e}")
+            self._tokens = {}
+
+        self._heap = [(info.get("expire", 0), token) for token, info in self._tokens.items()]
+        heapq.heapify(self._heap)
+        self._log_inode = None
+        self._log_offset = 0
+        self._log_entries = 0
+        self._catch_up()
+
+    def _catch_up(self):
+        """Aplica entradas do log gravadas desde a última leitura"""
+        try:
+            stat = os.stat(self.log_file)
+        except FileNotFoundError:
+            return
+
+        if self._log_inode is not None and (stat.st_ino != self._log_inode or stat.st_size < self._log_offset):
+            # Outro processo consolidou o log num novo snapshot
+            self._reload()
+            return
+
+        self._log_inode = stat.st_ino
+        if stat.st_size == self._log_offset:
+            return
+
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read()
+
+        # Apenas linhas completas; uma escrita em andamento fica para depois
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("Linha inválida no log de tokens ignorada")
+        self._log_offset += end
+
+    def _apply(self, entry: Dict):
+        token = entry["token"]
+        if entry["op"] == "put":
+            info = entry["info"]
+            self._tokens[token] = info
+            heapq.heappush(self._heap, (info.get("expire", 0), token))
+        else:
+            self._tokens.pop(token, None)
+        self._log_entries += 1
+
+    def _append(self, entries: List[Dict]):
+        """Grava entradas no log e as aplica no índice"""
+        with self._file_lock():
+            self._catch_up()
+            with open(self.log_file, 'ab') as f:
+                f.write(b"".join(json.dumps(e, ensure_ascii=False).encode('utf-8') + b"\n" for e in entries))
+                f.flush()
+                self._log_offset = f.tell()
+                self._log_inode = os.fstat(f.fileno()).st_ino
+        for entry in entries:
+            self._apply(entry)
+
+    def add(self, token: str, info: Dict):
+        """Adiciona novo token de download"""
+        with self._lock:
+            self._append([{"op": "put", "token": token, "info": info}])
+
+    def get(self, token: str) -> Optional[Dict]:
+        """Informações do token (inclusive expirado, até a próxima varredura)"""
+        with self._lock:
+            info = self._tokens.get(token)
+            if info is None:
+                # Pode ter sido criado por outro worker
+                self._catch_up()
+                info = self._tokens.get(token)
+            return info
+
+    def discard(self, token: str):
+        """Remove um token do índice (os arquivos ficam para a limpeza geral)"""
+        with self._lock:
+            if token in self._tokens:
+                self._append([{"op": "del", "token": token}])
+
+    def _pop_expired(self, now: float) -> List[Tuple[str, Dict]]:
+        """Retira do índice os tokens vencidos"""
+        with self._lock:
+            self._catch_up()
+            expired = []
+            while self._heap and self._heap[0][0] <= now:
+                expire, token = heapq.heappop(self._heap)
+                info = self._tokens.get(token)
+                # Entradas antigas do heap (token removido ou renovado) são ignoradas
+                if info is not None and info.get("expire", 0) == expire:
+                    expired.append((token, info))
+            if expired:
+                self._append([{"op": "del", "token": token} for token, _ in expired])
+            return expired
+
+    def sweep(self) -> int:
+        """Remove tokens expirados e seus arquivos; retorna quantos foram removidos"""
+        expired = self._pop_expired(time.time())
+        for _, info in expired:
+            for path in token_paths(info):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except Exception:
+                    pass
+        if expired:
+            logger.info(f"Removidos {len(expired)} tokens expirados")
+
+        if self._log_entries >= DOWNLOAD_LOG_COMPACT_ENTRIES:
+            self.compact()
+        return len(expired)
+
+    def compact(self):
+        """Consolida índice atual em snapshot e recomeça o log"""
+        with self._lock, self._file_lock():
+            self._catch_up()
+            try:
+                tmp = self.snapshot_file.with_suffix('.tmp')
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(self._tokens, f, indent=2, ensure_ascii=False)
+                os.replace(tmp, self.snapshot_file)
+
+                # Novo arquivo (novo inode): outros processos percebem e recarregam
+                tmp_log = self.log_file.with_suffix('.log.tmp')
+                open(tmp_log, 'wb').close()
+                os.replace(tmp_log, self.log_file)
+                self._log_inode = os.stat(self.log_file).st_ino
+                self._log_offset = 0
+                self._log_entries = 0
+            except Exception as e:
+                logger.error(f"Erro ao consolidar tokens: {e}")
+
+    def start_sweeper(self, interval_s: float = DOWNLOAD_SWEEP_INTERVAL_S):
+        """Inicia a thread de varredura de tokens expirados"""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval_s,),
+                                         daemon=True, name="download-sweeper")
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Para a thread de varredura"""
+        self._stop.set()
+        if self._sweeper:
+            self._sweeper.join(timeout=5)
+
+    def _sweep_loop(self, interval_s: float):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Erro na varredura de tokens: {e}")
+            self._stop.wait(interval_s)
+
+# Instância global dos tokens de download
+download_tokens = DownloadTokenStore()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Respostas de download com Range, ETag e requisições condicionais
+
+Os arquivos traduzidos podem ter centenas de MB. Com Range o cliente
+retoma um download interrompido de onde parou; o ETag forte (derivado do
+SHA-256 do conteúdo) permite que If-None-Match responda 304 sem ler o
+disco e que If-Range só retome se o conteúdo for o mesmo.
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from zip_stream import ZipPlan, file_digest, iter_file_range, zip_member
+from uploads import ALLOWED_MIME_TYPES
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_MEDIA_TYPES = {ext: mime for mime, ext in ALLOWED_MIME_TYPES.items()}
+
+class FilePayload:
+    """Arquivo único com a mesma interface de ZipPlan (size e iter_bytes)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+
+    def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        end = self.size - 1 if end is None else min(end, self.size - 1)
+        return iter_file_range(self.path, start, end - start + 1)
+
+def zip_requested(format: Optional[str]) -> bool:
+    """
+    Parâmetro format dos downloads: zip (padrão) ou file
+
+    O padrão continua sendo ZIP mesmo para um único arquivo (clientes da API
+    que sempre descompactam); format=file entrega um arquivo único direto.
+    """
+    if format in (None, "", "zip"):
+        return True
+    if format == "file":
+        return False
+    raise HTTPException(status_code=400, detail=f"Formato de download inválido: {format}. Use: zip, file")
+
+def current_digest(path: Path, stored: Optional[Dict] = None) -> Dict:
+    """Digest guardado na conclusão, recalculado se o arquivo mudou desde então"""
+    stat = Path(path).stat()
+    if stored and stored.get("size") == stat.st_size and stored.get("mtime") == stat.st_mtime:
+        return stored
+    return file_digest(path)
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Intervalo (início, fim inclusivo) de um cabeçalho Range de faixa única
+
+    Retorna None quando o cabeçalho deve ser ignorado (ausente, malformado
+    ou com várias faixas) e levanta ValueError quando é insatisfatível.
+    """
+    if not header:
+        return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep:
+        return None
+
+    if first:
+        if not first.isdigit() or (last and not last.isdigit()):
+            return None
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+    else:
+        # Sufixo: os últimos N bytes
+        if not last.isdigit():
+            return None
+        if int(last) == 0:
+            raise ValueError("Faixa vazia")
+        start, end = max(0, size - int(last)), size - 1
+
+    if start >= size:
+        raise ValueError("Faixa fora do arquivo")
+    return start, min(end, size - 1)
+
+def _etag_list(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+def none_match(header: Optional[str], etag: str) -> bool:
+    """If-None-Match (comparação fraca): True se o cliente já tem esta versão"""
+    if not header:
+        return False
+    tags = _etag_list(header)
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+def if_range_matches(header: Optional[str], etag: str) -> bool:
+    """If-Range (comparação forte); datas e ETags fracos invalidam a faixa"""
+    return header is None or header.strip() == etag
+
+def content_disposition(filename: str) -> str:
+    """Content-Disposition de anexo, com nome UTF-8 quando necessário"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def ranged_response(request: Request, payload, etag: str, media_type: str, filename: str) -> Response:
+    """Resposta completa, parcial (206), 304 ou 416 para um conteúdo com ETag"""
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": content_disposition(filename)
+    }
+
+    if none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Accept-Ranges": "bytes"})
+
+    byte_range = None
+    if if_range_matches(request.headers.get("if-range"), etag):
+        try:
+            byte_range = parse_range(request.headers.get("range"), payload.size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{payload.size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(payload.size)
+        return StreamingResponse(payload.iter_bytes(), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    logger.info(f"Download parcial de {filename}: bytes {start}-{end}/{payload.size}")
+    headers["Content-Range"] = f"bytes {start}-{end}/{payload.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(payload.iter_bytes(start, end), status_code=206,
+                             media_type=media_type, headers=headers)
+
+def download_response(request: Request, paths: List[Path], zip_name: str, as_zip: bool = True,
+                      digests: Optional[Dict[str, Dict]] = None, filename: Optional[str] = None) -> Response:
+    """
+    Resposta de download dos arquivos traduzidos
+
+    Os arquivos são transmitidos como ZIP montado sob demanda, com membros
+    STORED; com as_zip=False, um único arquivo vai direto. digests
+    traz, por nome de arquivo, os hashes calculados na conclusão.
+    """
+    digests = digests or {}
+    current = {path.name: current_digest(path, digests.get(path.name)) for path in paths}
+
+    if len(paths) == 1 and not as_zip:
+        path = paths[0]
+        etag = f'"{current[path.name]["sha256"]}"'
+        media_type = OUTPUT_MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+        return ranged_response(request, FilePayload(path), etag, media_type, filename or path.name)
+
+    members = [zip_member(path, crc=current[path.name]["crc32"]) for path in paths]
+
+    # O ZIP depende do conteúdo, do nome e da data de cada membro
+    combined = hashlib.sha256()
+    for member in members:
+        combined.update(member.arcname.encode("utf-8"))
+        combined.update(current[member.arcname]["sha256"].encode())
+        combined.update(repr(member.mtime).encode())
+    etag = f'"zip-{combined.hexdigest()}"'
+
+    return ranged_response(request, ZipPlan(members), etag, "application/zip", filename or zip_name)
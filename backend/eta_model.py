@@ -0,0 +1,97 @@
+import json
+import os
+import time
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Vazão inicial antes de haver medições (tokens/segundo)
+DEFAULT_TOKENS_PER_SECOND = float(os.getenv("DEFAULT_TOKENS_PER_SECOND", "150"))
+# Peso de cada nova medição na média móvel exponencial
+ETA_EWMA_ALPHA = float(os.getenv("ETA_EWMA_ALPHA", "0.3"))
+# Medições muito curtas são ruído (arquivos vazios, cache)
+MIN_SAMPLE_SECONDS = 1.0
+
+class ThroughputModel:
+    """
+    Vazão observada (tokens/segundo) por modelo e por formato de arquivo.
+
+    Cada arquivo traduzido gera uma medição; a estimativa usa a chave mais
+    específica disponível: (modelo, formato) → modelo → global → padrão.
+    """
+
+    def __init__(self, stats_file: str = "data/throughput_stats.json"):
+        self.stats_file = Path(stats_file)
+        self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Carrega medições do arquivo"""
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        """Salva medições no arquivo"""
+        try:
+            tmp = self.stats_file.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._stats, f, indent=2)
+            os.replace(tmp, self.stats_file)
+        except Exception as e:
+            logger.error(f"Erro ao salvar estatísticas de vazão: {e}")
+
+    @staticmethod
+    def _keys(model: Optional[str], file_format: Optional[str]):
+        model = model or "*"
+        file_format = (file_format or "*").lower().lstrip('.')
+        return [f"{model}|{file_format}", f"{model}|*", "*|*"]
+
+    def record(self, model: str, file_format: str, tokens: int, seconds: float):
+        """Registra a vazão de um arquivo traduzido"""
+        if tokens <= 0 or seconds < MIN_SAMPLE_SECONDS:
+            return
+
+        rate = tokens / seconds
+        with self._lock:
+            # Outros processos (workers do uvicorn) também gravam medições
+            self._stats = self._load() or self._stats
+            for key in self._keys(model, file_format):
+                entry = self._stats.get(key)
+                if entry:
+                    entry["tps"] = (1 - ETA_EWMA_ALPHA) * entry["tps"] + ETA_EWMA_ALPHA * rate
+                    entry["samples"] += 1
+                else:
+                    entry = {"tps": rate, "samples": 1}
+                entry["updated_at"] = time.time()
+                self._stats[key] = entry
+            self._save()
+
+        logger.info(f"Vazão registrada {model}/{file_format}: {rate:.1f} tokens/s ({tokens} tokens em {seconds:.1f}s)")
+
+    def tokens_per_second(self, model: str = None, file_format: str = None) -> float:
+        """Vazão estimada para o modelo e formato"""
+        with self._lock:
+            for key in self._keys(model, file_format):
+                entry = self._stats.get(key)
+                if entry and entry.get("tps", 0) > 0:
+                    return entry["tps"]
+        return DEFAULT_TOKENS_PER_SECOND
+
+    def estimate_seconds(self, tokens: int, model: str = None, file_format: str = None) -> float:
+        """Tempo estimado para traduzir um volume de tokens"""
+        return max(0, tokens) / self.tokens_per_second(model, file_format)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Cópia das medições atuais"""
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+# Instância global do modelo de vazão
+throughput_model = ThroughputModel()
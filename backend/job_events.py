@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Eventos guardados por assinante antes de descartar (cliente lento)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class JobEventBroker:
+    """
+    Pub/sub em memória dos eventos de progresso dos jobs
+
+    Os tradutores publicam a partir de threads de trabalho; os endpoints SSE
+    assinam dentro do event loop. A entrega usa call_soon_threadsafe e o
+    último evento de cada job é mantido para quem assina depois.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._last: Dict[str, Dict] = {}
+
+    def publish(self, job_id: str, event: Dict):
+        """Publica um evento de um job (pode ser chamado de qualquer thread)"""
+        with self._lock:
+            last = dict(self._last.get(job_id, {}))
+            last.update(event)
+            self._last[job_id] = last
+            subscribers = list(self._subscribers.get(job_id, []))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # Event loop já encerrado; o assinante sai no finally do endpoint
+                pass
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, event: Dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.debug("Fila de eventos cheia; evento descartado")
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Assina os eventos de um job (chamar dentro do event loop)"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        """Cancela uma assinatura"""
+        with self._lock:
+            subscribers = [s for s in self._subscribers.get(job_id, []) if s[1] is not queue]
+            if subscribers:
+                self._subscribers[job_id] = subscribers
+            else:
+                self._subscribers.pop(job_id, None)
+
+    def last_event(self, job_id: str) -> Dict:
+        """Estado acumulado dos eventos publicados para o job"""
+        with self._lock:
+            return dict(self._last.get(job_id, {}))
+
+    def forget(self, job_id: str):
+        """Descarta o estado de um job encerrado"""
+        with self._lock:
+            self._last.pop(job_id, None)
+
+# Instância global do broker de eventos
+job_events = JobEventBroker()
@@ -0,0 +1,134 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Modos de captura aceitos por job
+PROFILE_MODES = ("cpu", "memory")
+# Funções e alocações guardadas no job (o perfil completo fica no diretório do job)
+PROFILE_TOP_N = 25
+
+# Um perfil de CPU por vez no processo (Python 3.12+ não aceita dois ativos)
+_cpu_lock = threading.Lock()
+# tracemalloc é global ao processo: contagem de jobs que o usam
+_memory_lock = threading.Lock()
+_memory_users = 0
+
+def parse_profile_modes(value: Optional[str]) -> list:
+    """Modos de captura ("cpu", "memory" ou "all"), separados por vírgula"""
+    modes = {m.strip().lower() for m in (value or "").split(",") if m.strip()}
+    if "all" in modes:
+        modes = set(PROFILE_MODES)
+    unknown = modes - set(PROFILE_MODES)
+    if unknown:
+        raise ValueError(f"Modo de perfil inválido: {', '.join(sorted(unknown))}")
+    return sorted(modes)
+
+def sum_stages(stages: Iterable[Dict[str, float]]) -> Dict[str, float]:
+    """Soma tempos por etapa"""
+    total: Dict[str, float] = {}
+    for item in stages:
+        for stage, seconds in (item or {}).items():
+            total[stage] = round(total.get(stage, 0.0) + seconds, 4)
+    return total
+
+class JobProfiler:
+    """
+    Captura opcional de perfil de CPU (cProfile) e memória (tracemalloc) de um job
+
+    O perfil de CPU cobre a thread do job; trabalho em threads auxiliares
+    (idiomas em paralelo, lotes compartilhados) aparece como espera. Se
+    outro job já estiver com perfil de CPU, este segue sem ele. O
+    tracemalloc é do processo inteiro: com outros jobs em paralelo, o pico
+    inclui as alocações deles.
+    """
+
+    def __init__(self, job_id: str, modes: Iterable[str]):
+        self.job_id = job_id
+        self.modes = set(modes or ())
+        self._profile: Optional[cProfile.Profile] = None
+        self._memory = False
+        self._started_at = 0.0
+
+    @property
+    def cpu(self) -> bool:
+        return "cpu" in self.modes
+
+    def start(self):
+        global _memory_users
+        self._started_at = time.time()
+        if "memory" in self.modes:
+            with _memory_lock:
+                if _memory_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _memory_users += 1
+                tracemalloc.reset_peak()
+            self._memory = True
+        if self.cpu:
+            if _cpu_lock.acquire(blocking=False):
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+            else:
+                logger.warning(f"Perfil de CPU do job {self.job_id} ignorado: outro job já está sendo perfilado")
+
+    def finish(self, workdir: Path) -> Dict:
+        """Encerra a captura; retorna o resumo guardado no job"""
+        global _memory_users
+        report: Dict = {"modes": sorted(self.modes), "wall_s": round(time.time() - self._started_at, 4)}
+
+        if self._profile is not None:
+            self._profile.disable()
+            _cpu_lock.release()
+            path = Path(workdir) / "profile.prof"
+            try:
+                self._profile.dump_stats(str(path))
+                report["cpu_profile_file"] = path.name
+            except OSError as e:
+                logger.warning(f"Erro ao salvar perfil do job {self.job_id}: {e}")
+            stats = pstats.Stats(self._profile, stream=io.StringIO()).sort_stats("cumulative")
+            report["cpu_top"] = [
+                {
+                    "function": f"{Path(filename).name}:{line}({name})",
+                    "calls": calls,
+                    "tottime_s": round(tottime, 4),
+                    "cumtime_s": round(cumtime, 4)
+                }
+                for (filename, line, name), (_, calls, tottime, cumtime, _) in
+                sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:PROFILE_TOP_N]
+            ]
+            self._profile = None
+
+        if self._memory:
+            with _memory_lock:
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                _memory_users -= 1
+                if _memory_users == 0:
+                    tracemalloc.stop()
+            report["memory_peak_mb"] = round(peak / 1024 / 1024, 2)
+            report["memory_current_mb"] = round(current / 1024 / 1024, 2)
+            report["memory_top"] = [
+                {"location": f"{Path(stat.traceback[0].filename).name}:{stat.traceback[0].lineno}",
+                 "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]
+            ]
+            self._memory = False
+
+        return report
+
+@contextmanager
+def stage_timer(stages: Dict[str, float], stage: str):
+    """Acumula em stages[stage] o tempo do bloco"""
+    mark = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - mark
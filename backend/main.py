@@ -5,24 +5,45 @@ API Principal do Tradutor Universal - Versão 2.0 Limpa
 
 import os
 import io
-import zipfile
+import hmac
+import asyncio
 import uuid
 import time
 import json
-import shutil
 import logging
+import shutil
+import threading
 import traceback
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
-from fastapi import FastAPI, UploadFile, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from typing import List, Dict, Optional, Tuple
+from fastapi import FastAPI, UploadFile, Form, HTTPException, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from translator_core_pro import translate_file_professional, TranslationResult
-from translator_openai_official import translate_docx_professional
-from queue_manager import queue_manager, JobStatus
+from translator_core_pro import translate_file_multi, TranslationResult
+from translator_openai_official import translate_docx_multi, checkpoint_path_for, estimate_revision
+from queue_manager import queue_manager, JobStatus, PRIORITY_CLASSES, JobProgressReporter
+from document_stats import estimate_document_tokens
+from eta_model import throughput_model
+from job_events import job_events
 from queue_scheduler import scheduler
-from config import validate_openai_config, get_openai_client, DEFAULT_MODEL, test_openai_connection
-import magic
+from config import validate_openai_config, get_openai_client, DEFAULT_MODEL, test_openai_connection, ADMIN_TOKEN
+from translation_backends import get_backend
+from uploads import save_upload, safe_filename, validate_file_type, hash_upload
+from zip_stream import file_digest
+from downloads import download_response, zip_requested
+from download_tokens import download_tokens, token_paths
+from storage_gc import storage_gc
+from result_cache import result_cache, file_cache_key, request_cache_key
+from revisions import revision_store
+from job_profiling import JobProfiler, parse_profile_modes, stage_timer
+from metrics import metrics
+from tracing import tracer
+from cancellation import cancellable, check_cancelled
+from async_translation import async_loop
+from usage_ledger import usage_ledger, add_usage, USAGE_REPORT_TOP_N
 
 # Configuração de logging
 logging.basicConfig(
@@ -37,6 +58,15 @@ logger = logging.getLogger(__name__)
 
 # Configurações
 MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "300"))
+# Arquivos de um mesmo job da fila traduzidos em paralelo
+JOB_FILE_CONCURRENCY = int(os.getenv("JOB_FILE_CONCURRENCY", "3"))
+# Traduções síncronas (/api/translate) rodam fora do event loop, com limite e timeout
+SYNC_TRANSLATE_CONCURRENCY = int(os.getenv("SYNC_TRANSLATE_CONCURRENCY", "2"))
+SYNC_TRANSLATE_TIMEOUT_S = int(os.getenv("SYNC_TRANSLATE_TIMEOUT_S", "900"))
+# Sem eventos locais por este tempo, o SSE consulta a fila (job em outro worker)
+SSE_FALLBACK_POLL_S = float(os.getenv("SSE_FALLBACK_POLL_S", "5"))
+# Idiomas de destino aceitos num mesmo job da fila
+MAX_TARGET_LANGS = int(os.getenv("MAX_TARGET_LANGS", "10"))
 PROFILE_MAP = {
     "normal": "gpt-4.1",     # Modelo oficial OpenAI para traduções precisas
     "rapido": "o4-mini",     # Versão oficial mais rápida e eficiente
@@ -48,53 +78,14 @@ LOGS_DIR.mkdir(parents=True, exist_ok=True)
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-# Cache de downloads com persistência
-DOWNLOADS_FILE = DATA_DIR / "download_tokens.json"
-
-def load_download_links() -> Dict[str, Dict]:
-    """Carrega tokens de download do arquivo"""
-    try:
-        if DOWNLOADS_FILE.exists():
-            with open(DOWNLOADS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.warning(f"Erro ao carregar tokens: {e}")
-    return {}
-
-def save_download_links(links: Dict[str, Dict]):
-    """Salva tokens de download no arquivo"""
-    try:
-        with open(DOWNLOADS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(links, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        logger.error(f"Erro ao salvar tokens: {e}")
-
-def get_download_links() -> Dict[str, Dict]:
-    """Obtém tokens válidos, removendo expirados"""
-    links = load_download_links()
-    current_time = time.time()
-    
-    # Remove tokens expirados
-    expired = [token for token, info in links.items() if current_time > info.get("expire", 0)]
-    for token in expired:
-        try:
-            if os.path.exists(links[token].get("path", "")):
-                os.remove(links[token]["path"])
-        except Exception:
-            pass
-        links.pop(token, None)
-    
-    if expired:
-        save_download_links(links)
-        logger.info(f"Removidos {len(expired)} tokens expirados")
-    
-    return links
+# Executor dedicado às traduções síncronas; o slot só é liberado quando a
+# thread termina, mesmo que o cliente já tenha recebido timeout
+translate_executor = ThreadPoolExecutor(max_workers=SYNC_TRANSLATE_CONCURRENCY, thread_name_prefix="translate")
+translate_slots = threading.BoundedSemaphore(SYNC_TRANSLATE_CONCURRENCY)
 
-def add_download_token(token: str, info: Dict):
-    """Adiciona novo token de download"""
-    links = get_download_links()
-    links[token] = info
-    save_download_links(links)
+# Traduções síncronas em andamento por pedido: duplicatas aguardam a mesma
+inflight_translations: Dict[str, Future] = {}
+inflight_lock = threading.Lock()
 
 # App
 app = FastAPI(
@@ -108,6 +99,13 @@ def check_openai_startup():
     """Verifica OpenAI no startup para evitar 500 errors"""
     try:
         logger.info("🚀 Iniciando Brazil Translations API...")
+        metrics.start_flusher()
+        if get_backend().name != "openai":
+            logger.info(f"🧪 Backend de tradução local: {get_backend().name}")
+            scheduler.start()
+            download_tokens.start_sweeper()
+            logger.info("✅ Serviços inicializados")
+            return
         logger.info("🧪 Testando conexão OpenAI no startup...")
         validate_openai_config()
         client = get_openai_client()
@@ -117,6 +115,7 @@ def check_openai_startup():
             
             # Iniciar scheduler de limpeza
             scheduler.start()
+            download_tokens.start_sweeper()
             logger.info("✅ Serviços inicializados")
         else:
             logger.error("❌ Cliente OpenAI não pôde ser inicializado")
@@ -137,6 +136,11 @@ def shutdown_cleanup():
     """Finalizar serviços no encerramento"""
     logger.info("🛑 Encerrando Brazil Translations API...")
     scheduler.stop()
+    download_tokens.stop_sweeper()
+    translate_executor.shutdown(wait=False)
+    async_loop.stop()
+    metrics.stop_flusher()
+    tracer.shutdown()
     logger.info("✅ Serviços finalizados")
 
 # CORS
@@ -153,33 +157,132 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Tipos permitidos
-ALLOWED_MIME_TYPES = {
-    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
-    'application/vnd.openxmlformats-officedocument.presentationml.presentation': '.pptx',
-    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': '.xlsx'
-}
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Latência por rota (o padrão da rota, não o caminho, para não explodir a
+    cardinalidade) e span do request, filho do traceparent recebido
+    """
+    start = time.perf_counter()
+    status = 500
+    with tracer.span(f"HTTP {request.method}", parent=request.headers.get("traceparent"), kind="server") as span:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - start, {
+                "route": route,
+                "method": request.method,
+                "status": str(status)
+            })
+            span.name = f"{request.method} {route}"
+            span.set_attributes({"http.method": request.method, "http.route": route, "http.status_code": status})
 
-def validate_file_type(file_content: bytes, filename: str) -> bool:
-    """Valida tipo do arquivo"""
-    try:
-        mime_type = magic.from_buffer(file_content, mime=True)
-        return mime_type in ALLOWED_MIME_TYPES
-    except Exception as e:
-        logger.warning(f"Erro na validação: {e}")
-        ext = os.path.splitext(filename)[1].lower()
-        return ext in ['.docx', '.pptx', '.xlsx']
+def translate_file_targets(input_file: Path, output_files: Dict[str, Path], source_lang: str, model: str,
+                           checkpoint_paths: Dict[str, Path], progress_callback=None, coalesce: bool = False,
+                           previous: Optional[Dict[str, Dict[str, str]]] = None, client_id: Optional[str] = None):
+    """
+    Traduz um arquivo para um ou mais idiomas com o motor adequado ao formato
+    
+    DOCX usa o tradutor oficial em lotes (com checkpoint retomável e, na
+    fila, lotes compartilhados entre jobs pequenos);
+    PPTX e XLSX usam o tradutor tradicional. Com vários idiomas, o arquivo
+    é lido e segmentado uma vez e os idiomas rodam em paralelo. previous
+    (traduções da versão anterior, por idioma) e a memória de tradução do
+    cliente só se aplicam ao DOCX.
+    Retorna, por idioma, (resultado, elementos originais, elementos traduzidos).
+    """
+    if input_file.suffix.lower() == '.docx':
+        logger.info("Usando tradutor oficial OpenAI para DOCX")
+        results = translate_docx_multi(
+            str(input_file),
+            {lang: str(path) for lang, path in output_files.items()},
+            source_lang,
+            progress_callback,
+            {lang: str(path) for lang, path in checkpoint_paths.items()},
+            model,
+            coalesce,
+            previous,
+            client_id
+        )
+        # Para DOCX, segmentos = elementos
+        return {lang: (r, r.translated_segments, r.translated_segments) for lang, r in results.items()}
+    
+    results = translate_file_multi(
+        str(input_file),
+        {lang: str(path) for lang, path in output_files.items()},
+        source_lang,
+        model,
+        progress_callback
+    )
+    return {lang: (r, r.original_elements, r.translated_elements) for lang, r in results.items()}
 
-def cleanup_old_files():
-    """Remove arquivos antigos (6 horas)"""
+def translate_single_file(input_file: Path, output_file: Path, source_lang: str, target_lang: str,
+                          model: str, checkpoint_path: Path, progress_callback=None, coalesce: bool = False,
+                          client_id: Optional[str] = None):
+    """Traduz um arquivo para um idioma; retorna (resultado, elementos originais, elementos traduzidos)"""
+    return translate_file_targets(
+        input_file, {target_lang: output_file}, source_lang, model,
+        {target_lang: checkpoint_path}, progress_callback, coalesce, client_id=client_id
+    )[target_lang]
+
+def translated_filename(filename: str, target_lang: Optional[str] = None) -> str:
+    """Nome do arquivo traduzido correspondente a um upload (com o idioma, em jobs de vários idiomas)"""
+    base, ext = os.path.splitext(filename)
+    safe_base = "".join(c for c in base if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    suffix = f"_{target_lang}" if target_lang else ""
+    return f"{safe_base}_traduzido{suffix}{ext}"
+
+def target_outputs(filename: str, target_langs: List[str]) -> List[Tuple[str, str, str]]:
+    """
+    Saídas de um arquivo do job: (chave no job, idioma, nome traduzido)
+    
+    Jobs de um idioma mantêm a chave e o nome simples; com vários idiomas
+    cada saída leva o idioma na chave e no nome.
+    """
+    if len(target_langs) == 1:
+        return [(filename, target_langs[0], translated_filename(filename))]
+    return [(f"{filename}|{lang}", lang, translated_filename(filename, lang)) for lang in target_langs]
+
+def estimate_revision_stats(input_file: Path, source_lang: str, target_lang: str, previous: Dict) -> Dict[str, int]:
+    """Volume de uma revisão em um idioma (estimativa completa se a versão anterior não tiver o idioma)"""
+    memory = revision_store.load(previous["job_id"], previous["filename"], source_lang, target_lang)
+    if not memory:
+        return estimate_document_tokens(str(input_file))
     try:
-        current_time = time.time()
-        for job_dir in DATA_DIR.glob("job_*"):
-            if job_dir.is_dir() and current_time - job_dir.stat().st_mtime > 6 * 3600:  # 6 horas
-                shutil.rmtree(job_dir, ignore_errors=True)
-                logger.info(f"Removido: {job_dir}")
+        return estimate_revision(str(input_file), memory)
     except Exception as e:
-        logger.error(f"Erro na limpeza: {e}")
+        logger.warning(f"Não foi possível estimar a revisão de {input_file.name}: {e}")
+        return estimate_document_tokens(str(input_file))
+
+def parse_target_langs(value: str) -> List[str]:
+    """Idiomas de destino separados por vírgula, sem repetição"""
+    langs = list(dict.fromkeys(lang.strip() for lang in (value or "").split(",") if lang.strip()))
+    if not langs:
+        raise HTTPException(status_code=400, detail="Informe ao menos um idioma de destino")
+    if len(langs) > MAX_TARGET_LANGS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_TARGET_LANGS} idiomas por job")
+    for lang in langs:
+        if not all(c.isalnum() or c in "-_" for c in lang):
+            raise HTTPException(status_code=400, detail=f"Idioma inválido: {lang}")
+    return langs
+
+def validate_backend_config():
+    """Valida a configuração OpenAI (o backend mock não precisa de chave)"""
+    if get_backend().name != "openai":
+        return True
+    return validate_openai_config()
+
+def get_client_id(request: Request, client_id: Optional[str] = None) -> str:
+    """Identifica o cliente para o fair share da fila"""
+    if client_id and client_id.strip():
+        return client_id.strip()[:64]
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "anonimo"
 
 @app.get("/api/health")
 def health():
@@ -192,6 +295,20 @@ def health():
         "max_upload_mb": MAX_UPLOAD_MB
     }
 
+@app.get("/metrics")
+def prometheus_metrics():
+    """Métricas no formato Prometheus (somadas entre os workers)"""
+    stats = queue_manager.get_queue_stats()
+    queue_gauges = {
+        "translation_queue_jobs": ("Jobs na fila por status", {
+            (("status", status),): stats[status] for status in ("pending", "processing", "completed", "error")
+        }),
+        "translation_queue_oldest_pending_seconds": ("Espera do job pendente mais antigo", {
+            (): stats["oldest_pending_s"]
+        })
+    }
+    return PlainTextResponse(metrics.render(queue_gauges), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/debug")
 def debug_config():
     """Debug da configuração"""
@@ -218,16 +335,145 @@ def debug_config():
     
     return JSONResponse(debug_info)
 
+def translate_uploaded_files(job_id: str, workdir: Path, uploads: List[Dict], idioma_origem: str,
+                             idioma_destino: str, model: str, client_id: str = "anonimo"):
+    """
+    Traduz os arquivos já salvos de /api/translate
+    
+    Roda no translate_executor, fora do event loop. Documentos já
+    traduzidos com a mesma chave vêm do cache de resultados.
+    Retorna (caminhos traduzidos, resumo por arquivo, hashes por arquivo,
+    token de download de quem enviou o pedido).
+    """
+    outputs = []
+    digests = {}
+    processed_files = []
+    
+    for upload in uploads:
+        filename = upload["filename"]
+        input_file = workdir / filename
+        ext = os.path.splitext(filename)[1]
+        
+        # Arquivo de saída
+        output_file = workdir / translated_filename(filename)
+        
+        # Mesmo documento, idiomas, modelo e glossário já traduzidos
+        cached = result_cache.materialize(upload["cache_key"], output_file)
+        if cached:
+            logger.info(f"♻️ Resultado em cache: {filename}")
+            outputs.append(str(output_file))
+            digests[output_file.name] = cached["digest"]
+            processed_files.append({
+                "original": filename,
+                "translated": output_file.name,
+                "size": upload["size"],
+                "original_elements": cached["original_elements"],
+                "translated_elements": cached["translated_elements"],
+                "processing_time": 0,
+                "cached": True
+            })
+            continue
+        
+        # Traduzir
+        logger.info(f"Traduzindo: {input_file} -> {output_file}")
+        
+        translation_result, original_count, translated_count = translate_single_file(
+            input_file,
+            output_file,
+            idioma_origem,
+            idioma_destino,
+            model,
+            checkpoint_path_for(job_id, filename),
+            client_id=client_id
+        )
+        
+        usage = getattr(translation_result, "usage", None)
+        usage_ledger.record(client_id, job_id, filename, [idioma_destino], model, usage, translated_count)
+        
+        if not translation_result.success:
+            logger.error(f"Falha na tradução: {translation_result.errors}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Falha na tradução de {filename}: {'; '.join(translation_result.errors)}"
+            )
+        
+        if not os.path.exists(output_file):
+            raise HTTPException(
+                status_code=500,
+                detail=f"Arquivo traduzido não foi criado: {filename}"
+            )
+        
+        outputs.append(str(output_file))
+        # Hashes para ETag e CRC do ZIP, calculados uma única vez
+        digests[output_file.name] = file_digest(output_file)
+        
+        # Medição de vazão para as estimativas da fila
+        stats = estimate_document_tokens(str(input_file))
+        throughput_model.record(model, ext, stats["tokens"], translation_result.processing_time)
+        
+        # Apenas traduções sem falhas parciais entram no cache
+        if not translation_result.errors:
+            result_cache.put(upload["cache_key"], output_file, {
+                "original_elements": original_count,
+                "translated_elements": translated_count,
+                "digest": digests[output_file.name]
+            })
+        
+        processed_files.append({
+            "original": filename,
+            "translated": output_file.name,
+            "size": upload["size"],
+            "original_elements": original_count,
+            "translated_elements": translated_count,
+            "processing_time": translation_result.processing_time,
+            "usage": usage
+        })
+        
+        logger.info(f"✅ Traduzido: {translated_count} elementos em {translation_result.processing_time:.2f}s")
+    
+    if not outputs:
+        raise HTTPException(
+            status_code=500,
+            detail="Nenhum arquivo foi processado com sucesso"
+        )
+    
+    token = issue_download_token(outputs, processed_files, digests, idioma_origem, idioma_destino)
+    return outputs, processed_files, digests, token
+
+def issue_download_token(outputs: List[str], processed_files: List[Dict], digests: Dict[str, Dict],
+                         idioma_origem: str, idioma_destino: str) -> str:
+    """Registra um token de download de 2 horas para os arquivos traduzidos (grava no log de tokens)"""
+    token = uuid.uuid4().hex
+    download_tokens.add(token, {
+        "paths": outputs,
+        "digests": digests,
+        "expire": time.time() + 2 * 60 * 60,  # 2 horas
+        "files_count": len(outputs),
+        "files": processed_files,
+        "source_lang": idioma_origem,
+        "target_lang": idioma_destino,
+        "created_at": time.time()
+    })
+    return token
+
 @app.post("/api/translate")
 async def translate(
     background_tasks: BackgroundTasks,
+    request: Request,
     files: List[UploadFile],
     glossario: Optional[UploadFile] = None,
     idioma_origem: str = Form(...),
     idioma_destino: str = Form(...),
     perfil: str = Form("normal"),
+    clientId: Optional[str] = Form(None),
 ):
-    """Endpoint principal de tradução"""
+    """
+    Endpoint principal de tradução
+    
+    A tradução roda no translate_executor para não bloquear o event loop.
+    Com todos os slots ocupados responde 503 (Retry-After); acima de
+    SYNC_TRANSLATE_TIMEOUT_S responde 504. Documentos longos devem ir para a fila.
+    """
     logger.info(f"Iniciando tradução: {len(files)} arquivo(s)")
     
     if not files:
@@ -235,7 +481,7 @@ async def translate(
     
     # Validar configuração OpenAI
     try:
-        validate_openai_config()
+        validate_backend_config()
         logger.info("✅ Configuração OpenAI validada")
     except Exception as e:
         logger.error(f"❌ Erro na configuração OpenAI: {e}")
@@ -245,138 +491,97 @@ async def translate(
         )
     
     model = PROFILE_MAP.get(perfil, PROFILE_MAP["normal"])
-    
-    # Criar diretório de trabalho
     job_id = uuid.uuid4().hex
     workdir = DATA_DIR / f"job_{job_id}"
-    workdir.mkdir(parents=True, exist_ok=True)
+    
+    # Reservar slot antes de receber os arquivos; liberado no finally até a tradução ser enviada
+    if not translate_slots.acquire(blocking=False):
+        logger.warning("Todos os slots de tradução síncrona ocupados")
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado com outras traduções. Tente novamente em instantes ou use a fila.",
+            headers={"Retry-After": "30"}
+        )
+    submitted = False
     
     try:
-        outputs = []
+        # Criar diretório de trabalho
+        workdir.mkdir(parents=True, exist_ok=True)
+        await run_in_threadpool(storage_gc.track, workdir, "job")
+        
         total_size = 0
-        processed_files = []
+        uploads = []
         
-        # Processar arquivos
+        # Receber arquivos
         for i, file in enumerate(files):
             if not file.filename:
                 continue
             
-            logger.info(f"Processando {i+1}/{len(files)}: {file.filename}")
-            
-            # Ler arquivo
-            content = await file.read()
-            total_size += len(content)
+            logger.info(f"Recebendo {i+1}/{len(files)}: {file.filename}")
             
-            if total_size > MAX_UPLOAD_MB * 1024 * 1024:
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"Tamanho excede {MAX_UPLOAD_MB}MB"
-                )
+            # Gravar em disco em blocos (limite verificado durante a cópia)
+            filename = safe_filename(file.filename)
+            input_file = workdir / filename
+            saved = await save_upload(file, input_file, MAX_UPLOAD_MB * 1024 * 1024 - total_size, MAX_UPLOAD_MB)
+            total_size += saved["size"]
             
             # Validar tipo
-            if not validate_file_type(content, file.filename):
+            if not validate_file_type(saved["header"], input_file, filename):
                 raise HTTPException(
                     status_code=400,
                     detail=f"Tipo não suportado: {file.filename}"
                 )
             
-            # Salvar arquivo original
-            input_file = workdir / file.filename
-            with open(input_file, "wb") as f:
-                f.write(content)
-            
-            # Arquivo de saída
-            base, ext = os.path.splitext(file.filename)
-            safe_base = "".join(c for c in base if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            output_file = workdir / f"{safe_base}_traduzido{ext}"
-            
-            # Traduzir
-            logger.info(f"Traduzindo: {input_file} -> {output_file}")
-            
-            # Usar novo tradutor oficial OpenAI para DOCX
-            if input_file.suffix.lower() == '.docx':
-                logger.info("Usando tradutor oficial OpenAI para DOCX")
-                translation_result = translate_docx_professional(
-                    str(input_file),
-                    str(output_file),
-                    idioma_origem,
-                    idioma_destino
-                )
-            else:
-                # Fallback para outros tipos
-                translation_result = translate_file_professional(
-                    str(input_file),
-                    str(output_file),
-                    None,  # glossário
-                    True,  # usar IA
-                    idioma_origem,
-                    idioma_destino,
-                    model
-                )
-            
-            if not translation_result.success:
-                logger.error(f"Falha na tradução: {translation_result.errors}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Falha na tradução de {file.filename}: {'; '.join(translation_result.errors)}"
-                )
-            
-            if not os.path.exists(output_file):
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Arquivo traduzido não foi criado: {file.filename}"
+            uploads.append({"filename": filename, "size": saved["size"], "sha256": saved["sha256"]})
+        
+        # Chave de cache de cada documento
+        glossary_sha256 = await hash_upload(glossario)
+        for upload in uploads:
+            upload["cache_key"] = file_cache_key(upload["sha256"], idioma_origem, idioma_destino,
+                                                 model, glossary_sha256)
+        request_key = request_cache_key(f"{u['filename']}:{u['cache_key']}" for u in uploads)
+        
+        # Pedido idêntico em andamento: aguardar o mesmo resultado
+        with inflight_lock:
+            future = inflight_translations.get(request_key)
+            attached = future is not None
+            if not attached:
+                # Traduzir fora do event loop
+                future = translate_executor.submit(
+                    contextvars.copy_context().run, translate_uploaded_files, job_id, workdir, uploads, idioma_origem,
+                    idioma_destino, model, get_client_id(request, clientId)
                 )
-            
-            outputs.append(str(output_file))
-            
-            # Ajustar propriedades baseado no tipo de resultado
-            if hasattr(translation_result, 'translated_segments'):
-                # Novo tradutor OpenAI oficial
-                translated_count = translation_result.translated_segments
-                original_count = translation_result.translated_segments  # Para DOCX, segmentos = elementos
-            else:
-                # Tradutor tradicional
-                translated_count = translation_result.translated_elements
-                original_count = translation_result.original_elements
-            
-            processed_files.append({
-                "original": file.filename,
-                "translated": f"{safe_base}_traduzido{ext}",
-                "size": len(content),
-                "original_elements": original_count,
-                "translated_elements": translated_count,
-                "processing_time": translation_result.processing_time
-            })
-            
-            logger.info(f"✅ Traduzido: {translated_count} elementos em {translation_result.processing_time:.2f}s")
+                inflight_translations[request_key] = future
+                submitted = True
+        metrics.inc("cache_requests_total", {"cache": "inflight", "result": "hit" if attached else "miss"})
+        
+        if attached:
+            logger.info(f"♻️ Pedido idêntico em andamento; aguardando o mesmo resultado ({job_id})")
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            def finish(done: Future):
+                translate_slots.release()
+                with inflight_lock:
+                    if inflight_translations.get(request_key) is done:
+                        inflight_translations.pop(request_key)
+            future.add_done_callback(finish)
         
-        if not outputs:
+        try:
+            # shield: o timeout de um pedido não cancela a tradução compartilhada
+            outputs, processed_files, digests, token = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), timeout=SYNC_TRANSLATE_TIMEOUT_S
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Tradução {job_id} excedeu {SYNC_TRANSLATE_TIMEOUT_S}s")
             raise HTTPException(
-                status_code=500,
-                detail="Nenhum arquivo foi processado com sucesso"
+                status_code=504,
+                detail=f"Tradução excedeu {SYNC_TRANSLATE_TIMEOUT_S}s. Para documentos grandes, use a fila."
             )
         
-        # Criar ZIP
-        zip_path = workdir / "documentos_traduzidos.zip"
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-            for file_path in outputs:
-                if os.path.exists(file_path):
-                    z.write(file_path, arcname=os.path.basename(file_path))
-        
-        # Token de download
-        token = uuid.uuid4().hex
-        add_download_token(token, {
-            "path": str(zip_path),
-            "expire": time.time() + 2 * 60 * 60,  # 2 horas
-            "files_count": len(outputs),
-            "files": processed_files,
-            "source_lang": idioma_origem,
-            "target_lang": idioma_destino,
-            "created_at": time.time()
-        })
-        
-        # Limpeza
-        background_tasks.add_task(cleanup_old_files)
+        # Pedido anexado: token próprio (o do resultado é de quem enviou o pedido)
+        if attached:
+            token = await run_in_threadpool(issue_download_token, outputs, processed_files, digests,
+                                            idioma_origem, idioma_destino)
         
         logger.info(f"✅ Tradução concluída. Token: {token}")
         
@@ -398,43 +603,45 @@ async def translate(
             status_code=500,
             detail=f"Erro interno: {str(e)}"
         )
+    finally:
+        if not submitted:
+            # Pedido recusado (tamanho, tipo, configuração) ou anexado a outro: nada a guardar
+            shutil.rmtree(workdir, ignore_errors=True)
+            translate_slots.release()
 
 @app.get("/api/download/{token}")
-def download(token: str):
-    """Download de arquivos traduzidos"""
-    links = get_download_links()
-    info = links.get(token)
+def download(token: str, request: Request, format: Optional[str] = None):
+    """Download de arquivos traduzidos (ZIP; format=file entrega um arquivo único sem ZIP)"""
+    as_zip = zip_requested(format)
+    info = download_tokens.get(token)
     
     if not info:
         raise HTTPException(status_code=404, detail="Link inválido ou expirado")
     
+    # Arquivos de tokens expirados são removidos pela varredura em segundo plano
     if time.time() > info["expire"]:
-        try:
-            os.remove(info["path"])
-        except Exception:
-            pass
-        links.pop(token, None)
-        save_download_links(links)
         raise HTTPException(status_code=410, detail="Link expirado")
     
-    if not os.path.exists(info["path"]):
-        links.pop(token, None)
-        save_download_links(links)
+    paths = [Path(p) for p in token_paths(info)]
+    if not paths or not all(p.exists() for p in paths):
+        download_tokens.discard(token)
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
     
     logger.info(f"Download iniciado: {token}")
+    storage_gc.touch(paths[0].parent)
     
-    return FileResponse(
-        info["path"],
-        filename="documentos_traduzidos.zip",
-        media_type="application/zip"
-    )
+    # Token antigo: ZIP já montado
+    if "paths" not in info:
+        return download_response(request, paths, "documentos_traduzidos.zip", as_zip=False,
+                                 filename="documentos_traduzidos.zip")
+    
+    return download_response(request, paths, "documentos_traduzidos.zip", as_zip=as_zip,
+                             digests=info.get("digests"))
 
 @app.get("/api/status/{token}")
 def get_status(token: str):
     """Status de um token"""
-    links = get_download_links()
-    info = links.get(token)
+    info = download_tokens.get(token)
     
     if not info:
         return JSONResponse({"status": "not_found"})
@@ -455,21 +662,53 @@ def get_status(token: str):
 
 @app.post("/api/queue/submit")
 async def submit_to_queue(
+    request: Request,
     background_tasks: BackgroundTasks,
     files: List[UploadFile],
     sourceLang: str = Form(...),
     targetLang: str = Form(...),
-    glossary: Optional[UploadFile] = None
+    glossary: Optional[UploadFile] = None,
+    priority: str = Form("normal"),
+    clientId: Optional[str] = Form(None),
+    revisionOf: Optional[str] = Form(None),
+    incremental: bool = Form(False),
+    profile: Optional[str] = Form(None)
 ):
-    """Adiciona uma tradução à fila de processamento"""
+    """
+    Adiciona uma tradução à fila de processamento
+    
+    targetLang aceita vários idiomas separados por vírgula ("en,es,fr"):
+    cada arquivo é lido uma vez e gera uma saída por idioma.
+    Revisões de DOCX: com revisionOf (job da versão anterior) ou
+    incremental=true (versão anterior do mesmo cliente encontrada pelo nome
+    do arquivo, sem marcas como _v2), só os trechos novos ou alterados são
+    traduzidos; o restante reaproveita as traduções anteriores.
+    profile=cpu|memory|all captura o perfil do job (cProfile/tracemalloc),
+    devolvido em /api/queue/status.
+    """
     logger.info(f"Enviando para fila: {len(files)} arquivo(s)")
     
     if not files:
         raise HTTPException(status_code=400, detail="Nenhum arquivo enviado")
     
+    target_langs = parse_target_langs(targetLang)
+    if revisionOf and not revisionOf.isalnum():
+        raise HTTPException(status_code=400, detail="revisionOf inválido")
+    try:
+        profile_modes = parse_profile_modes(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    client_id = get_client_id(request, clientId)
+    
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Prioridade inválida: {priority}. Use: {', '.join(PRIORITY_CLASSES)}"
+        )
+    
     # Validar configuração OpenAI
     try:
-        validate_openai_config()
+        validate_backend_config()
     except Exception as e:
         logger.error(f"❌ Erro na configuração OpenAI: {e}")
         raise HTTPException(
@@ -481,11 +720,18 @@ async def submit_to_queue(
     job_id = uuid.uuid4().hex[:12]
     workdir = DATA_DIR / f"queue_job_{job_id}"
     workdir.mkdir(parents=True, exist_ok=True)
+    queued = False
     
     try:
         original_files = []
         file_paths = {}
         total_size = 0
+        estimated_tokens = 0
+        segments = 0
+        file_tokens = {}
+        file_hashes = {}
+        previous_versions = {}
+        model = PROFILE_MAP["normal"]
         
         # Processar e salvar arquivos
         for i, file in enumerate(files):
@@ -494,44 +740,111 @@ async def submit_to_queue(
             
             logger.info(f"Salvando {i+1}/{len(files)}: {file.filename}")
             
-            # Ler arquivo
-            content = await file.read()
-            total_size += len(content)
-            
-            if total_size > MAX_UPLOAD_MB * 1024 * 1024:
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"Tamanho excede {MAX_UPLOAD_MB}MB"
-                )
+            # Gravar em disco em blocos (limite verificado durante a cópia)
+            filename = safe_filename(file.filename)
+            input_file = workdir / filename
+            saved = await save_upload(file, input_file, MAX_UPLOAD_MB * 1024 * 1024 - total_size, MAX_UPLOAD_MB)
+            total_size += saved["size"]
             
             # Validar tipo
-            if not validate_file_type(content, file.filename):
+            if not validate_file_type(saved["header"], input_file, filename):
                 raise HTTPException(
                     status_code=400,
                     detail=f"Tipo não suportado: {file.filename}"
                 )
             
-            # Salvar arquivo
-            input_file = workdir / file.filename
-            with open(input_file, "wb") as f:
-                f.write(content)
+            original_files.append(filename)
+            file_paths[filename] = str(input_file)
+            file_hashes[filename] = saved["sha256"]
+            
+            # Versão anterior do documento (revisões de DOCX)
+            previous = None
+            if (revisionOf or incremental) and input_file.suffix.lower() == '.docx':
+                previous = await run_in_threadpool(revision_store.find_previous, client_id, filename, revisionOf)
             
-            original_files.append(file.filename)
-            file_paths[file.filename] = str(input_file)
+            # Volume estimado para o escalonador (um passe por idioma; em
+            # revisões, só o que não consta da versão anterior)
+            if previous:
+                previous_versions[filename] = previous
+                file_stats = [await run_in_threadpool(estimate_revision_stats, input_file, sourceLang, lang, previous)
+                              for lang in target_langs]
+                logger.info(f"📝 {filename}: revisão de {previous['filename']} (job {previous['job_id']}), "
+                            f"~{sum(s['tokens'] for s in file_stats)} tokens novos")
+            else:
+                stats = await run_in_threadpool(estimate_document_tokens, str(input_file))
+                file_stats = [stats] * len(target_langs)
+            estimated_tokens += sum(s["tokens"] for s in file_stats)
+            segments += sum(s["segments"] for s in file_stats)
+            file_tokens[filename] = sum(s["tokens"] for s in file_stats)
+        
+        if revisionOf and not previous_versions:
+            raise HTTPException(status_code=404, detail="Versão anterior não encontrada para revisionOf")
+        
+        # Saídas do job (arquivo × idioma), com a chave de cache de cada uma
+        glossary_sha256 = await hash_upload(glossary)
+        outputs = [out for filename in original_files for out in target_outputs(filename, target_langs)]
+        file_keys = {}
+        for slot, lang, _ in outputs:
+            filename = slot.split("|", 1)[0]
+            file_keys[slot] = file_cache_key(file_hashes[filename], sourceLang, lang, model, glossary_sha256)
+        cache_key = request_cache_key(f"{slot}:{file_keys[slot]}" for slot, _, _ in outputs)
+        
+        # Pedido idêntico do mesmo cliente já na fila (ou concluído e não expirado): anexar a ele
+        existing = await run_in_threadpool(queue_manager.find_job_by_cache_key, cache_key, client_id, priority)
+        if existing:
+            job = await run_in_threadpool(queue_manager.get_job, existing.id)
+            logger.info(f"♻️ Pedido idêntico ao job {job.id} ({job.status.value}); reaproveitando")
+            return JSONResponse({
+                "success": True,
+                "jobId": job.id,
+                "position": job.position,
+                "estimatedTime": job.estimated_time,
+                "status": job.status.value,
+                "duplicate": True,
+                "message": "Tradução idêntica já enviada; acompanhando o job existente"
+            })
+        
+        # Documentos já traduzidos com a mesma chave
+        completed_files = {}
+        file_digests = {}
+        for slot, _, name in outputs:
+            cached = await run_in_threadpool(result_cache.materialize, file_keys[slot], workdir / name)
+            if cached:
+                completed_files[slot] = name
+                file_digests[name] = cached["digest"]
         
         # Adicionar à fila
-        queue_job_id = queue_manager.add_job(
+        queued = True
+        queue_job_id = await run_in_threadpool(
+            queue_manager.add_job,
             source_lang=sourceLang,
-            target_lang=targetLang,
+            target_lang=",".join(target_langs),
             original_files=original_files,
-            file_paths=file_paths
+            file_paths=file_paths,
+            client_id=client_id,
+            priority=priority,
+            estimated_tokens=estimated_tokens,
+            segments=segments,
+            model=model,
+            file_tokens=file_tokens,
+            job_id=job_id,
+            cache_key=cache_key,
+            file_keys=file_keys,
+            completed_files=completed_files,
+            file_digests=file_digests,
+            target_langs=target_langs,
+            output_slots=[slot for slot, _, _ in outputs],
+            previous_versions=previous_versions,
+            profile_modes=profile_modes,
+            trace_context=tracer.current_traceparent()
         )
         
         # Programar processamento - remover o background_tasks pois agora o scheduler processa
         # background_tasks.add_task(process_queue_job, queue_job_id)
         
         # Buscar job para retornar informações
-        job = queue_manager.get_job(queue_job_id)
+        job = await run_in_threadpool(queue_manager.get_job, queue_job_id)
+        await run_in_threadpool(storage_gc.track, workdir, "queue_job", expires_at=job.expires_at)
         
         logger.info(f"✅ Job {queue_job_id} adicionado à fila - será processado pelo scheduler")
         
@@ -540,6 +853,7 @@ async def submit_to_queue(
             "jobId": queue_job_id,
             "position": job.position,
             "estimatedTime": job.estimated_time,
+            "revisionOf": {f: p["job_id"] for f, p in previous_versions.items()},
             "message": f"Tradução adicionada à fila. Posição: {job.position}"
         })
         
@@ -552,6 +866,10 @@ async def submit_to_queue(
             status_code=500,
             detail=f"Erro interno: {str(e)}"
         )
+    finally:
+        if not queued:
+            # Pedido recusado (tamanho, tipo, validação) ou anexado a um job existente
+            shutil.rmtree(workdir, ignore_errors=True)
 
 @app.get("/api/queue/status/{job_id}")
 def get_queue_status(job_id: str):
@@ -565,24 +883,117 @@ def get_queue_status(job_id: str):
     if time.time() > job.expires_at:
         raise HTTPException(status_code=410, detail="Job expirado")
     
+    active = job.status in (JobStatus.PENDING, JobStatus.PROCESSING)
+    
     return JSONResponse({
         "id": job.id,
         "status": job.status.value,
         "position": job.position if job.status == JobStatus.PENDING else None,
-        "estimatedTime": job.estimated_time if job.status == JobStatus.PENDING else None,
+        "estimatedTime": job.estimated_time if active else None,
+        "progress": {
+            "segmentsDone": job.segments_done,
+            "segmentsTotal": job.segments,
+            "tokensDone": job.tokens_done,
+            "tokensTotal": job.estimated_tokens
+        } if job.status == JobStatus.PROCESSING else None,
         "originalFiles": job.original_files,
         "translatedFiles": job.translated_files or [],
         "sourceLang": job.source_lang,
         "targetLang": job.target_lang,
+        "targetLangs": job.target_langs or [job.target_lang],
         "createdAt": job.created_at,
         "expiresAt": job.expires_at,
         "downloadUrl": f"/api/queue/download/{job.id}" if job.status == JobStatus.COMPLETED else None,
-        "error": job.error_message
+        "error": job.error_message,
+        "fileErrors": job.file_errors or {},
+        "stageTimes": job_stage_times(job),
+        "fileStageTimes": job.file_stage_times or {},
+        "profile": job.profile,
+        "usage": job.usage,
+        "fileUsage": job.file_usage or {}
     })
 
+def job_stage_times(job) -> Dict[str, float]:
+    """Tempos por etapa do job, com a espera na fila"""
+    stages = {}
+    if job.processing_start:
+        stages["queue_wait"] = round(max(0.0, job.processing_start - job.created_at), 4)
+    stages.update(job.stage_times or {})
+    return stages
+
+def job_snapshot_event(job) -> Dict:
+    """Estado atual de um job no formato dos eventos SSE"""
+    return {
+        "type": "status",
+        "jobId": job.id,
+        "status": job.status.value,
+        "position": job.position if job.status == JobStatus.PENDING else None,
+        "estimatedTime": job.estimated_time if job.status in (JobStatus.PENDING, JobStatus.PROCESSING) else None,
+        "segmentsDone": job.segments_done,
+        "segmentsTotal": job.segments,
+        "tokensDone": job.tokens_done,
+        "tokensTotal": job.estimated_tokens,
+        "error": job.error_message
+    }
+
+@app.get("/api/queue/events/{job_id}")
+async def stream_queue_events(job_id: str, request: Request):
+    """
+    Progresso de um job em tempo real (Server-Sent Events)
+    
+    Envia o estado atual e depois os eventos publicados pelo tradutor
+    (lotes, segmentos, arquivo atual, tempo estimado). Se o job estiver em
+    outro worker, cai para consultas periódicas à fila. O stream termina
+    quando o job conclui ou falha; /api/queue/status continua disponível.
+    """
+    job = await run_in_threadpool(queue_manager.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    
+    async def event_stream():
+        queue = job_events.subscribe(job_id)
+        try:
+            event = job_snapshot_event(job)
+            event.update(job_events.last_event(job_id))
+            last_sent = None
+            
+            while True:
+                if event != last_sent:
+                    yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                    last_sent = event
+                else:
+                    yield ": keep-alive\n\n"
+                
+                if event.get("status") in (JobStatus.COMPLETED.value, JobStatus.ERROR.value):
+                    break
+                if await request.is_disconnected():
+                    break
+                
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_FALLBACK_POLL_S)
+                except asyncio.TimeoutError:
+                    current = await run_in_threadpool(queue_manager.get_job, job_id)
+                    if not current:
+                        break
+                    event = job_snapshot_event(current)
+        finally:
+            job_events.unsubscribe(job_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/queue/download/{job_id}")
-def download_queue_result(job_id: str):
-    """Download do resultado de um job da fila"""
+def download_queue_result(job_id: str, request: Request, format: Optional[str] = None,
+                          lang: Optional[str] = None):
+    """
+    Download do resultado de um job da fila (ZIP; format=file entrega um arquivo único sem ZIP)
+    
+    Em jobs de vários idiomas, lang restringe o download aos arquivos de um idioma.
+    """
+    as_zip = zip_requested(format)
     job = queue_manager.get_job(job_id)
     
     if not job:
@@ -594,118 +1005,284 @@ def download_queue_result(job_id: str):
     if time.time() > job.expires_at:
         raise HTTPException(status_code=410, detail="Download expirado")
     
-    # Buscar arquivo ZIP
+    # Arquivos traduzidos do job
     workdir = DATA_DIR / f"queue_job_{job_id}"
-    zip_path = workdir / "documentos_traduzidos.zip"
+    names = job.translated_files or []
+    zip_name = f"traducao_{job_id}.zip"
+    if lang:
+        target_langs = job.target_langs or [job.target_lang]
+        if lang not in target_langs:
+            raise HTTPException(status_code=404, detail=f"Idioma não faz parte do job: {lang}")
+        if len(target_langs) > 1:
+            slots = {name: slot for slot, name in (job.completed_files or {}).items()}
+            names = [name for name in names if slots.get(name, "").endswith(f"|{lang}")]
+            zip_name = f"traducao_{job_id}_{lang}.zip"
+    paths = [workdir / name for name in names]
     
-    if not zip_path.exists():
+    if not paths or not all(p.exists() for p in paths):
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
     
     logger.info(f"Download do job da fila: {job_id}")
+    storage_gc.touch(workdir)
     
-    return FileResponse(
-        zip_path,
-        filename=f"traducao_{job_id}.zip",
-        media_type="application/zip"
-    )
+    return download_response(request, paths, zip_name, as_zip=as_zip,
+                             digests=job.file_digests)
 
 @app.get("/api/queue/stats")
 def get_queue_stats():
     """Estatísticas da fila"""
     stats = queue_manager.get_queue_stats()
+    # Última coleta de armazenamento deste processo
+    stats["storage"] = storage_gc.last_report
     return JSONResponse(stats)
 
+def require_admin(request: Request):
+    """Exige Authorization: Bearer <ADMIN_TOKEN> (403 sem token configurado ou com token errado)"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if not ADMIN_TOKEN or scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Acesso restrito à administração")
+
+@app.get("/api/usage/report")
+def usage_report(request: Request, days: int = 30, clientId: Optional[str] = None, top: int = USAGE_REPORT_TOP_N):
+    """
+    Uso de tokens e custo estimado por cliente nos últimos days dias, com os
+    documentos mais caros (fila e tradução direta). Exige o token de
+    administração: o relatório expõe clientes, jobs e nomes de arquivos.
+    """
+    require_admin(request)
+    if days < 1 or top < 0:
+        raise HTTPException(status_code=400, detail="Parâmetros inválidos")
+    until = time.time()
+    return JSONResponse(usage_ledger.report(until - days * 86400, until, clientId, top))
+
 async def process_queue_job(job_id: str):
     """Processa um job da fila de tradução (versão async)"""
     return process_queue_job_sync(job_id)
 
-def process_queue_job_sync(job_id: str):
-    """Processa um job da fila de tradução (versão síncrona)"""
-    logger.info(f"🔄 Iniciando processamento do job {job_id}")
+def process_queue_job_sync(job_id: str, lease_token: str = None, cancel: threading.Event = None):
+    """
+    Processa um job da fila de tradução (versão síncrona)
     
-    # Atualizar status para processando
-    queue_manager.update_job_status(job_id, JobStatus.PROCESSING)
+    O job já deve estar reservado (claim_next_job); com lease_token, as
+    gravações na fila só valem se a reserva ainda for a atual. cancel é
+    sinalizado quando o lease é perdido: o processamento para entre
+    arquivos e entre lotes. Arquivos concluídos em
+    uma tentativa anterior são reaproveitados e o DOCX retoma do checkpoint.
+    Os arquivos do job são traduzidos em paralelo (até JOB_FILE_CONCURRENCY)
+    e o resultado mantém a ordem original; o ZIP é montado só no download.
+    Com vários idiomas de destino, cada arquivo é lido uma vez e gera uma
+    saída por idioma.
+    """
+    logger.info(f"🔄 Iniciando processamento do job {job_id}")
     
     job = queue_manager.get_job(job_id)
     if not job:
         logger.error(f"Job {job_id} não encontrado")
         return
+    if job.attempts <= 1 and job.processing_start:
+        metrics.observe("queue_wait_seconds", max(0.0, job.processing_start - job.created_at),
+                        {"priority": job.priority})
+    job_started = time.perf_counter()
     
     workdir = DATA_DIR / f"queue_job_{job_id}"
     logger.info(f"📁 Diretório de trabalho: {workdir}")
     
-    try:
-        outputs = []
-        translated_files = []
-        model = PROFILE_MAP.get("normal", "gpt-5-2025-08-07")  # Usar GPT-5 por padrão
-        
-        logger.info(f"🤖 Usando modelo: {model}")
+    model = job.model or PROFILE_MAP.get("normal", "gpt-5-2025-08-07")  # Usar GPT-5 por padrão
+    progress = JobProgressReporter(job_id, segments_total=job.segments, tokens_total=job.estimated_tokens,
+                                   lease_token=lease_token)
+    completed_files = job.completed_files or {}
+    
+    logger.info(f"🤖 Usando modelo: {model}")
+    if completed_files:
+        logger.info(f"♻️ Retomando job {job_id} (tentativa {job.attempts}): {len(completed_files)} arquivo(s) já concluído(s)")
+    
+    target_langs = job.target_langs or [job.target_lang]
+    
+    def translate_job_file(filename: str) -> List[str]:
+        """Traduz e salva um arquivo do job em todos os idiomas; retorna os nomes traduzidos"""
+        check_cancelled()
+        logger.info(f"📄 Processando arquivo: {filename}")
+        outputs = target_outputs(filename, target_langs)
+        file_tokens = (job.file_tokens or {}).get(filename, 0)
+        segments_done = 0
+        pending = []
         
-        # Processar cada arquivo
-        for filename in job.original_files:
-            logger.info(f"📄 Processando arquivo: {filename}")
+        for slot, lang, translated_name in outputs:
+            output_file = workdir / translated_name
+            
+            done_name = completed_files.get(slot)
+            if done_name and (workdir / done_name).exists():
+                logger.info(f"♻️ Reaproveitando tradução anterior: {done_name}")
+                continue
+            
+            # Traduzido por outro job desde a submissão
+            cache_key = (job.file_keys or {}).get(slot)
+            cached = result_cache.materialize(cache_key, output_file) if cache_key else None
+            if cached:
+                logger.info(f"♻️ Resultado em cache: {filename} ({lang})")
+                queue_manager.mark_file_completed(job_id, slot, translated_name, cached["digest"], lease_token)
+                segments_done += cached["translated_elements"]
+                continue
             
+            pending.append((slot, lang, translated_name))
+        
+        if pending:
             input_file = workdir / filename
             if not input_file.exists():
-                logger.error(f"❌ Arquivo não encontrado: {input_file}")
                 raise Exception(f"Arquivo não encontrado: {filename}")
             
             logger.info(f"✅ Arquivo encontrado: {input_file} (tamanho: {input_file.stat().st_size} bytes)")
+            logger.info(f"📤 Arquivo(s) de saída: {', '.join(name for _, _, name in pending)}")
             
-            # Arquivo de saída
-            base, ext = os.path.splitext(filename)
-            safe_base = "".join(c for c in base if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            output_file = workdir / f"{safe_base}_traduzido{ext}"
-            
-            logger.info(f"📤 Arquivo de saída: {output_file}")
-            
-            # Traduzir
-            logger.info(f"🔄 Iniciando tradução: {job.source_lang} → {job.target_lang}")
-            translation_result = translate_file_professional(
-                str(input_file),
-                str(output_file),
-                None,  # glossário
-                True,  # usar IA
+            # Traduzir (leitura e coleta compartilhadas entre idiomas)
+            langs = [lang for _, lang, _ in pending]
+            logger.info(f"🔄 Iniciando tradução: {job.source_lang} → {', '.join(langs)}")
+            multi = len(target_langs) > 1
+            previous = (job.previous_versions or {}).get(filename)
+            memories = {
+                lang: revision_store.load(previous["job_id"], previous["filename"], job.source_lang, lang)
+                for lang in langs
+            } if previous else None
+            results = translate_file_targets(
+                input_file,
+                {lang: workdir / name for _, lang, name in pending},
                 job.source_lang,
-                job.target_lang,
-                model
+                model,
+                {lang: checkpoint_path_for(job_id, filename, lang if multi else None) for lang in langs},
+                progress.file_callback(filename),
+                coalesce=True,
+                previous=memories,
+                client_id=job.client_id
             )
             
-            if not translation_result.success:
-                error_msg = f"Falha na tradução de {filename}: {'; '.join(translation_result.errors)}"
-                logger.error(f"❌ {error_msg}")
-                raise Exception(error_msg)
+            # Tokens e custo (também quando algum idioma falhou ou o job foi cancelado: as chamadas foram feitas)
+            file_usage = None
+            for _, lang, _ in pending:
+                file_usage = add_usage(file_usage, getattr(results[lang][0], "usage", None))
+            queue_manager.record_file_usage(job_id, filename, file_usage, lease_token)
+            usage_ledger.record(job.client_id, job_id, filename, langs, model, file_usage,
+                                sum(results[lang][2] for _, lang, _ in pending))
+            check_cancelled()
             
-            if not output_file.exists():
-                error_msg = f"Arquivo traduzido não foi criado: {filename}"
-                logger.error(f"❌ {error_msg}")
-                raise Exception(error_msg)
+            # Etapas do tradutor (somadas entre idiomas) mais a finalização aqui
+            file_stages = dict(getattr(next(iter(results.values()))[0], "stage_times", None) or {})
+            errors = []
+            processing_time = 0.0
+            for slot, lang, translated_name in pending:
+                translation_result, original_count, translated_count = results[lang]
+                output_file = workdir / translated_name
+                processing_time = max(processing_time, translation_result.processing_time)
+                
+                if not translation_result.success:
+                    errors.append(f"{lang}: {'; '.join(translation_result.errors) or 'erro desconhecido'}")
+                    continue
+                if not output_file.exists():
+                    errors.append(f"{lang}: arquivo traduzido não foi criado")
+                    continue
+                
+                with stage_timer(file_stages, "finalize"):
+                    digest = file_digest(output_file)
+                    queue_manager.mark_file_completed(job_id, slot, translated_name, digest, lease_token)
+                    segments_done += translated_count
+                    
+                    # Base para a próxima versão do documento
+                    memory = getattr(translation_result, "translation_memory", None)
+                    if memory:
+                        revision_store.save(job_id, job.client_id, filename, job.source_lang, lang, memory)
+                    if getattr(translation_result, "reused_segments", 0):
+                        logger.info(f"📝 {filename} ({lang}): {translation_result.reused_segments} segmentos "
+                                    f"reaproveitados da versão anterior")
+                    
+                    cache_key = (job.file_keys or {}).get(slot)
+                    if cache_key and not translation_result.errors:
+                        result_cache.put(cache_key, output_file, {
+                            "original_elements": original_count,
+                            "translated_elements": translated_count,
+                            "digest": digest
+                        })
+                logger.info(f"✅ {filename} ({lang}): {translated_count}/{original_count} elementos")
             
-            outputs.append(str(output_file))
-            translated_files.append(f"{safe_base}_traduzido{ext}")
+            # Medição de vazão (tokens de todos os idiomas traduzidos agora)
+            pending_tokens = file_tokens * len(pending) // len(target_langs)
+            throughput_model.record(model, os.path.splitext(filename)[1], pending_tokens, processing_time)
+            metrics.observe("translation_file_duration_seconds", processing_time,
+                            {"format": os.path.splitext(filename)[1].lower().lstrip(".")})
+            queue_manager.record_file_stages(job_id, filename, file_stages, lease_token)
+
             
-            logger.info(f"✅ Traduzido: {translation_result.translated_elements}/{translation_result.original_elements} elementos")
+            if errors:
+                raise Exception("; ".join(errors))
         
-        # Criar ZIP
-        zip_path = workdir / "documentos_traduzidos.zip"
-        logger.info(f"📦 Criando arquivo ZIP: {zip_path}")
+        # Arquivo concluído: progresso pleno
+        progress.update(filename, segments_done, file_tokens, force=True)
+        return [name for _, _, name in outputs]
+    
+    def process_file(filename: str) -> List[str]:
+        with tracer.span("queue.file", {
+            "job.id": job_id,
+            "file.name": filename,
+            "file.format": os.path.splitext(filename)[1].lower().lstrip("."),
+            "file.tokens": (job.file_tokens or {}).get(filename, 0),
+            "translation.target_langs": target_langs
+        }):
+            return translate_job_file(filename)
+    
+    profiler = JobProfiler(job_id, job.profile_modes or [])
+    
+    try:
+        translated_files = []
+        file_errors = {}
+        profiler.start()
+        executor = None
         
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-            for file_path in outputs:
-                if os.path.exists(file_path):
-                    z.write(file_path, arcname=os.path.basename(file_path))
-                    logger.info(f"📁 Adicionado ao ZIP: {os.path.basename(file_path)}")
+        try:
+            # Lease perdido: tradutores param entre arquivos e lotes (o contexto segue para as threads)
+            with cancellable(cancel):
+                if profiler.cpu:
+                    # O perfil de CPU cobre a thread do job: arquivos em sequência, nela mesma
+                    logger.info(f"📦 Traduzindo {len(job.original_files)} arquivo(s) em sequência (perfil de CPU)")
+                    outcomes = [(filename, lambda f=filename: process_file(f)) for filename in job.original_files]
+                else:
+                    workers = max(1, min(JOB_FILE_CONCURRENCY, len(job.original_files)))
+                    logger.info(f"📦 Traduzindo {len(job.original_files)} arquivo(s) com {workers} em paralelo")
+                    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{job_id}")
+                    outcomes = [(filename, executor.submit(contextvars.copy_context().run, process_file, filename).result)
+                                for filename in job.original_files]
+            
+                # Consumir na ordem original (arquivo, depois idioma)
+                for filename, outcome in outcomes:
+                    try:
+                        translated_files.extend(outcome())
+                    except Exception as e:
+                        logger.error(f"❌ Erro em {filename}: {e}")
+                        file_errors[filename] = str(e)
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
+            if profiler.modes:
+                queue_manager.record_job_profile(job_id, profiler.finish(workdir), lease_token)
+        
+        if file_errors:
+            raise Exception("; ".join(f"Falha na tradução de {name}: {error}" for name, error in file_errors.items()))
         
         # Atualizar status para concluído
         queue_manager.update_job_status(
             job_id, 
             JobStatus.COMPLETED,
-            translated_files=translated_files
+            translated_files=translated_files,
+            lease_token=lease_token
         )
         
         logger.info(f"✅ Job {job_id} processado com sucesso!")
+        metrics.observe("translation_job_duration_seconds", time.perf_counter() - job_started,
+                        {"status": JobStatus.COMPLETED.value})
         
     except Exception as e:
+        if cancel is not None and cancel.is_set():
+            # Outra reserva é dona do job agora: nada a gravar
+            logger.warning(f"⚠️ Job {job_id} interrompido: lease perdido")
+            return
+        
         logger.error(f"❌ Erro ao processar job {job_id}: {e}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         
@@ -713,8 +1290,12 @@ def process_queue_job_sync(job_id: str):
         queue_manager.update_job_status(
             job_id, 
             JobStatus.ERROR,
-            error_message=str(e)
+            error_message=str(e),
+            lease_token=lease_token,
+            file_errors=file_errors
         )
+        metrics.observe("translation_job_duration_seconds", time.perf_counter() - job_started,
+                        {"status": JobStatus.ERROR.value})
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,272 @@
+import json
+import math
+import os
+import socket
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre gravações do estado deste processo
+METRICS_FLUSH_S = float(os.getenv("METRICS_FLUSH_S", "5"))
+# Arquivo de processo sem atualização por este tempo é considerado encerrado
+METRICS_STALE_S = float(os.getenv("METRICS_STALE_S", "60"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+# Nome → (tipo, descrição, buckets)
+METRICS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "http_request_duration_seconds": ("histogram", "Latência das requisições HTTP por rota", LATENCY_BUCKETS),
+    "queue_wait_seconds": ("histogram", "Espera na fila até o início do processamento", DURATION_BUCKETS),
+    "translation_job_duration_seconds": ("histogram", "Duração do processamento de jobs da fila", DURATION_BUCKETS),
+    "translation_file_duration_seconds": ("histogram", "Duração da tradução de um arquivo por formato", DURATION_BUCKETS),
+    "translation_api_request_duration_seconds": ("histogram", "Latência das chamadas ao modelo", LATENCY_BUCKETS),
+    "translation_api_requests_total": ("counter", "Chamadas ao modelo por resultado", ()),
+    "translation_api_tokens_total": ("counter", "Tokens das chamadas ao modelo por tipo", ()),
+    "translation_api_retries_total": ("counter", "Novas tentativas de chamadas ao modelo", ()),
+    "translation_api_rate_limited_total": ("counter", "Respostas 429 (limite de taxa) do modelo", ()),
+    "cache_requests_total": ("counter", "Consultas a caches por resultado", ()),
+    "translation_segments_reused_total": ("counter", "Segmentos resolvidos sem o modelo", ()),
+    "queue_worker_busy_seconds_total": ("counter", "Tempo dos workers da fila processando jobs", ()),
+    "queue_workers": ("gauge", "Workers da fila nos processos ativos", ()),
+    "queue_workers_busy": ("gauge", "Workers da fila processando um job", ()),
+    "translation_api_in_flight": ("gauge", "Requisições ao modelo em voo no loop assíncrono", ()),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+def _encode(name: str, labels: LabelKey) -> str:
+    return json.dumps([name, labels])
+
+def _decode(key: str) -> Tuple[str, LabelKey]:
+    name, labels = json.loads(key)
+    return name, tuple(tuple(pair) for pair in labels)
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    items = [f'{k}="{escape(v)}"' for k, v in labels]
+    return "{" + ",".join(items) + "}" if items else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class MetricsRegistry:
+    """
+    Métricas no formato Prometheus, agregadas entre processos
+
+    Cada processo (worker do uvicorn) acumula contadores, gauges e
+    histogramas em memória e grava o estado a cada METRICS_FLUSH_S em
+    data/metrics/proc-<host>-<pid>.json. O /metrics de qualquer worker soma
+    os arquivos de todos. Arquivos de processos encerrados (sem atualização
+    por METRICS_STALE_S) têm contadores e histogramas incorporados a um
+    arquivo de acumulado, para os totais não regredirem; seus gauges são
+    descartados.
+    """
+
+    def __init__(self, metrics_dir: str = "data/metrics"):
+        self.metrics_dir = Path(metrics_dir)
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        self.process_file = self.metrics_dir / f"proc-{socket.gethostname()}-{os.getpid()}.json"
+        self.archive_file = self.metrics_dir / "archive.json"
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], List[float]] = {}
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    # ----- Registro -----
+
+    def inc(self, name: str, labels: Dict[str, str] = None, value: float = 1.0):
+        """Soma value a um contador"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Dict[str, str] = None):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def add_gauge(self, name: str, value: float, labels: Dict[str, str] = None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Dict[str, str] = None):
+        """Registra uma observação num histograma (buckets de METRICS)"""
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                # Contagem por bucket (não cumulativa), +Inf, soma
+                hist = self._histograms[key] = [0.0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            else:
+                hist[len(buckets)] += 1
+            hist[-1] += value
+
+    @contextmanager
+    def timer(self, name: str, labels: Dict[str, str] = None):
+        """Observa a duração do bloco"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    # ----- Persistência entre processos -----
+
+    def _snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "updated_at": time.time(),
+                "counters": {_encode(*k): v for k, v in self._counters.items()},
+                "gauges": {_encode(*k): v for k, v in self._gauges.items()},
+                "histograms": {_encode(*k): list(v) for k, v in self._histograms.items()},
+            }
+
+    @staticmethod
+    def _write(path: Path, data: Dict):
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: Path) -> Optional[Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def flush(self):
+        """Grava o estado deste processo"""
+        try:
+            self._write(self.process_file, self._snapshot())
+        except OSError as e:
+            logger.warning(f"Erro ao gravar métricas: {e}")
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.metrics_dir / ".lock", 'a') as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _merge(total: Dict, part: Dict, gauges: bool = True):
+        for key, value in part.get("counters", {}).items():
+            total["counters"][key] = total["counters"].get(key, 0.0) + value
+        if gauges:
+            for key, value in part.get("gauges", {}).items():
+                total["gauges"][key] = total["gauges"].get(key, 0.0) + value
+        for key, values in part.get("histograms", {}).items():
+            current = total["histograms"].get(key)
+            total["histograms"][key] = values if current is None else [a + b for a, b in zip(current, values)]
+
+    def collect(self) -> Dict:
+        """Estado somado de todos os processos (incorpora ao acumulado os encerrados)"""
+        self.flush()
+        now = time.time()
+        with self._file_lock():
+            archive = self._read(self.archive_file) or {"counters": {}, "gauges": {}, "histograms": {}}
+            total = {"counters": dict(archive["counters"]), "gauges": {}, "histograms": dict(archive["histograms"])}
+            archived = False
+
+            for path in self.metrics_dir.glob("proc-*.json"):
+                data = self._read(path)
+                if data is None:
+                    continue
+                if path != self.process_file and now - data.get("updated_at", 0) > METRICS_STALE_S:
+                    self._merge(archive, data, gauges=False)
+                    self._merge(total, data, gauges=False)
+                    path.unlink(missing_ok=True)
+                    archived = True
+                    continue
+                self._merge(total, data)
+
+            if archived:
+                self._write(self.archive_file, archive)
+        return total
+
+    def render(self, extra_gauges: Dict[str, Tuple[str, Dict[LabelKey, float]]] = None) -> str:
+        """Texto no formato de exposição do Prometheus (0.0.4)"""
+        total = self.collect()
+        series: Dict[str, List[Tuple[str, LabelKey, object]]] = {}
+        for kind in ("counters", "gauges", "histograms"):
+            for key, value in total[kind].items():
+                name, labels = _decode(key)
+                series.setdefault(name, []).append((kind, labels, value))
+
+        lines: List[str] = []
+        for name in sorted(series):
+            metric_type, description, buckets = METRICS.get(name, ("untyped", "", ()))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for kind, labels, value in sorted(series[name], key=lambda s: s[1]):
+                if kind != "histograms":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(list(buckets) + [math.inf], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} "
+                                 f"{_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+
+        for name, (description, values) in sorted((extra_gauges or {}).items()):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values.items():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def start_flusher(self, interval_s: float = METRICS_FLUSH_S):
+        """Inicia a gravação periódica do estado deste processo"""
+        if self._flusher and self._flusher.is_alive():
+            return
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, args=(interval_s,),
+                                         daemon=True, name="metrics-flusher")
+        self._flusher.start()
+
+    def stop_flusher(self):
+        """Para a gravação periódica e grava o estado final"""
+        self._stop.set()
+        if self._flusher:
+            self._flusher.join(timeout=5)
+        self.flush()
+
+    def _flush_loop(self, interval_s: float):
+        while not self._stop.wait(interval_s):
+            self.flush()
+
+# Instância global das métricas
+metrics = MetricsRegistry()
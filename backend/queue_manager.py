@@ -3,14 +3,43 @@ import os
 import time
 import uuid
 import threading
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
+from collections import defaultdict
+from contextlib import contextmanager
 from dataclasses import dataclass, asdict
 from enum import Enum
 import logging
+from eta_model import throughput_model
+from job_events import job_events
+from job_profiling import sum_stages
+from usage_ledger import add_usage
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+# Classes de prioridade (menor = atendido primeiro)
+PRIORITY_CLASSES = {"alta": 0, "normal": 1, "baixa": 2}
+DEFAULT_PRIORITY = "normal"
+
+# Jobs até este volume entram como "pequenos" (menor job primeiro)
+SMALL_JOB_TOKENS = int(os.getenv("SMALL_JOB_TOKENS", "20000"))
+# A cada intervalo de espera o job sobe uma classe de prioridade (aging)
+PRIORITY_AGING_S = int(os.getenv("PRIORITY_AGING_S", "900"))
+# Janela considerada no consumo recente de cada cliente (fair share)
+FAIR_SHARE_WINDOW_S = int(os.getenv("FAIR_SHARE_WINDOW_S", "3600"))
+# Custo fixo por arquivo (carregar, salvar) somado à estimativa por tokens
+FILE_OVERHEAD_S = int(os.getenv("FILE_OVERHEAD_S", "10"))
+
+# Lease de processamento: o worker renova por heartbeat; se expirar, o job volta à fila
+JOB_LEASE_S = int(os.getenv("JOB_LEASE_S", "120"))
+JOB_HEARTBEAT_S = int(os.getenv("JOB_HEARTBEAT_S", "30"))
+MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "3"))
+
 class JobStatus(Enum):
     PENDING = "pending"
     PROCESSING = "processing"
@@ -34,6 +63,36 @@ class QueueJob:
     processing_start: float = None
     processing_end: float = None
     file_paths: Dict[str, str] = None
+    client_id: str = None
+    priority: str = DEFAULT_PRIORITY
+    estimated_tokens: int = 0
+    segments: int = 0
+    model: str = None
+    file_tokens: Dict[str, int] = None
+    segments_done: int = 0
+    tokens_done: int = 0
+    progress_updated_at: float = None
+    worker_id: str = None
+    # Identifica a reserva atual: cada claim gera um novo, mesmo para o mesmo worker
+    lease_token: str = None
+    lease_expires_at: float = None
+    heartbeat_at: float = None
+    attempts: int = 0
+    completed_files: Dict[str, str] = None
+    file_errors: Dict[str, str] = None
+    file_digests: Dict[str, Dict] = None
+    cache_key: str = None
+    file_keys: Dict[str, str] = None
+    target_langs: List[str] = None
+    previous_versions: Dict[str, Dict] = None
+    profile_modes: List[str] = None
+    stage_times: Dict[str, float] = None
+    file_stage_times: Dict[str, Dict[str, float]] = None
+    profile: Dict[str, Any] = None
+    trace_context: str = None
+    # Tokens e custo das chamadas ao modelo (todas as tentativas), no total e por arquivo
+    usage: Dict[str, Any] = None
+    file_usage: Dict[str, Dict[str, Any]] = None
     
     def to_dict(self):
         data = asdict(self)
@@ -50,12 +109,28 @@ class QueueManager:
         self.queue_file = Path(queue_file)
         self.queue_file.parent.mkdir(parents=True, exist_ok=True)
         self._lock = threading.Lock()
+        self._lock_file = self.queue_file.with_suffix('.lock')
         self._ensure_queue_file()
     
+    @contextmanager
+    def _locked(self):
+        """Lock entre threads e entre processos (workers do uvicorn)"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_file, 'a') as lock_fd:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_fd, fcntl.LOCK_UN)
+    
     def _ensure_queue_file(self):
         """Cria o arquivo de fila se não existir"""
-        if not self.queue_file.exists():
-            self._save_queue([])
+        with self._locked():
+            if not self.queue_file.exists():
+                self._save_queue([])
     
     def _load_queue(self) -> List[QueueJob]:
         """Carrega a fila do arquivo"""
@@ -69,8 +144,11 @@ class QueueManager:
     def _save_queue(self, queue: List[QueueJob]):
         """Salva a fila no arquivo"""
         try:
-            with open(self.queue_file, 'w', encoding='utf-8') as f:
+            # Escrita atômica: leitores nunca veem um arquivo pela metade
+            tmp_file = self.queue_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump([job.to_dict() for job in queue], f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, self.queue_file)
         except Exception as e:
             logger.error(f"Erro ao salvar fila: {e}")
     
@@ -78,78 +156,289 @@ class QueueManager:
                 source_lang: str, 
                 target_lang: str, 
                 original_files: List[str],
-                file_paths: Dict[str, str]) -> str:
-        """Adiciona um novo job à fila"""
-        with self._lock:
+                file_paths: Dict[str, str],
+                client_id: str = None,
+                priority: str = DEFAULT_PRIORITY,
+                estimated_tokens: int = 0,
+                segments: int = 0,
+                model: str = None,
+                file_tokens: Dict[str, int] = None,
+                job_id: str = None,
+                cache_key: str = None,
+                file_keys: Dict[str, str] = None,
+                completed_files: Dict[str, str] = None,
+                file_digests: Dict[str, Dict] = None,
+                target_langs: List[str] = None,
+                output_slots: List[str] = None,
+                previous_versions: Dict[str, Dict] = None,
+                profile_modes: List[str] = None,
+                trace_context: str = None) -> str:
+        """
+        Adiciona um novo job à fila (job_id: o mesmo do diretório de trabalho)
+        
+        output_slots são as saídas do job, na ordem de entrega (por padrão,
+        uma por arquivo; em jobs de vários idiomas, uma por arquivo e idioma).
+        completed_files traz saídas já resolvidas pelo cache de resultados;
+        se cobrir todas, o job já nasce concluído. previous_versions liga
+        arquivos à versão anterior do documento ({"job_id", "filename"}).
+        profile_modes liga a captura de perfil do job ("cpu", "memory").
+        trace_context (traceparent W3C) liga o processamento ao trace do pedido.
+        """
+        with self._locked():
             queue = self._load_queue()
             
-            job_id = uuid.uuid4().hex[:12]  # ID mais curto
+            job_id = job_id or uuid.uuid4().hex[:12]  # ID mais curto
             created_at = time.time()
             expires_at = created_at + (48 * 60 * 60)  # 48 horas
-            
-            # Calcular posição na fila (apenas jobs pendentes)
-            position = len([j for j in queue if j.status == JobStatus.PENDING]) + 1
-            
-            # Estimar tempo baseado na posição e tamanho dos arquivos
-            base_time_per_file = 30  # 30 segundos por arquivo
-            queue_wait_time = position * 60  # 1 minuto por posição na fila
-            estimated_time = len(original_files) * base_time_per_file + queue_wait_time
+            completed_files = completed_files or {}
+            output_slots = output_slots or original_files
+            cached = bool(output_slots) and all(s in completed_files for s in output_slots)
             
             job = QueueJob(
                 id=job_id,
-                status=JobStatus.PENDING,
+                status=JobStatus.COMPLETED if cached else JobStatus.PENDING,
                 created_at=created_at,
                 expires_at=expires_at,
                 source_lang=source_lang,
                 target_lang=target_lang,
                 original_files=original_files,
-                translated_files=[],
-                position=position,
-                estimated_time=estimated_time,
-                file_paths=file_paths
+                translated_files=[completed_files[s] for s in output_slots] if cached else [],
+                file_paths=file_paths,
+                client_id=client_id,
+                priority=priority if priority in PRIORITY_CLASSES else DEFAULT_PRIORITY,
+                estimated_tokens=estimated_tokens,
+                segments=segments,
+                model=model,
+                file_tokens=file_tokens or {},
+                cache_key=cache_key,
+                file_keys=file_keys or {},
+                completed_files=completed_files,
+                file_digests=file_digests or {},
+                target_langs=target_langs or [target_lang],
+                previous_versions=previous_versions or {},
+                profile_modes=profile_modes or [],
+                trace_context=trace_context
             )
+            if cached:
+                job.processing_start = job.processing_end = created_at
             
+            # Posição e tempo estimado seguem a ordem real do escalonador
             queue.append(job)
-            self._save_queue(queue)
+            self._update_positions(queue)
             
-            logger.info(f"Job {job_id} adicionado à fila. Posição: {position}")
+            if cached:
+                logger.info(f"Job {job_id} resolvido pelo cache de resultados")
+                return job_id
+            logger.info(f"Job {job_id} adicionado à fila. Posição: {job.position} "
+                        f"(~{estimated_tokens} tokens, prioridade {job.priority}, cliente {client_id})")
             return job_id
     
     def get_job(self, job_id: str) -> Optional[QueueJob]:
         """Busca um job pelo ID"""
-        with self._lock:
+        with self._locked():
             queue = self._load_queue()
             for job in queue:
                 if job.id == job_id:
+                    if job.status in (JobStatus.PENDING, JobStatus.PROCESSING):
+                        # Ordem e vazão mudam com o tempo; recalcular sem regravar
+                        self._assign_positions(queue)
                     return job
             return None
     
     def get_next_pending_job(self) -> Optional[QueueJob]:
-        """Retorna o próximo job pendente para processamento"""
-        with self._lock:
+        """Retorna o próximo job pendente segundo o escalonador"""
+        with self._locked():
+            queue = self._load_queue()
+            order = self._schedule_order(queue)
+            return order[0] if order else None
+    
+    def claim_next_job(self, worker_id: str) -> Optional[QueueJob]:
+        """
+        Reserva atomicamente o próximo job para um worker.
+        
+        O job passa a PROCESSING com um lease de JOB_LEASE_S segundos, que o
+        worker deve renovar com heartbeat(). Leases expirados são devolvidos
+        à fila antes da escolha. O job devolvido traz o lease_token desta
+        reserva, exigido por heartbeat() e update_job_status(): uma tentativa
+        anterior do mesmo job (mesmo processo ou não) não altera a atual.
+        """
+        with self._locked():
+            queue = self._load_queue()
+            self._requeue_expired(queue)
+            
+            order = self._schedule_order(queue)
+            if not order:
+                self._save_queue(queue)
+                return None
+            
+            now = time.time()
+            job = order[0]
+            job.status = JobStatus.PROCESSING
+            job.processing_start = now
+            job.worker_id = worker_id
+            job.lease_token = uuid.uuid4().hex
+            job.heartbeat_at = now
+            job.lease_expires_at = now + JOB_LEASE_S
+            job.attempts = (job.attempts or 0) + 1
+            
+            self._update_positions(queue)
+            self._publish_status(job)
+            logger.info(f"Job {job.id} reservado por {worker_id} (tentativa {job.attempts})")
+            return job
+    
+    def heartbeat(self, job_id: str, lease_token: str) -> bool:
+        """Renova o lease de um job; False se a reserva lease_token não é mais a atual"""
+        with self._locked():
             queue = self._load_queue()
             for job in queue:
-                if job.status == JobStatus.PENDING:
-                    return job
-            return None
+                if job.id == job_id:
+                    if job.status != JobStatus.PROCESSING or job.lease_token != lease_token:
+                        return False
+                    now = time.time()
+                    job.heartbeat_at = now
+                    job.lease_expires_at = now + JOB_LEASE_S
+                    self._save_queue(queue)
+                    return True
+            return False
+    
+    def requeue_expired_leases(self) -> int:
+        """Devolve à fila os jobs cujo lease expirou"""
+        with self._locked():
+            queue = self._load_queue()
+            count = self._requeue_expired(queue)
+            if count:
+                self._update_positions(queue)
+            return count
+    
+    def _requeue_expired(self, queue: List[QueueJob]) -> int:
+        """Trata jobs PROCESSING órfãos (worker reiniciado ou travado)"""
+        now = time.time()
+        count = 0
+        for job in queue:
+            if job.status != JobStatus.PROCESSING:
+                continue
+            if job.lease_expires_at and job.lease_expires_at > now:
+                continue
+            
+            count += 1
+            if (job.attempts or 0) >= MAX_JOB_ATTEMPTS:
+                job.status = JobStatus.ERROR
+                job.processing_end = now
+                job.error_message = f"Processamento interrompido {job.attempts} vezes; job abandonado"
+                logger.error(f"Job {job.id} excedeu {MAX_JOB_ATTEMPTS} tentativas")
+            else:
+                job.status = JobStatus.PENDING
+                logger.warning(f"Lease do job {job.id} expirou (worker {job.worker_id}); devolvido à fila")
+            job.worker_id = None
+            job.lease_token = None
+            job.lease_expires_at = None
+            self._publish_status(job)
+        return count
+    
+    @staticmethod
+    def _stale_lease(job: QueueJob, lease_token: Optional[str]) -> bool:
+        """True (e registra) se lease_token foi informado e não é mais a reserva atual do job"""
+        if lease_token and job.lease_token != lease_token:
+            logger.warning(f"Reserva {lease_token[:8]} do job {job.id} não é mais a atual; "
+                           f"atualização ignorada")
+            return True
+        return False
+    
+    def record_file_stages(self, job_id: str, filename: str, stages: Dict[str, float],
+                           lease_token: str = None):
+        """Guarda os tempos por etapa de um arquivo e atualiza o total do job"""
+        with self._locked():
+            queue = self._load_queue()
+            for job in queue:
+                if job.id == job_id:
+                    if self._stale_lease(job, lease_token):
+                        return False
+                    job.file_stage_times = job.file_stage_times or {}
+                    job.file_stage_times[filename] = {k: round(v, 4) for k, v in stages.items()}
+                    job.stage_times = sum_stages(job.file_stage_times.values())
+                    self._save_queue(queue)
+                    return True
+            return False
+    
+    def record_file_usage(self, job_id: str, filename: str, usage: Dict[str, Any], lease_token: str = None):
+        """Soma o uso de tokens de um arquivo (novas tentativas do job também contam)"""
+        with self._locked():
+            queue = self._load_queue()
+            for job in queue:
+                if job.id == job_id:
+                    if self._stale_lease(job, lease_token):
+                        return False
+                    job.file_usage = job.file_usage or {}
+                    job.file_usage[filename] = add_usage(job.file_usage.get(filename), usage)
+                    job.usage = add_usage(job.usage, usage)
+                    self._save_queue(queue)
+                    return True
+            return False
+    
+    def record_job_profile(self, job_id: str, profile: Dict[str, Any], lease_token: str = None):
+        """Guarda o resumo do perfil de CPU/memória do job"""
+        with self._locked():
+            queue = self._load_queue()
+            for job in queue:
+                if job.id == job_id:
+                    if self._stale_lease(job, lease_token):
+                        return False
+                    job.profile = profile
+                    self._save_queue(queue)
+                    return True
+            return False
+    
+    def mark_file_completed(self, job_id: str, filename: str, translated_name: str, digest: Dict = None,
+                            lease_token: str = None):
+        """
+        Registra um arquivo concluído para retomar o job sem refazê-lo
+        
+        digest (SHA-256/CRC-32 do arquivo traduzido) serve ao ETag do download.
+        """
+        with self._locked():
+            queue = self._load_queue()
+            for job in queue:
+                if job.id == job_id:
+                    if self._stale_lease(job, lease_token):
+                        return False
+                    job.completed_files = job.completed_files or {}
+                    job.completed_files[filename] = translated_name
+                    if digest:
+                        job.file_digests = job.file_digests or {}
+                        job.file_digests[translated_name] = digest
+                    self._save_queue(queue)
+                    return True
+            return False
     
     def update_job_status(self, 
                          job_id: str, 
                          status: JobStatus,
                          error_message: str = None,
                          download_url: str = None,
-                         translated_files: List[str] = None):
-        """Atualiza o status de um job"""
-        with self._lock:
+                         translated_files: List[str] = None,
+                         lease_token: str = None,
+                         file_errors: Dict[str, str] = None):
+        """
+        Atualiza o status de um job
+        
+        Com lease_token, a atualização só vale se essa reserva ainda é a atual.
+        """
+        with self._locked():
             queue = self._load_queue()
             for i, job in enumerate(queue):
                 if job.id == job_id:
+                    if self._stale_lease(job, lease_token):
+                        return False
+                    
                     job.status = status
                     
                     if status == JobStatus.PROCESSING:
                         job.processing_start = time.time()
                     elif status in [JobStatus.COMPLETED, JobStatus.ERROR]:
                         job.processing_end = time.time()
+                        job.worker_id = None
+                        job.lease_token = None
+                        job.lease_expires_at = None
                     
                     if error_message:
                         job.error_message = error_message
@@ -160,42 +449,207 @@ class QueueManager:
                     if translated_files:
                         job.translated_files = translated_files
                     
+                    if file_errors is not None:
+                        job.file_errors = file_errors
+                    
                     queue[i] = job
-                    self._save_queue(queue)
                     
-                    # Atualizar posições após mudança de status
+                    # Atualizar posições após mudança de status (salva a fila)
                     self._update_positions(queue)
+                    self._publish_status(job)
                     return True
             return False
     
+    def _publish_status(self, job: QueueJob):
+        """Publica a mudança de status para os assinantes em tempo real"""
+        job_events.publish(job.id, {
+            "type": "status",
+            "jobId": job.id,
+            "status": job.status.value,
+            "error": job.error_message
+        })
+        if job.status in (JobStatus.COMPLETED, JobStatus.ERROR):
+            job_events.forget(job.id)
+    
+    def update_job_progress(self, job_id: str, segments_done: int, tokens_done: int,
+                            lease_token: str = None) -> Optional[int]:
+        """Registra o progresso de um job em processamento; retorna o tempo restante estimado"""
+        with self._locked():
+            queue = self._load_queue()
+            for job in queue:
+                if job.id == job_id:
+                    if self._stale_lease(job, lease_token):
+                        return None
+                    job.segments_done = segments_done
+                    job.tokens_done = tokens_done
+                    job.progress_updated_at = time.time()
+                    
+                    # O trabalho restante muda a estimativa de quem está atrás
+                    self._update_positions(queue)
+                    return job.estimated_time
+            return None
+    
+    def _job_rank(self, job: QueueJob, now: float) -> Tuple:
+        """
+        Chave de ordenação de um job dentro do mesmo cliente.
+        
+        Classe de prioridade efetiva (com aging), depois jobs pequenos antes
+        dos grandes (menor primeiro) e, por fim, ordem de chegada.
+        """
+        wait = max(0.0, now - job.created_at)
+        base_class = PRIORITY_CLASSES.get(job.priority, PRIORITY_CLASSES[DEFAULT_PRIORITY])
+        effective_class = base_class - int(wait // PRIORITY_AGING_S)
+        
+        tokens = job.estimated_tokens or 0
+        if tokens <= SMALL_JOB_TOKENS:
+            return (effective_class, 0, tokens, job.created_at)
+        return (effective_class, 1, 0, job.created_at)
+    
+    def _schedule_order(self, queue: List[QueueJob], now: float = None) -> List[QueueJob]:
+        """
+        Ordem real de atendimento dos jobs pendentes.
+        
+        Cada cliente tem sua própria fila ordenada por _job_rank; a cada passo
+        é atendido o cliente cuja cabeça tem a melhor classe efetiva e, em
+        empate, o que consumiu menos tokens na janela recente (fair share).
+        """
+        now = now or time.time()
+        
+        # Consumo recente por cliente (jobs já iniciados na janela)
+        served = defaultdict(float)
+        for job in queue:
+            if job.status != JobStatus.PENDING and job.processing_start \
+                    and now - job.processing_start < FAIR_SHARE_WINDOW_S:
+                served[job.client_id or ""] += job.estimated_tokens or 0
+        
+        by_client = defaultdict(list)
+        for job in queue:
+            if job.status == JobStatus.PENDING:
+                by_client[job.client_id or ""].append(job)
+        for jobs in by_client.values():
+            jobs.sort(key=lambda j: self._job_rank(j, now))
+        
+        order = []
+        while by_client:
+            client = min(
+                by_client,
+                key=lambda c: (self._job_rank(by_client[c][0], now)[0], served[c], by_client[c][0].created_at)
+            )
+            job = by_client[client].pop(0)
+            if not by_client[client]:
+                del by_client[client]
+            served[client] += max(job.estimated_tokens or 0, 1)
+            order.append(job)
+        return order
+    
+    def _estimate_duration(self, job: QueueJob) -> float:
+        """Duração estimada de um job em segundos, pela vazão observada"""
+        files = len(job.original_files or [])
+        if job.file_tokens:
+            seconds = sum(
+                throughput_model.estimate_seconds(tokens, job.model, Path(name).suffix)
+                for name, tokens in job.file_tokens.items()
+            )
+        else:
+            seconds = throughput_model.estimate_seconds(job.estimated_tokens or 0, job.model)
+        return files * FILE_OVERHEAD_S + seconds
+    
+    def _remaining_duration(self, job: QueueJob, now: float) -> float:
+        """Tempo restante de um job em processamento"""
+        total = self._estimate_duration(job)
+        elapsed = max(0.0, now - (job.processing_start or now))
+        
+        if not job.estimated_tokens or not job.tokens_done:
+            return max(0.0, total - elapsed)
+        
+        done = min(1.0, job.tokens_done / job.estimated_tokens)
+        by_model = total * (1.0 - done)
+        if done < 0.1:
+            return by_model
+        
+        # Extrapolação pelo ritmo real do próprio job, combinada com o modelo
+        by_progress = elapsed * (1.0 - done) / done
+        return (by_model + by_progress) / 2
+    
+    def _assign_positions(self, queue: List[QueueJob]):
+        """Calcula posição e tempo estimado dos pendentes na ordem do escalonador"""
+        now = time.time()
+        
+        # Trabalho restante dos jobs em processamento
+        ahead = 0.0
+        for job in queue:
+            if job.status == JobStatus.PROCESSING:
+                job.estimated_time = int(self._remaining_duration(job, now))
+                ahead += job.estimated_time
+        
+        for i, job in enumerate(self._schedule_order(queue, now)):
+            ahead += self._estimate_duration(job)
+            job.position = i + 1
+            job.estimated_time = int(ahead)
+    
     def _update_positions(self, queue: List[QueueJob]):
         """Atualiza as posições dos jobs pendentes"""
-        pending_jobs = [j for j in queue if j.status == JobStatus.PENDING]
-        for i, job in enumerate(pending_jobs):
-            job.position = i + 1
+        self._assign_positions(queue)
         self._save_queue(queue)
     
-    def cleanup_expired_jobs(self):
-        """Remove jobs expirados"""
-        with self._lock:
+    def cleanup_expired_jobs(self) -> List[str]:
+        """Remove jobs expirados; retorna os ids removidos (arquivos ficam com o GC de armazenamento)"""
+        with self._locked():
             queue = self._load_queue()
             current_time = time.time()
             
             active_queue = []
+            expired = []
             for job in queue:
                 if current_time < job.expires_at:
                     active_queue.append(job)
                 else:
                     logger.info(f"Job {job.id} expirado, removendo da fila")
-                    # Aqui podemos adicionar lógica para limpar arquivos
+                    expired.append(job.id)
             
             if len(active_queue) != len(queue):
                 self._save_queue(active_queue)
                 self._update_positions(active_queue)
+            return expired
     
-    def get_queue_stats(self) -> Dict[str, int]:
-        """Retorna estatísticas da fila"""
-        with self._lock:
+    def find_job_by_cache_key(self, cache_key: str, client_id: str = None,
+                              priority: str = DEFAULT_PRIORITY) -> Optional[QueueJob]:
+        """
+        Job do mesmo cliente, não expirado e sem erro, com o mesmo conteúdo,
+        idiomas, modelo e glossário
+        
+        Só jobs de client_id são considerados: o pedido passaria a ver o
+        status, os nomes de arquivo e o download de quem o enviou. Um job
+        ainda pendente só serve se sua prioridade não for menor que priority
+        (o pedido não espera atrás da fila de um job de prioridade baixa).
+        Entre clientes, o reaproveitamento fica com o cache de resultados,
+        por documento e dentro do próprio job.
+        """
+        if not cache_key:
+            return None
+        now = time.time()
+        wanted = PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES[DEFAULT_PRIORITY])
+        with self._locked():
+            for job in self._load_queue():
+                if job.cache_key != cache_key or job.status == JobStatus.ERROR or now >= job.expires_at:
+                    continue
+                if (job.client_id or None) != (client_id or None):
+                    continue
+                if job.status == JobStatus.PENDING and \
+                        PRIORITY_CLASSES.get(job.priority, PRIORITY_CLASSES[DEFAULT_PRIORITY]) > wanted:
+                    continue
+                return job
+        return None
+    
+    def active_job_ids(self) -> List[str]:
+        """Ids dos jobs pendentes ou em processamento"""
+        with self._locked():
+            return [job.id for job in self._load_queue()
+                    if job.status in (JobStatus.PENDING, JobStatus.PROCESSING)]
+    
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas da fila (usage: tokens e custo dos jobs ainda na fila)"""
+        with self._locked():
             queue = self._load_queue()
             stats = {
                 'total': len(queue),
@@ -204,7 +658,84 @@ class QueueManager:
                 'completed': len([j for j in queue if j.status == JobStatus.COMPLETED]),
                 'error': len([j for j in queue if j.status == JobStatus.ERROR])
             }
+            pending_since = [j.created_at for j in queue if j.status == JobStatus.PENDING]
+            stats['oldest_pending_s'] = int(time.time() - min(pending_since)) if pending_since else 0
+            usage = None
+            for job in queue:
+                if job.usage:
+                    usage = add_usage(usage, job.usage)
+            stats['usage'] = add_usage(usage, None)
             return stats
 
 # Instância global do gerenciador de fila
-queue_manager = QueueManager()
\ No newline at end of file
+queue_manager = QueueManager()
+
+# Intervalo mínimo entre gravações de progresso de um job
+PROGRESS_SAVE_INTERVAL_S = float(os.getenv("PROGRESS_SAVE_INTERVAL_S", "2"))
+
+class JobProgressReporter:
+    """
+    Agrega o progresso dos arquivos de um job
+    
+    Cada atualização vira um evento em tempo real (SSE); a gravação na fila,
+    que serve de fallback para polling, respeita um intervalo mínimo.
+    """
+    
+    def __init__(self, job_id: str, manager: QueueManager = None,
+                 segments_total: int = 0, tokens_total: int = 0, lease_token: str = None):
+        self.job_id = job_id
+        self.manager = manager or queue_manager
+        self.lease_token = lease_token
+        self.segments_total = segments_total
+        self.tokens_total = tokens_total
+        self._files: Dict[str, Tuple[int, int]] = {}
+        self._batches: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._estimated_time = None
+    
+    def file_callback(self, filename: str):
+        """Callback de progresso para os tradutores de um arquivo"""
+        def callback(segments_done: int, tokens_done: int,
+                     batches_done: int = None, batches_total: int = None):
+            self.update(filename, segments_done, tokens_done, batches_done=batches_done, batches_total=batches_total)
+        return callback
+    
+    def update(self, filename: str, segments_done: int, tokens_done: int, force: bool = False,
+               batches_done: int = None, batches_total: int = None):
+        """Atualiza o progresso de um arquivo"""
+        with self._lock:
+            self._files[filename] = (segments_done, tokens_done)
+            if batches_total is not None:
+                self._batches[filename] = (batches_done or 0, batches_total)
+            elif force and filename in self._batches:
+                total = self._batches[filename][1]
+                self._batches[filename] = (total, total)
+            
+            segments = sum(s for s, _ in self._files.values())
+            tokens = sum(t for _, t in self._files.values())
+            now = time.time()
+            save = force or now - self._last_save >= PROGRESS_SAVE_INTERVAL_S
+            if save:
+                self._last_save = now
+        
+        if save:
+            self._estimated_time = self.manager.update_job_progress(self.job_id, segments, tokens, self.lease_token)
+        
+        with self._lock:
+            batches_done = sum(d for d, _ in self._batches.values())
+            batches_total = sum(t for _, t in self._batches.values())
+        
+        job_events.publish(self.job_id, {
+            "type": "progress",
+            "jobId": self.job_id,
+            "status": JobStatus.PROCESSING.value,
+            "currentFile": filename,
+            "batchesDone": batches_done,
+            "batchesTotal": batches_total,
+            "segmentsDone": segments,
+            "segmentsTotal": self.segments_total,
+            "tokensDone": tokens,
+            "tokensTotal": self.tokens_total,
+            "estimatedTime": self._estimated_time
+        })
@@ -1,15 +1,28 @@
+import os
+import socket
 import threading
 import time
+import uuid
 import logging
-from queue_manager import queue_manager, JobStatus
+from queue_manager import queue_manager, JobStatus, JOB_HEARTBEAT_S
+from storage_gc import storage_gc
+from metrics import metrics
+from tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+# Jobs processados simultaneamente por processo (permite agrupar jobs pequenos)
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", "4"))
+# Intervalo entre rodadas de limpeza (fila e armazenamento)
+STORAGE_GC_INTERVAL_S = int(os.getenv("STORAGE_GC_INTERVAL_S", "600"))
+
 class QueueScheduler:
     def __init__(self):
         self.running = False
         self.cleanup_thread = None
-        self.processor_thread = None
+        self.processor_threads = []
+        # Identifica este processo nos jobs reservados (logs e traces); cada reserva tem seu lease_token
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
     
     def start(self):
         """Inicia o scheduler de limpeza e processamento"""
@@ -22,19 +35,24 @@ class QueueScheduler:
         self.cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
         self.cleanup_thread.start()
         
-        # Thread de processamento da fila
-        self.processor_thread = threading.Thread(target=self._processor_loop, daemon=True)
-        self.processor_thread.start()
+        # Threads de processamento da fila
+        self.processor_threads = []
+        for i in range(max(1, QUEUE_WORKERS)):
+            thread = threading.Thread(target=self._processor_loop, daemon=True, name=f"queue-worker-{i}")
+            thread.start()
+            self.processor_threads.append(thread)
+        metrics.set_gauge("queue_workers", len(self.processor_threads))
         
-        logger.info("🔄 Scheduler iniciado (limpeza + processamento)")
+        logger.info(f"🔄 Scheduler iniciado (limpeza + {len(self.processor_threads)} processador(es))")
     
     def stop(self):
         """Para o scheduler"""
         self.running = False
         if self.cleanup_thread:
             self.cleanup_thread.join(timeout=5)
-        if self.processor_thread:
-            self.processor_thread.join(timeout=5)
+        for thread in self.processor_threads:
+            thread.join(timeout=5)
+        metrics.set_gauge("queue_workers", 0)
         logger.info("⏹️ Scheduler parado")
     
     def _cleanup_loop(self):
@@ -42,10 +60,15 @@ class QueueScheduler:
         while self.running:
             try:
                 # Executar limpeza de jobs expirados
-                queue_manager.cleanup_expired_jobs()
+                expired = queue_manager.cleanup_expired_jobs()
+                queue_manager.requeue_expired_leases()
+                
+                # Arquivos de jobs removidos, expirados e excesso sobre a cota
+                storage_gc.release_jobs(expired)
+                storage_gc.run(active_jobs=queue_manager.active_job_ids())
                 
-                # Aguardar 1 hora antes da próxima limpeza
-                for _ in range(3600):  # 3600 segundos = 1 hora
+                # Aguardar antes da próxima limpeza
+                for _ in range(STORAGE_GC_INTERVAL_S):
                     if not self.running:
                         break
                     time.sleep(1)
@@ -58,18 +81,41 @@ class QueueScheduler:
         """Loop principal de processamento da fila"""
         while self.running:
             try:
-                # Buscar próximo job pendente
-                job = queue_manager.get_next_pending_job()
+                # Reservar próximo job (devolve à fila leases expirados)
+                job = queue_manager.claim_next_job(self.worker_id)
                 
                 if job:
                     logger.info(f"📋 Processando job {job.id} da fila")
                     
-                    # Marcar como processando
-                    queue_manager.update_job_status(job.id, JobStatus.PROCESSING)
+                    # Heartbeat mantém o lease enquanto o job processa; se o perder, cancela o job
+                    done = threading.Event()
+                    lost = threading.Event()
+                    heartbeat_thread = threading.Thread(
+                        target=self._heartbeat_loop, args=(job.id, job.lease_token, done, lost), daemon=True
+                    )
+                    heartbeat_thread.start()
                     
                     # Importar e executar processamento
-                    from main import process_queue_job_sync
-                    process_queue_job_sync(job.id)
+                    metrics.add_gauge("queue_workers_busy", 1)
+                    busy_since = time.perf_counter()
+                    try:
+                        from main import process_queue_job_sync
+                        # Continua o trace do pedido que criou o job
+                        with tracer.span("queue.job", {
+                            "job.id": job.id,
+                            "job.attempt": job.attempts,
+                            "job.priority": job.priority,
+                            "job.files": len(job.original_files),
+                            "job.estimated_tokens": job.estimated_tokens,
+                            "queue.wait_s": round(max(0.0, (job.processing_start or time.time()) - job.created_at), 3),
+                            "worker.id": self.worker_id
+                        }, parent=job.trace_context, kind="consumer"):
+                            process_queue_job_sync(job.id, job.lease_token, lost)
+                    finally:
+                        done.set()
+                        heartbeat_thread.join(timeout=5)
+                        metrics.add_gauge("queue_workers_busy", -1)
+                        metrics.inc("queue_worker_busy_seconds_total", value=time.perf_counter() - busy_since)
                 else:
                     # Não há jobs pendentes, aguardar 10 segundos
                     time.sleep(10)
@@ -78,5 +124,16 @@ class QueueScheduler:
                 logger.error(f"Erro no processador da fila: {e}")
                 time.sleep(30)  # Aguardar 30 segundos em caso de erro
 
+    def _heartbeat_loop(self, job_id: str, lease_token: str, done: threading.Event, lost: threading.Event):
+        """Renova o lease do job até o processamento terminar; sinaliza lost se a reserva for perdida"""
+        while not done.wait(JOB_HEARTBEAT_S):
+            try:
+                if not queue_manager.heartbeat(job_id, lease_token):
+                    logger.warning(f"⚠️ Lease do job {job_id} perdido; interrompendo o processamento")
+                    lost.set()
+                    return
+            except Exception as e:
+                logger.error(f"Erro no heartbeat do job {job_id}: {e}")
+
 # Instância global do scheduler
 scheduler = QueueScheduler()
\ No newline at end of file
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Agrupamento de requisições entre jobs pequenos
+
+Jobs pequenos (um DOCX de uma página com poucas dezenas de runs) virariam
+cada um uma requisição própria com o prompt completo. O RequestCoalescer
+junta os segmentos pendentes de vários jobs com o mesmo par de idiomas e
+modelo em lotes compartilhados, com ids prefixados pelo job de origem, e
+devolve a cada job apenas as suas traduções.
+"""
+
+import os
+import time
+import uuid
+import threading
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from document_stats import estimate_tokens
+from translation_backends import UsageMeter, metered, record_usage, split_usage
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Tempo que um grupo espera por outros jobs antes de ser enviado
+COALESCE_WINDOW_MS = int(os.getenv("COALESCE_WINDOW_MS", "200"))
+# Orçamento de tokens de cada lote compartilhado
+COALESCE_BATCH_TOKENS = int(os.getenv("COALESCE_BATCH_TOKENS", "6000"))
+# Apenas arquivos com até este volume pendente são agrupados
+COALESCE_MAX_JOB_TOKENS = int(os.getenv("COALESCE_MAX_JOB_TOKENS", "4000"))
+# Lotes compartilhados enviados em paralelo
+COALESCE_WORKERS = int(os.getenv("COALESCE_WORKERS", "4"))
+# Espera máxima de um job pelos seus lotes compartilhados (as novas tentativas estão incluídas)
+COALESCE_TIMEOUT_S = float(os.getenv("COALESCE_TIMEOUT_S", "3600"))
+
+# Assinatura de pedir_traducao_structured(lote, target_lang, source_lang, model)
+TranslateFn = Callable[[List[Dict], str, str, Optional[str]], Dict[str, str]]
+GroupKey = Tuple[str, str, str]
+
+class _PendingRequest:
+    """Segmentos de um job aguardando tradução em lote compartilhado"""
+
+    def __init__(self, items: List[Dict]):
+        self.namespace = uuid.uuid4().hex[:8]
+        self.items = items
+        self.tokens = sum(estimate_tokens(item["text"]) for item in items)
+        self.result: Dict[str, str] = {}
+        self.errors: List[str] = []
+        self.done = threading.Event()
+        # Span do job que pediu (o lote compartilhado fica ligado a ele)
+        self.trace_context = tracer.current_context()
+        # Parte do uso dos lotes compartilhados que cabe a este job
+        self.usage = UsageMeter()
+
+class RequestCoalescer:
+    """Agrupa segmentos de vários jobs em lotes compartilhados por (origem, destino, modelo)"""
+
+    def __init__(self, translate_fn: TranslateFn,
+                 window_s: float = COALESCE_WINDOW_MS / 1000,
+                 batch_tokens: int = COALESCE_BATCH_TOKENS,
+                 workers: int = COALESCE_WORKERS,
+                 timeout_s: float = COALESCE_TIMEOUT_S):
+        self.translate_fn = translate_fn
+        self.window_s = window_s
+        self.batch_tokens = batch_tokens
+        self.timeout_s = timeout_s
+        self._groups: Dict[GroupKey, List[_PendingRequest]] = defaultdict(list)
+        self._opened_at: Dict[GroupKey, float] = {}
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coalescer")
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def translate(self, items: List[Dict], source_lang: str, target_lang: str,
+                  model: str) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Traduz os segmentos de um job (itens com "id" e "text"), possivelmente
+        junto com segmentos de outros jobs. Bloqueia até o resultado.
+
+        Retorna (traduções por id, erros dos lotes que falharam). Levanta
+        TimeoutError se os lotes não terminarem em timeout_s.
+        """
+        if not items:
+            return {}, []
+
+        request = _PendingRequest(items)
+        key = (source_lang, target_lang, model or "")
+
+        with self._cond:
+            self._ensure_dispatcher()
+            self._groups[key].append(request)
+            self._opened_at.setdefault(key, time.monotonic())
+            self._cond.notify()
+
+        if not request.done.wait(timeout=self.timeout_s):
+            raise TimeoutError(f"Lote compartilhado {source_lang}→{target_lang} sem resposta em {self.timeout_s:.0f}s")
+        # O uso rateado volta ao medidor de quem pediu
+        for model_name, usage in request.usage.by_model().items():
+            record_usage(model_name, usage)
+        return request.result, request.errors
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True, name="coalescer-dispatch")
+            self._dispatcher.start()
+
+    def _ready_groups(self, now: float) -> List[GroupKey]:
+        """Grupos cuja janela terminou ou que já enchem um lote"""
+        ready = []
+        for key, requests in self._groups.items():
+            tokens = sum(r.tokens for r in requests)
+            if now - self._opened_at[key] >= self.window_s or tokens >= self.batch_tokens:
+                ready.append(key)
+        return ready
+
+    def _dispatch_loop(self):
+        """Envia grupos prontos para o pool de lotes compartilhados"""
+        while True:
+            with self._cond:
+                while not self._groups:
+                    self._cond.wait()
+
+                now = time.monotonic()
+                ready = self._ready_groups(now)
+                if not ready:
+                    oldest = min(self._opened_at.values())
+                    self._cond.wait(timeout=max(0.0, oldest + self.window_s - now))
+                    continue
+
+                batches = []
+                for key in ready:
+                    batches.append((key, self._groups.pop(key)))
+                    self._opened_at.pop(key, None)
+
+            for key, requests in batches:
+                try:
+                    self._submit_group(key, requests)
+                except Exception as e:
+                    # Nenhum lote do grupo foi enviado: libera os jobs com erro
+                    error = f"Erro ao montar o lote compartilhado: {e}"
+                    logger.error(error)
+                    for request in requests:
+                        request.errors.append(error)
+                        request.done.set()
+
+    def _submit_group(self, key: GroupKey, requests: List[_PendingRequest]):
+        """Divide um grupo em lotes compartilhados e envia cada um ao pool"""
+        source_lang, target_lang, model = key
+
+        # Ids prefixados pelo job de origem: "<namespace>:<id do run>"
+        lotes, atual, tokens = [], [], 0
+        for request in requests:
+            for item in request.items:
+                item_tokens = estimate_tokens(item["text"])
+                if atual and tokens + item_tokens > self.batch_tokens:
+                    lotes.append(atual)
+                    atual, tokens = [], 0
+                atual.append({**item, "id": f"{request.namespace}:{item['id']}"})
+                tokens += item_tokens
+        if atual:
+            lotes.append(atual)
+
+        logger.info(f"Lote compartilhado {source_lang}→{target_lang}: {len(requests)} job(s), "
+                    f"{sum(len(r.items) for r in requests)} segmentos em {len(lotes)} requisição(ões)")
+
+        # Cada job é liberado quando todos os lotes com segmentos seus terminarem
+        by_namespace = {r.namespace: r for r in requests}
+        outstanding = defaultdict(int)
+        for lote in lotes:
+            for namespace in {item["id"].split(":", 1)[0] for item in lote}:
+                outstanding[namespace] += 1
+        state_lock = threading.Lock()
+
+        for lote in lotes:
+            try:
+                self._executor.submit(self._run_lote, key, lote, by_namespace, outstanding, state_lock)
+            except Exception as e:
+                error = f"Erro ao enviar o lote compartilhado: {e}"
+                logger.error(error)
+                self._release(lote, by_namespace, outstanding, state_lock, error)
+
+    def _run_lote(self, key: GroupKey, lote: List[Dict], by_namespace: Dict[str, _PendingRequest],
+                  outstanding: Dict[str, int], state_lock: threading.Lock):
+        """Traduz um lote compartilhado e devolve a cada job o que é seu"""
+        source_lang, target_lang, model = key
+        error = None
+        try:
+            namespaces = {item["id"].split(":", 1)[0] for item in lote}
+
+            # O lote entra no trace do primeiro job e fica ligado aos demais
+            contexts = [by_namespace[ns].trace_context for ns in sorted(namespaces) if by_namespace[ns].trace_context]
+            with tracer.span("translate.shared_batch", {"batch.jobs": len(namespaces), "batch.segments": len(lote)},
+                             parent=contexts[0] if contexts else None, links=contexts[1:]), metered() as meter:
+                translations = self.translate_fn(lote, target_lang, source_lang, model or None)
+
+            # Uso do lote rateado entre os jobs pelos tokens de cada um
+            ordered = sorted(namespaces)
+            weights = [sum(estimate_tokens(item["text"]) for item in lote if item["id"].startswith(ns + ":"))
+                       for ns in ordered]
+            for model_name, usage in meter.by_model().items():
+                for namespace, part in zip(ordered, split_usage(usage, weights)):
+                    by_namespace[namespace].usage.add(model_name, part)
+
+            with state_lock:
+                for scoped_id, text in translations.items():
+                    namespace, _, run_id = scoped_id.partition(":")
+                    request = by_namespace.get(namespace)
+                    if request is not None:
+                        request.result[run_id] = text
+        except Exception as e:
+            error = f"Erro no lote compartilhado: {e}"
+            logger.error(error)
+        finally:
+            self._release(lote, by_namespace, outstanding, state_lock, error)
+
+    @staticmethod
+    def _release(lote: List[Dict], by_namespace: Dict[str, _PendingRequest], outstanding: Dict[str, int],
+                 state_lock: threading.Lock, error: Optional[str]):
+        """Conta o lote como concluído para cada job; o job é liberado no último lote seu"""
+        with state_lock:
+            for namespace in {item["id"].split(":", 1)[0] for item in lote}:
+                request = by_namespace[namespace]
+                if error:
+                    request.errors.append(error)
+                outstanding[namespace] -= 1
+                if outstanding[namespace] <= 0:
+                    request.done.set()
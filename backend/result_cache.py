@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from storage_gc import storage_gc
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def file_cache_key(file_sha256: str, source_lang: str, target_lang: str, model: str,
+                   glossary_sha256: str = "") -> str:
+    """Chave do resultado de um documento: (arquivo, origem, destino, modelo, glossário)"""
+    raw = "|".join([file_sha256, source_lang or "", target_lang or "", model or "", glossary_sha256 or ""])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def request_cache_key(file_keys: Iterable[str]) -> str:
+    """Chave de um pedido com vários arquivos (nome do arquivo e chave de cada um)"""
+    return hashlib.sha256("\n".join(file_keys).encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """
+    Cache de documentos traduzidos inteiros
+
+    Cada entrada é um diretório data/result_cache/<chave>/ com o arquivo
+    traduzido e um meta.json (contagens e digest). A gravação é atômica
+    (diretório temporário + rename), então vários processos podem
+    consultar e gravar sem lock. A expiração e a cota ficam com o
+    StorageGC, como os demais artefatos.
+    """
+
+    def __init__(self, cache_dir: str = "data/result_cache"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Metadados da entrada (com "path" do arquivo traduzido) ou None"""
+        entry = self._entry(key)
+        try:
+            with open(entry / "meta.json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            metrics.inc("cache_requests_total", {"cache": "result", "result": "miss"})
+            return None
+
+        path = entry / meta["filename"]
+        if not path.exists():
+            metrics.inc("cache_requests_total", {"cache": "result", "result": "miss"})
+            return None
+        storage_gc.touch(entry)
+        metrics.inc("cache_requests_total", {"cache": "result", "result": "hit"})
+        return {**meta, "path": str(path)}
+
+    def put(self, key: str, output_path: Path, meta: Dict):
+        """Guarda o resultado de um documento traduzido"""
+        entry = self._entry(key)
+        if (entry / "meta.json").exists():
+            return
+
+        tmp = self.cache_dir / f".tmp-{uuid.uuid4().hex}"
+        try:
+            tmp.mkdir()
+            output_path = Path(output_path)
+            _link_or_copy(output_path, tmp / output_path.name)
+            with open(tmp / "meta.json", 'w', encoding='utf-8') as f:
+                json.dump({**meta, "filename": output_path.name, "created_at": time.time()}, f, ensure_ascii=False)
+            os.rename(tmp, entry)
+            storage_gc.track(entry, "result")
+        except OSError as e:
+            # Outro processo gravou a mesma chave primeiro
+            if not (entry / "meta.json").exists():
+                logger.warning(f"Erro ao gravar cache de resultado: {e}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def materialize(self, key: str, dest: Path) -> Optional[Dict]:
+        """Copia (hard link, se possível) o resultado em cache para dest; retorna os metadados"""
+        cached = self.get(key)
+        if not cached:
+            return None
+        try:
+            _link_or_copy(Path(cached["path"]), Path(dest))
+        except OSError as e:
+            logger.warning(f"Erro ao reaproveitar cache de resultado: {e}")
+            return None
+        return cached
+
+def _link_or_copy(src: Path, dest: Path):
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+# Instância global do cache de resultados
+result_cache = ResultCache()
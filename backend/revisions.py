@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+from storage_gc import storage_gc
+
+logger = logging.getLogger(__name__)
+
+# Marcas de versão no fim do nome: "contrato_v2", "contrato rev3", "contrato (1)", "contrato-final"
+_VERSION_RE = re.compile(
+    r"([\s_.-]*(\(\d+\)|v\d+|rev\d+|vers[aã]o\s*\d+|version\s*\d+|final|draft|minuta|\d{4}-?\d{2}-?\d{2}))+$",
+    re.IGNORECASE
+)
+
+def document_lineage(filename: str) -> str:
+    """Nome do documento sem marcas de versão (contrato_v3.docx → contrato.docx)"""
+    stem, ext = os.path.splitext(filename)
+    base = _VERSION_RE.sub("", stem).strip(" _.-") or stem
+    return f"{base.lower()}{ext.lower()}"
+
+class RevisionStore:
+    """
+    Traduções por segmento de versões anteriores de um documento
+
+    Cada job da fila guarda, por arquivo e idioma, o mapa texto original →
+    tradução em data/revisions/rev-<job>/. Um índice liga (cliente, nome do
+    documento sem marca de versão) ao job mais recente, para que uma nova
+    versão encontre a anterior automaticamente; o cliente também pode
+    indicar o job anterior. Só os segmentos novos ou alterados vão ao modelo.
+    """
+
+    def __init__(self, base_dir: str = "data/revisions"):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.base_dir / "index.json"
+        self._lock = threading.Lock()
+        self._lock_file = self.base_dir / "index.lock"
+
+    @contextmanager
+    def _locked(self):
+        """Lock entre threads e entre processos (workers do uvicorn)"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_file, 'a') as lock_fd:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self.base_dir / f"rev-{job_id}"
+
+    @staticmethod
+    def _lineage_key(client_id: str, filename: str) -> str:
+        return hashlib.sha256(f"{client_id or ''}|{document_lineage(filename)}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _memory_name(filename: str, source_lang: str, target_lang: str) -> str:
+        raw = f"{filename}|{source_lang}|{target_lang}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:24] + ".json"
+
+    @staticmethod
+    def _write_json(path: Path, data):
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, job_id: str, client_id: str, filename: str, source_lang: str, target_lang: str,
+             memory: Dict[str, str]):
+        """Guarda as traduções de um arquivo do job e o torna a versão mais recente do documento"""
+        if not memory:
+            return
+        job_dir = self._job_dir(job_id)
+        try:
+            job_dir.mkdir(parents=True, exist_ok=True)
+            self._write_json(job_dir / self._memory_name(filename, source_lang, target_lang), memory)
+
+            with self._locked():
+                manifest = self._read_json(job_dir / "manifest.json") or {"client_id": client_id, "files": []}
+                if filename not in manifest["files"]:
+                    manifest["files"].append(filename)
+                    self._write_json(job_dir / "manifest.json", manifest)
+
+                index = self._read_json(self.index_file) or {}
+                index[self._lineage_key(client_id, filename)] = {
+                    "job_id": job_id, "filename": filename, "updated_at": time.time()
+                }
+                self._write_json(self.index_file, index)
+            storage_gc.track(job_dir, "revision")
+        except OSError as e:
+            logger.warning(f"Erro ao guardar traduções para revisões: {e}")
+
+    def load(self, job_id: str, filename: str, source_lang: str, target_lang: str) -> Dict[str, str]:
+        """Traduções (texto original → tradução) de um arquivo de um job anterior"""
+        path = self._job_dir(job_id) / self._memory_name(filename, source_lang, target_lang)
+        memory = self._read_json(path) or {}
+        if memory:
+            storage_gc.touch(self._job_dir(job_id))
+        return memory
+
+    def job_files(self, job_id: str, client_id: str) -> Optional[List[str]]:
+        """Arquivos guardados de um job do mesmo cliente (None se não houver)"""
+        manifest = self._read_json(self._job_dir(job_id) / "manifest.json")
+        if not manifest or manifest.get("client_id") != client_id:
+            return None
+        return manifest["files"]
+
+    def find_previous(self, client_id: str, filename: str, revision_of: str = None) -> Optional[Dict]:
+        """
+        Versão anterior de um documento: {"job_id", "filename"} ou None
+
+        Com revision_of, procura no job indicado (o único arquivo, ou o de
+        mesmo nome sem marca de versão); sem ele, usa o índice.
+        """
+        if revision_of:
+            files = self.job_files(revision_of, client_id) or []
+            if len(files) == 1:
+                return {"job_id": revision_of, "filename": files[0]}
+            lineage = document_lineage(filename)
+            for prev in files:
+                if document_lineage(prev) == lineage:
+                    return {"job_id": revision_of, "filename": prev}
+            return None
+
+        with self._locked():
+            entry = (self._read_json(self.index_file) or {}).get(self._lineage_key(client_id, filename))
+        if not entry or not self._job_dir(entry["job_id"]).exists():
+            return None
+        return {"job_id": entry["job_id"], "filename": entry["filename"]}
+
+# Instância global das traduções para revisões
+revision_store = RevisionStore()
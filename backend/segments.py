@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Preparação de segmentos independente do idioma de destino
+
+Deduplicação de textos repetidos e descarte de segmentos que não têm o
+que traduzir (números, pontuação, URLs, e-mails). É feita uma única vez
+por documento e compartilhada por todos os idiomas de destino.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+# Pelo menos uma letra (qualquer alfabeto)
+_LETTER_RE = re.compile(r"[^\W\d_]")
+_URL_RE = re.compile(r"^(https?://|www\.)\S+$", re.IGNORECASE)
+_EMAIL_RE = re.compile(r"^[\w.+-]+@[\w-]+(\.[\w-]+)+$")
+
+def is_translatable(text: str) -> bool:
+    """Falso para segmentos sem letras, URLs e e-mails (mantidos como no original)"""
+    text = text.strip()
+    if not _LETTER_RE.search(text):
+        return False
+    return not (_URL_RE.match(text) or _EMAIL_RE.match(text))
+
+def unique_segments(items: List[Dict]) -> Tuple[List[Dict], Dict[str, List[str]]]:
+    """
+    Segmentos únicos e traduzíveis
+
+    items são dicionários com "id" e "text". Retorna (representantes, grupos):
+    um item por texto distinto (o da primeira ocorrência) e, para cada id
+    representante, os ids de todas as ocorrências.
+    """
+    representantes: List[Dict] = []
+    grupos: Dict[str, List[str]] = {}
+    por_texto: Dict[str, str] = {}
+
+    for item in items:
+        if not is_translatable(item["text"]):
+            continue
+        rep_id = por_texto.get(item["text"])
+        if rep_id is None:
+            por_texto[item["text"]] = item["id"]
+            representantes.append(item)
+            grupos[item["id"]] = [item["id"]]
+        else:
+            grupos[rep_id].append(item["id"])
+
+    return representantes, grupos
+
+def expand_translations(traducoes: Dict[str, str], grupos: Dict[str, List[str]]) -> Dict[str, str]:
+    """Replica a tradução de cada representante para todas as ocorrências do texto"""
+    expandidas = {}
+    for rep_id, texto in traducoes.items():
+        for item_id in grupos.get(rep_id, [rep_id]):
+            expandidas[item_id] = texto
+    return expandidas
@@ -0,0 +1,306 @@
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Cota total de disco para artefatos em data/ e nos checkpoints
+STORAGE_QUOTA_MB = int(os.getenv("STORAGE_QUOTA_MB", "10240"))
+# Validade dos diretórios de /api/translate (uploads e arquivos traduzidos)
+SYNC_JOB_TTL_S = int(os.getenv("SYNC_JOB_TTL_S", str(6 * 3600)))
+# Validade de checkpoints sem job conhecido
+CHECKPOINT_TTL_S = int(os.getenv("CHECKPOINT_TTL_S", str(24 * 3600)))
+# Validade dos jobs da fila (a mesma do QueueJob)
+QUEUE_JOB_TTL_S = 48 * 3600
+# Validade das entradas do cache de resultados (renovada a cada acerto pelo LRU)
+RESULT_CACHE_TTL_S = int(os.getenv("RESULT_CACHE_TTL_S", str(7 * 24 * 3600)))
+# Validade das traduções guardadas para novas versões de um documento
+REVISION_TTL_S = int(os.getenv("REVISION_TTL_S", str(30 * 24 * 3600)))
+# Validade padrão por tipo de artefato
+DEFAULT_TTL_S = {
+    "job": SYNC_JOB_TTL_S,
+    "queue_job": QUEUE_JOB_TTL_S,
+    "checkpoint": CHECKPOINT_TTL_S,
+    "result": RESULT_CACHE_TTL_S,
+    "revision": REVISION_TTL_S
+}
+# Artefatos mais novos que isto não são despejados pela cota (traduções em andamento)
+STORAGE_MIN_AGE_S = int(os.getenv("STORAGE_MIN_AGE_S", "1800"))
+# Intervalo mínimo entre gravações de último acesso de um mesmo artefato
+TOUCH_INTERVAL_S = 300
+
+class StorageGC:
+    """
+    Coleta de lixo dos artefatos em disco
+
+    Diretórios de job (job_*, queue_job_*), checkpoints, entradas do
+    cache de resultados e traduções para revisões ficam num índice
+    com prazo de expiração e último acesso. Cada execução (feita pelo
+    scheduler) remove o que expirou e, se o total passar da cota, despeja
+    os artefatos menos usados recentemente. Checkpoints pertencem ao job de
+    origem e são removidos junto com ele. Artefatos que não estão no
+    índice (versões anteriores, processos que caíram) são adotados na
+    execução seguinte, com prazo contado a partir da modificação.
+    """
+
+    def __init__(self, data_dir: str = "data", checkpoint_dir: str = None,
+                 index_file: str = "data/storage_index.json"):
+        self.data_dir = Path(data_dir)
+        self.checkpoint_dir = Path(checkpoint_dir or os.getenv("CHECKPOINT_DIR", ".checkpoints"))
+        self.index_file = Path(index_file)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lock_file = self.index_file.with_suffix('.lock')
+        self._touched: Dict[str, float] = {}
+        self.last_report: Dict = {}
+
+    @contextmanager
+    def _locked(self):
+        """Lock entre threads e entre processos (workers do uvicorn)"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_file, 'a') as lock_fd:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Carrega o índice do arquivo"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self, index: Dict[str, Dict]):
+        """Salva o índice no arquivo"""
+        try:
+            tmp = self.index_file.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.index_file)
+        except Exception as e:
+            logger.error(f"Erro ao salvar índice de armazenamento: {e}")
+
+    def track(self, path: Path, kind: str, expires_at: float = None, ttl_s: float = None):
+        """Registra (ou atualiza) um artefato com seu prazo de expiração"""
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + (ttl_s if ttl_s is not None else DEFAULT_TTL_S.get(kind, SYNC_JOB_TTL_S))
+
+        with self._locked():
+            index = self._load_index()
+            entry = index.get(str(path), {})
+            entry.update({
+                "kind": kind,
+                "expires_at": expires_at,
+                "created_at": entry.get("created_at", now),
+                "last_access": now,
+                "size": entry.get("size", 0)
+            })
+            index[str(path)] = entry
+            self._save_index(index)
+
+    def touch(self, path: Path):
+        """Marca acesso a um artefato (ordem do LRU)"""
+        key = str(path)
+        now = time.time()
+        if now - self._touched.get(key, 0) < TOUCH_INTERVAL_S:
+            return
+        self._touched[key] = now
+
+        with self._locked():
+            index = self._load_index()
+            if key in index:
+                index[key]["last_access"] = now
+                self._save_index(index)
+
+    def release_jobs(self, job_ids: Iterable[str]):
+        """Antecipa a expiração dos artefatos de jobs encerrados (removidos na próxima execução)"""
+        job_ids = set(job_ids)
+        if not job_ids:
+            return
+        with self._locked():
+            index = self._load_index()
+            self._discover(index)
+            for key, entry in index.items():
+                if self._job_id(Path(key)) in job_ids:
+                    entry["expires_at"] = 0
+            self._save_index(index)
+
+    @staticmethod
+    def _disk_size(path: Path) -> Optional[int]:
+        """Bytes ocupados por um arquivo ou diretório (None se não existe mais)"""
+        try:
+            if path.is_file():
+                return path.stat().st_size
+            if not path.exists():
+                return None
+        except OSError:
+            return None
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.stat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    @staticmethod
+    def _job_id(path: Path) -> str:
+        """Id do job dono do artefato (diretório ou checkpoint)"""
+        if path.name.startswith("queue_job_"):
+            return path.name[len("queue_job_"):]
+        if path.name.startswith("job_"):
+            return path.name[len("job_"):]
+        return path.name.split("_", 1)[0]
+
+    def _discover(self, index: Dict[str, Dict]):
+        """Adota artefatos que ainda não estão no índice"""
+        candidates = [(p, "queue_job") for p in self.data_dir.glob("queue_job_*")]
+        candidates += [(p, "job") for p in self.data_dir.glob("job_*")]
+        candidates += [(p, "result") for p in self.data_dir.glob("result_cache/*") if not p.name.startswith(".")]
+        candidates += [(p, "revision") for p in self.data_dir.glob("revisions/rev-*")]
+        if self.checkpoint_dir.exists():
+            candidates += [(p, "checkpoint") for p in self.checkpoint_dir.glob("*.jsonl")]
+
+        for path, kind in candidates:
+            if str(path) in index:
+                continue
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            index[str(path)] = {
+                "kind": kind,
+                "expires_at": mtime + DEFAULT_TTL_S[kind],
+                "created_at": mtime,
+                "last_access": mtime,
+                "size": 0
+            }
+
+    def _delete(self, path: Path) -> bool:
+        try:
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.exists():
+                path.unlink()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao remover {path}: {e}")
+            return False
+
+    def run(self, active_jobs: Iterable[str] = ()) -> Dict:
+        """
+        Remove artefatos expirados e aplica a cota de disco (LRU)
+
+        active_jobs são ids de jobs pendentes ou em processamento: seus
+        artefatos nunca expiram nem são despejados. Retorna um relatório
+        com itens removidos, bytes recuperados e ocupação final.
+
+        O lock do índice só é mantido para ler e atualizar o índice; medir e
+        apagar diretórios é feito fora dele, para não travar track() e
+        touch() dos pedidos em andamento. Um artefato que não pôde ser
+        apagado volta ao índice na execução seguinte (_discover).
+        """
+        active = set(active_jobs)
+        now = time.time()
+
+        # Artefatos conhecidos (e adoção dos que ainda não estão no índice)
+        with self._locked():
+            index = self._load_index()
+            self._discover(index)
+            self._save_index(index)
+            keys = list(index)
+
+        # Tamanho atual, sem lock
+        sizes = {key: self._disk_size(Path(key)) for key in keys}
+
+        doomed: List[Tuple[str, Dict]] = []
+        evicted = 0
+        with self._locked():
+            # Índice atual: track() pode ter registrado artefatos durante a medição
+            index = self._load_index()
+            for key, size in sizes.items():
+                if key not in index:
+                    continue
+                if size is not None:
+                    index[key]["size"] = size
+                elif not Path(key).exists():
+                    # Já não existe (descartar a entrada)
+                    index.pop(key)
+
+            # Checkpoints seguem o prazo do job dono, se conhecido
+            owners = {self._job_id(Path(k)): v for k, v in index.items() if v["kind"] != "checkpoint"}
+            for key, entry in index.items():
+                owner = owners.get(self._job_id(Path(key)))
+                if entry["kind"] == "checkpoint" and owner:
+                    entry["expires_at"] = owner["expires_at"]
+                    entry["last_access"] = owner["last_access"]
+
+            for key in [k for k, v in index.items() if v["expires_at"] <= now]:
+                if self._job_id(Path(key)) not in active:
+                    doomed.append((key, index.pop(key)))
+
+            # Cota: despejar os menos acessados (jobs ativos e recentes ficam)
+            quota = STORAGE_QUOTA_MB * 1024 * 1024
+            total = sum(v["size"] for v in index.values())
+            if quota > 0 and total > quota:
+                candidates = sorted(
+                    (k for k, v in index.items()
+                     if self._job_id(Path(k)) not in active and now - v["created_at"] >= STORAGE_MIN_AGE_S),
+                    key=lambda k: index[k]["last_access"]
+                )
+                for key in candidates:
+                    if total <= quota:
+                        break
+                    entry = index.pop(key)
+                    doomed.append((key, entry))
+                    total -= entry["size"]
+                    evicted += 1
+                if total > quota:
+                    logger.warning(f"Armazenamento acima da cota após despejo: {total / 1024 / 1024:.0f}MB")
+
+            self._save_index(index)
+            total_bytes = sum(v["size"] for v in index.values())
+
+        # Remoção fora do lock
+        removed: List[str] = []
+        reclaimed = 0
+        for key, entry in doomed:
+            if self._delete(Path(key)):
+                reclaimed += entry["size"]
+                removed.append(key)
+
+        report = {
+            "removed": len(removed),
+            "evicted": evicted,
+            "reclaimed_bytes": reclaimed,
+            "total_bytes": total_bytes,
+            "quota_bytes": STORAGE_QUOTA_MB * 1024 * 1024,
+            "ran_at": now
+        }
+        self.last_report = report
+        if removed:
+            logger.info(f"🧹 GC: {len(removed)} artefato(s) removido(s) ({evicted} por cota), "
+                        f"{reclaimed / 1024 / 1024:.1f}MB recuperados")
+        return report
+
+# Instância global da coleta de armazenamento
+storage_gc = StorageGC()
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração dos testes offline
+
+Backend mock, sem chave da OpenAI e com os diretórios de dados (data/,
+.checkpoints/, logs/) num diretório temporário: os módulos do backend criam esses
+diretórios relativos ao diretório atual na importação.
+"""
+
+import os
+import sys
+import tempfile
+
+os.environ.update(
+    TRANSLATION_BACKEND="mock",
+    OPENAI_API_KEY="",
+    MOCK_LATENCY_S="0",
+    TRACING_EXPORTER="none",
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_collection(session):
+    # Depois de resolvidos os caminhos dos testes, antes de importar os módulos
+    os.chdir(tempfile.mkdtemp(prefix="tradutor-tests-"))
+    # main.py grava o log em logs/app.log
+    os.mkdir("logs")
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Testes do índice de tokens de download"""
+
+import json
+import time
+
+import pytest
+
+from download_tokens import DownloadTokenStore
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return tmp_path / "download_tokens.json"
+
+
+def test_outro_processo_le_o_log(snapshot):
+    a = DownloadTokenStore(str(snapshot))
+    b = DownloadTokenStore(str(snapshot))
+    a.add("t1", {"paths": ["x"], "expire": time.time() + 60})
+    assert b.get("t1")["paths"] == ["x"]
+
+    a.discard("t1")
+    # b só relê o log quando não encontra o token
+    b._catch_up()
+    assert b.get("t1") is None
+
+
+def test_linha_incompleta_fica_para_depois(snapshot):
+    store = DownloadTokenStore(str(snapshot))
+    entry = json.dumps({"op": "put", "token": "t1", "info": {"expire": 0}}).encode()
+    with open(store.log_file, "ab") as f:
+        f.write(entry[:10])
+    assert store.get("t1") is None
+
+    with open(store.log_file, "ab") as f:
+        f.write(entry[10:] + b"\n")
+    assert store.get("t1") == {"expire": 0}
+
+
+def test_compactacao_recarregada_por_outro_processo(snapshot):
+    a = DownloadTokenStore(str(snapshot))
+    b = DownloadTokenStore(str(snapshot))
+    for i in range(5):
+        a.add(f"t{i}", {"expire": time.time() + 60})
+    a.discard("t0")
+    assert b.get("t4") is not None
+
+    a.compact()
+    assert a.log_file.stat().st_size == 0
+    assert set(json.loads(snapshot.read_text())) == {"t1", "t2", "t3", "t4"}
+
+    a.add("novo", {"expire": time.time() + 60})
+    # Novo inode do log: b recarrega o snapshot e lê o log do início
+    assert b.get("novo") is not None
+    assert b.get("t0") is None
+    assert DownloadTokenStore(str(snapshot))._tokens.keys() == a._tokens.keys()
+
+
+def test_sweep_remove_expirados_e_arquivos(snapshot, tmp_path):
+    output = tmp_path / "saida.docx"
+    output.write_bytes(b"x")
+    store = DownloadTokenStore(str(snapshot))
+    store.add("velho", {"paths": [str(output)], "expire": time.time() - 1})
+    store.add("novo", {"paths": [], "expire": time.time() + 60})
+    # Renovado: a entrada antiga do heap não pode remover o token
+    store.add("renovado", {"paths": [], "expire": time.time() - 1})
+    store.add("renovado", {"paths": [], "expire": time.time() + 60})
+
+    assert store.sweep() == 1
+    assert not output.exists()
+    assert store.get("velho") is None
+    assert store.get("novo") and store.get("renovado")
+    assert DownloadTokenStore(str(snapshot)).get("velho") is None
+
+
+def test_sweep_compacta_depois_do_limite(snapshot, monkeypatch):
+    monkeypatch.setattr("download_tokens.DOWNLOAD_LOG_COMPACT_ENTRIES", 3)
+    store = DownloadTokenStore(str(snapshot))
+    store.add("t1", {"expire": time.time() + 60})
+    store.add("t2", {"expire": time.time() + 60})
+    store.sweep()
+    assert store.log_file.stat().st_size > 0
+
+    store.add("t3", {"expire": time.time() + 60})
+    store.sweep()
+    assert store.log_file.stat().st_size == 0
+    assert set(json.loads(snapshot.read_text())) == {"t1", "t2", "t3"}
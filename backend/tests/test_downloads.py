@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Testes de Range, ETag e requisições condicionais nos downloads"""
+
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from downloads import download_response, if_range_matches, none_match, parse_range, zip_requested
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    (" BYTES = 5 - 9 ", (5, 9)),
+    # Ignorados: outra unidade, várias faixas, malformados
+    ("items=0-9", None),
+    ("bytes=0-9,20-29", None),
+    ("bytes=9-0", None),
+    ("bytes=abc", None),
+    ("bytes=a-9", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_parse_range_insatisfativel(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_if_range_matches_so_com_etag_forte_igual():
+    etag = '"abc"'
+    assert if_range_matches(None, etag)
+    assert if_range_matches(' "abc" ', etag)
+    assert not if_range_matches('W/"abc"', etag)
+    assert not if_range_matches('"outro"', etag)
+    assert not if_range_matches("Wed, 21 Oct 2015 07:28:00 GMT", etag)
+
+
+def test_none_match_comparacao_fraca():
+    assert none_match('W/"abc", "x"', '"abc"')
+    assert none_match("*", '"abc"')
+    assert not none_match('"x"', '"abc"')
+    assert not none_match(None, '"abc"')
+
+
+@pytest.fixture
+def client(tmp_path):
+    paths = []
+    for name, size in (("a.docx", 200_000), ("b.docx", 3000)):
+        path = tmp_path / name
+        path.write_bytes(os.urandom(size))
+        paths.append(path)
+
+    app = FastAPI()
+
+    @app.get("/um")
+    def um(request: Request):
+        return download_response(request, paths[:1], "saida.zip", as_zip=False)
+
+    @app.get("/um-zip")
+    def um_zip(request: Request):
+        return download_response(request, paths[:1], "saida.zip")
+
+    @app.get("/zip")
+    def zip_(request: Request):
+        return download_response(request, paths, "saida.zip")
+
+    client = TestClient(app)
+    client.paths = paths
+    return client
+
+
+def test_arquivo_unico_completo_e_parcial(client):
+    data = client.paths[0].read_bytes()
+    full = client.get("/um")
+    assert full.status_code == 200
+    assert full.content == data
+    assert int(full.headers["content-length"]) == len(data)
+    etag = full.headers["etag"]
+
+    part = client.get("/um", headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206
+    assert part.content == data[100:200]
+    assert part.headers["content-range"] == f"bytes 100-199/{len(data)}"
+    assert part.headers["content-length"] == "100"
+
+    assert client.get("/um", headers={"If-None-Match": etag}).status_code == 304
+
+    stale = client.get("/um", headers={"Range": "bytes=100-199", "If-Range": '"outro"'})
+    assert stale.status_code == 200
+    assert stale.content == data
+
+    bad = client.get("/um", headers={"Range": f"bytes={len(data)}-"})
+    assert bad.status_code == 416
+    assert bad.headers["content-range"] == f"bytes */{len(data)}"
+
+
+def test_zip_content_length_e_faixas(client):
+    full = client.get("/zip")
+    assert full.status_code == 200
+    assert int(full.headers["content-length"]) == len(full.content)
+    with zipfile.ZipFile(io.BytesIO(full.content)) as zf:
+        assert zf.testzip() is None
+        for path in client.paths:
+            assert zf.read(path.name) == path.read_bytes()
+
+    # Retomada do meio de um membro até o fim, com o mesmo ETag
+    start = 50_000
+    rest = client.get("/zip", headers={"Range": f"bytes={start}-", "If-Range": full.headers["etag"]})
+    assert rest.status_code == 206
+    assert int(rest.headers["content-length"]) == len(full.content) - start
+    assert full.content[:start] + rest.content == full.content
+
+
+def test_etag_do_zip_muda_com_o_conteudo(client):
+    before = client.get("/zip").headers["etag"]
+    client.paths[1].write_bytes(os.urandom(3000))
+    assert client.get("/zip").headers["etag"] != before
+
+
+def test_arquivo_unico_vai_em_zip_por_padrao(client):
+    response = client.get("/um-zip")
+    assert response.headers["content-type"] == "application/zip"
+    assert 'filename="saida.zip"' in response.headers["content-disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        assert zf.read("a.docx") == client.paths[0].read_bytes()
+
+
+def test_zip_requested():
+    assert zip_requested(None) and zip_requested("zip")
+    assert not zip_requested("file")
+    with pytest.raises(HTTPException):
+        zip_requested("tar")
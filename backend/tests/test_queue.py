@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Testes do escalonamento e dos leases da fila"""
+
+import io
+import threading
+import time
+
+import pytest
+from docx import Document
+from fastapi.testclient import TestClient
+
+import queue_manager as qm
+from queue_manager import JobStatus, QueueManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return QueueManager(str(tmp_path / "queue.json"))
+
+
+def add(manager, client, tokens=1000, priority="normal"):
+    job_id = manager.add_job("pt", "en", ["a.docx"], {"a.docx": "/tmp/a.docx"},
+                             client_id=client, priority=priority, estimated_tokens=tokens)
+    time.sleep(0.002)  # ordem de chegada distinta
+    return job_id
+
+
+def order(manager, now=None):
+    return [job.id for job in manager._schedule_order(manager._load_queue(), now)]
+
+
+def test_fair_share_alterna_entre_clientes(manager):
+    a1, a2, a3 = add(manager, "a"), add(manager, "a"), add(manager, "a")
+    b1 = add(manager, "b")
+    assert order(manager) == [a1, b1, a2, a3]
+
+
+def test_consumo_recente_do_cliente_conta_no_fair_share(manager):
+    a1 = add(manager, "a", tokens=5000)
+    manager.claim_next_job("w")
+    a2 = add(manager, "a")
+    b1 = add(manager, "b")
+    assert manager.get_job(a1).status == JobStatus.PROCESSING
+    assert order(manager) == [b1, a2]
+
+
+def test_pequenos_primeiro_dentro_do_cliente(manager):
+    big = add(manager, "a", tokens=qm.SMALL_JOB_TOKENS * 5)
+    small = add(manager, "a", tokens=100)
+    smaller = add(manager, "a", tokens=10)
+    assert order(manager) == [smaller, small, big]
+
+
+def test_prioridade_alta_primeiro(manager):
+    normal = add(manager, "a")
+    alta = add(manager, "b", priority="alta")
+    assert order(manager) == [alta, normal]
+
+
+def test_aging_passa_job_antigo_a_frente(manager):
+    normal = add(manager, "a")
+    alta = add(manager, "b", priority="alta")
+    # O alta chega dois intervalos de aging depois: o normal já subiu duas classes
+    later = time.time() + 2 * qm.PRIORITY_AGING_S
+    queue = manager._load_queue()
+    for job in queue:
+        if job.id == alta:
+            job.created_at = later
+    manager._save_queue(queue)
+    assert order(manager, later) == [normal, alta]
+
+
+def test_lease_expirado_volta_a_fila_com_nova_reserva(manager, monkeypatch):
+    job_id = add(manager, "a")
+    monkeypatch.setattr(qm, "JOB_LEASE_S", -1)
+    first = manager.claim_next_job("w")
+    assert first.status == JobStatus.PROCESSING and first.lease_token
+
+    assert manager.requeue_expired_leases() == 1
+    assert manager.get_job(job_id).status == JobStatus.PENDING
+
+    monkeypatch.setattr(qm, "JOB_LEASE_S", 120)
+    # Mesmo worker (outra thread do mesmo processo) reserva de novo
+    second = manager.claim_next_job("w")
+    assert second.id == job_id and second.attempts == 2
+    assert second.lease_token != first.lease_token
+
+    # A tentativa antiga não renova nem altera a atual
+    assert not manager.heartbeat(job_id, first.lease_token)
+    assert not manager.update_job_status(job_id, JobStatus.ERROR, error_message="antiga",
+                                         lease_token=first.lease_token)
+    assert manager.get_job(job_id).status == JobStatus.PROCESSING
+
+    assert manager.heartbeat(job_id, second.lease_token)
+    assert manager.update_job_status(job_id, JobStatus.COMPLETED, lease_token=second.lease_token)
+    job = manager.get_job(job_id)
+    assert job.status == JobStatus.COMPLETED and job.lease_token is None
+
+
+def test_job_abandonado_apos_tentativas_maximas(manager, monkeypatch):
+    job_id = add(manager, "a")
+    monkeypatch.setattr(qm, "JOB_LEASE_S", -1)
+    for _ in range(qm.MAX_JOB_ATTEMPTS):
+        assert manager.claim_next_job("w").id == job_id
+        manager.requeue_expired_leases()
+    job = manager.get_job(job_id)
+    assert job.status == JobStatus.ERROR
+    assert manager.claim_next_job("w") is None
+
+
+def test_reserva_antiga_nao_grava_no_job(manager, monkeypatch):
+    job_id = add(manager, "a")
+    monkeypatch.setattr(qm, "JOB_LEASE_S", -1)
+    old = manager.claim_next_job("w").lease_token
+    manager.requeue_expired_leases()
+    monkeypatch.setattr(qm, "JOB_LEASE_S", 120)
+    new = manager.claim_next_job("w").lease_token
+
+    assert not manager.mark_file_completed(job_id, "a.docx", "a_en.docx", lease_token=old)
+    assert not manager.record_file_usage(job_id, "a.docx", {"prompt_tokens": 10}, lease_token=old)
+    assert not manager.record_file_stages(job_id, "a.docx", {"translate": 1.0}, lease_token=old)
+    assert not manager.record_job_profile(job_id, {"cpu": {}}, lease_token=old)
+    assert manager.update_job_progress(job_id, 5, 50, lease_token=old) is None
+    job = manager.get_job(job_id)
+    assert not job.completed_files and not job.file_usage and not job.profile
+    assert not job.segments_done
+
+    assert manager.mark_file_completed(job_id, "a.docx", "a_en.docx", lease_token=new)
+    assert manager.update_job_progress(job_id, 5, 50, lease_token=new) is not None
+    assert manager.get_job(job_id).completed_files == {"a.docx": "a_en.docx"}
+
+
+def test_heartbeat_perdido_sinaliza_cancelamento(manager, monkeypatch):
+    import queue_scheduler
+
+    job_id = add(manager, "a")
+    job = manager.claim_next_job("w")
+    monkeypatch.setattr(queue_scheduler, "queue_manager", manager)
+    monkeypatch.setattr(queue_scheduler, "JOB_HEARTBEAT_S", 0.01)
+    done, lost = threading.Event(), threading.Event()
+
+    manager.update_job_status(job_id, JobStatus.PENDING)  # devolvido à fila por outro processo
+    queue_scheduler.QueueScheduler()._heartbeat_loop(job_id, job.lease_token, done, lost)
+    assert lost.is_set()
+
+
+@pytest.fixture
+def queued_job(manager, monkeypatch):
+    """Job da fila com um DOCX real enviado pela API, usando manager como fila global"""
+    import main
+
+    monkeypatch.setattr(main, "queue_manager", manager)
+    monkeypatch.setattr(qm, "queue_manager", manager)
+    doc = Document()
+    doc.add_paragraph("Cláusula primeira: o contratante pagará o valor acordado.")
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    response = TestClient(main.app).post(
+        "/api/queue/submit",
+        files={"files": ("contrato.docx", buffer.getvalue(), "application/octet-stream")},
+        data={"sourceLang": "pt", "targetLang": "en", "clientId": "cli-lease"})
+    assert response.status_code == 200, response.text
+    return response.json()["jobId"]
+
+
+def test_job_cancelado_para_sem_gravar(manager, queued_job):
+    import main
+
+    job = manager.claim_next_job("w")
+    cancel = threading.Event()
+    cancel.set()
+    main.process_queue_job_sync(queued_job, job.lease_token, cancel)
+
+    job = manager.get_job(queued_job)
+    assert job.status == JobStatus.PROCESSING
+    assert not job.completed_files and not job.error_message
+    assert not list((main.DATA_DIR / f"queue_job_{queued_job}").glob("*_en*"))
+
+
+def test_reserva_antiga_termina_sem_sobrescrever_a_nova(manager, queued_job, monkeypatch):
+    import main
+
+    monkeypatch.setattr(qm, "JOB_LEASE_S", -1)
+    old = manager.claim_next_job("w").lease_token
+    manager.requeue_expired_leases()
+    monkeypatch.setattr(qm, "JOB_LEASE_S", 120)
+    new = manager.claim_next_job("w").lease_token
+
+    main.process_queue_job_sync(queued_job, old)
+    job = manager.get_job(queued_job)
+    assert job.status == JobStatus.PROCESSING and job.lease_token == new
+    assert not job.completed_files and not job.file_usage
+
+
+def test_pedido_identico_so_anexa_ao_job_do_mesmo_cliente(manager):
+    job_id = manager.add_job("pt", "en", ["a.docx"], {"a.docx": "/tmp/a.docx"}, client_id="a",
+                             priority="baixa", cache_key="k")
+    assert manager.find_job_by_cache_key("k", "a", "baixa").id == job_id
+    assert manager.find_job_by_cache_key("k", "b", "baixa") is None
+    # Pendente com prioridade menor que a pedida: não espera atrás dele
+    assert manager.find_job_by_cache_key("k", "a", "alta") is None
+
+    manager.update_job_status(job_id, JobStatus.COMPLETED)
+    assert manager.find_job_by_cache_key("k", "a", "alta").id == job_id
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Testes do agrupamento de requisições entre jobs"""
+
+import threading
+
+import pytest
+
+import request_coalescer
+from request_coalescer import RequestCoalescer
+
+
+def fake_translate(lote, target_lang, source_lang, model):
+    return {item["id"]: f"[{target_lang}] {item['text']}" for item in lote}
+
+
+def items(*texts):
+    return [{"id": f"r{i}", "text": text} for i, text in enumerate(texts)]
+
+
+def test_jobs_concorrentes_recebem_so_as_proprias_traducoes():
+    calls = []
+
+    def translate(lote, target_lang, source_lang, model):
+        calls.append(len(lote))
+        return fake_translate(lote, target_lang, source_lang, model)
+
+    coalescer = RequestCoalescer(translate, window_s=0.2)
+    results = {}
+
+    def job(name, texts):
+        results[name] = coalescer.translate(items(*texts), "pt", "en", "m")
+
+    threads = [threading.Thread(target=job, args=("a", ["um", "dois"])),
+               threading.Thread(target=job, args=("b", ["três"]))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert results["a"] == ({"r0": "[en] um", "r1": "[en] dois"}, [])
+    assert results["b"] == ({"r0": "[en] três"}, [])
+    # Um único lote compartilhado para os dois jobs
+    assert calls == [3]
+
+
+def test_lote_grande_e_dividido_e_o_job_espera_todos():
+    coalescer = RequestCoalescer(fake_translate, window_s=0.01, batch_tokens=5)
+    result, errors = coalescer.translate(items(*(["palavra " * 4] * 5)), "pt", "en", "m")
+    assert errors == []
+    assert sorted(result) == [f"r{i}" for i in range(5)]
+
+
+def test_erro_do_modelo_vira_erro_do_job():
+    def translate(lote, target_lang, source_lang, model):
+        raise RuntimeError("falhou")
+
+    coalescer = RequestCoalescer(translate, window_s=0.01)
+    result, errors = coalescer.translate(items("um"), "pt", "en", "m")
+    assert result == {}
+    assert len(errors) == 1 and "falhou" in errors[0]
+
+
+def test_erro_ao_distribuir_resultado_libera_o_job(monkeypatch):
+    def broken_split(usage, weights):
+        raise RuntimeError("rateio")
+
+    def translate(lote, target_lang, source_lang, model):
+        from translation_backends import Usage, record_usage
+        record_usage("m", Usage(requests=1, prompt_tokens=10, completion_tokens=5))
+        return fake_translate(lote, target_lang, source_lang, model)
+
+    monkeypatch.setattr(request_coalescer, "split_usage", broken_split)
+    coalescer = RequestCoalescer(translate, window_s=0.01, timeout_s=5)
+    result, errors = coalescer.translate(items("um"), "pt", "en", "m")
+    assert len(errors) == 1 and "rateio" in errors[0]
+
+
+def test_erro_ao_montar_o_grupo_libera_o_job(monkeypatch):
+    def broken_submit(self, key, requests):
+        raise RuntimeError("montagem")
+
+    monkeypatch.setattr(RequestCoalescer, "_submit_group", broken_submit)
+    coalescer = RequestCoalescer(fake_translate, window_s=0.01, timeout_s=5)
+    result, errors = coalescer.translate(items("um"), "pt", "en", "m")
+    assert result == {}
+    assert len(errors) == 1 and "montagem" in errors[0]
+
+
+def test_espera_limitada_levanta_timeout():
+    release = threading.Event()
+
+    def translate(lote, target_lang, source_lang, model):
+        release.wait(5)
+        return fake_translate(lote, target_lang, source_lang, model)
+
+    coalescer = RequestCoalescer(translate, window_s=0.01, timeout_s=0.2)
+    try:
+        with pytest.raises(TimeoutError):
+            coalescer.translate(items("um"), "pt", "en", "m")
+    finally:
+        release.set()
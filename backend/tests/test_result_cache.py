@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Testes do cache de documentos traduzidos"""
+
+import pytest
+
+from result_cache import ResultCache, file_cache_key, request_cache_key
+
+
+def test_file_cache_key_depende_de_cada_componente():
+    base = ("a" * 64, "pt", "en", "gpt-4.1", "")
+    key = file_cache_key(*base)
+    assert key == file_cache_key(*base)
+    for i, other in enumerate(("b" * 64, "es", "fr", "gpt-4.1-mini", "c" * 64)):
+        changed = list(base)
+        changed[i] = other
+        assert file_cache_key(*changed) != key
+    # Sem glossário e glossário vazio são o mesmo pedido
+    assert file_cache_key(*base[:4]) == file_cache_key(*base[:4], None) == key
+
+
+def test_file_cache_key_distingue_a_direcao():
+    assert file_cache_key("x", "pt", "en", "m") != file_cache_key("x", "en", "pt", "m")
+
+
+def test_request_cache_key_considera_ordem_e_nomes():
+    keys = ["a.docx:1", "b.docx:2"]
+    assert request_cache_key(keys) == request_cache_key(iter(keys))
+    assert request_cache_key(keys) != request_cache_key(reversed(keys))
+    assert request_cache_key(["a.docx:1"]) != request_cache_key(["c.docx:1"])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "result_cache"))
+
+
+def test_put_get_e_materialize(cache, tmp_path):
+    output = tmp_path / "relatorio_en.docx"
+    output.write_bytes(b"traduzido")
+    key = file_cache_key("a" * 64, "pt", "en", "gpt-4.1")
+    assert cache.get(key) is None
+
+    cache.put(key, output, {"segments": 3})
+    cached = cache.get(key)
+    assert cached["segments"] == 3
+    assert cached["filename"] == output.name
+
+    # A segunda gravação da mesma chave não substitui a primeira
+    other = tmp_path / "outro" / output.name
+    other.parent.mkdir()
+    other.write_bytes(b"outro")
+    cache.put(key, other, {"segments": 99})
+    assert cache.get(key)["segments"] == 3
+
+    dest = tmp_path / "job" / "saida.docx"
+    dest.parent.mkdir()
+    assert cache.materialize(key, dest)["segments"] == 3
+    assert dest.read_bytes() == b"traduzido"
+    assert not list(cache.cache_dir.glob(".tmp-*"))
+
+
+def test_entrada_sem_arquivo_e_miss(cache, tmp_path):
+    output = tmp_path / "a.docx"
+    output.write_bytes(b"x")
+    cache.put("k", output, {})
+    (cache.cache_dir / "k" / "a.docx").unlink()
+    assert cache.get("k") is None
+    assert cache.materialize("k", tmp_path / "dest.docx") is None
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Testes das revisões de documentos"""
+
+import pytest
+from docx import Document
+
+import translator_openai_official
+from revisions import RevisionStore, document_lineage
+from translation_memory import TranslationMemory
+from translator_openai_official import estimate_revision, translate_docx_multi
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("contrato.docx", "contrato.docx"),
+    ("Contrato_v3.DOCX", "contrato.docx"),
+    ("contrato rev2.docx", "contrato.docx"),
+    ("contrato (1).docx", "contrato.docx"),
+    ("contrato-final.docx", "contrato.docx"),
+    ("contrato_v2_final.docx", "contrato.docx"),
+    ("contrato versão 4.docx", "contrato.docx"),
+    ("contrato_2024-05-01.docx", "contrato.docx"),
+    ("relatorio anual.pptx", "relatorio anual.pptx"),
+    # Só a marca de versão: o nome fica como está
+    ("v2.docx", "v2.docx"),
+])
+def test_document_lineage(filename, expected):
+    assert document_lineage(filename) == expected
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RevisionStore(str(tmp_path / "revisions"))
+
+
+def test_find_previous_pelo_indice(store):
+    store.save("job1", "cli-a", "contrato_v1.docx", "pt", "en", {"Olá": "Hello"})
+    store.save("job2", "cli-a", "contrato_v2.docx", "pt", "en", {"Olá": "Hi"})
+
+    assert store.find_previous("cli-a", "contrato_v3.docx") == {"job_id": "job2", "filename": "contrato_v2.docx"}
+    assert store.load("job1", "contrato_v1.docx", "pt", "en") == {"Olá": "Hello"}
+    assert store.load("job2", "contrato_v2.docx", "pt", "es") == {}
+    # Outro cliente não enxerga as versões
+    assert store.find_previous("cli-b", "contrato_v3.docx") is None
+
+
+def test_find_previous_com_revision_of(store):
+    store.save("job1", "cli-a", "contrato_v1.docx", "pt", "en", {"a": "b"})
+    store.save("job1", "cli-a", "anexo.docx", "pt", "en", {"c": "d"})
+
+    assert store.find_previous("cli-a", "contrato_v2.docx", "job1")["filename"] == "contrato_v1.docx"
+    assert store.find_previous("cli-a", "outro.docx", "job1") is None
+    assert store.find_previous("cli-b", "contrato_v2.docx", "job1") is None
+    assert store.job_files("job1", "cli-a") == ["contrato_v1.docx", "anexo.docx"]
+
+
+def test_memoria_vazia_nao_vira_versao(store):
+    store.save("job1", "cli-a", "contrato.docx", "pt", "en", {})
+    assert store.find_previous("cli-a", "contrato.docx") is None
+
+
+PARAGRAPHS = [
+    "Cláusula primeira: o contratante pagará o valor acordado até o quinto dia útil.",
+    "Cláusula segunda: a vigência deste contrato é de doze meses a partir da assinatura.",
+    "Cláusula terceira: as partes elegem o foro da comarca da capital.",
+]
+
+
+def make_docx(path, paragraphs):
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    doc.save(str(path))
+    return str(path)
+
+
+def test_nova_versao_reaproveita_segmentos(tmp_path, monkeypatch):
+    monkeypatch.setattr(translator_openai_official, "translation_memory",
+                        TranslationMemory(str(tmp_path / "tm")))
+    v1 = make_docx(tmp_path / "contrato_v1.docx", PARAGRAPHS[:2])
+    first = translate_docx_multi(v1, {"en": str(tmp_path / "v1_en.docx")}, "pt",
+                                 checkpoint_paths={"en": str(tmp_path / "v1.jsonl")})["en"]
+    assert first.success
+    assert first.reused_segments == 0
+    assert set(first.translation_memory) == set(PARAGRAPHS[:2])
+
+    # v2 mantém os dois primeiros parágrafos e acrescenta um terceiro
+    v2 = make_docx(tmp_path / "contrato_v2.docx", PARAGRAPHS)
+    assert estimate_revision(v2, first.translation_memory)["segments"] == 1
+
+    output = tmp_path / "v2_en.docx"
+    second = translate_docx_multi(v2, {"en": str(output)}, "pt",
+                                  checkpoint_paths={"en": str(tmp_path / "v2.jsonl")},
+                                  previous={"en": first.translation_memory})["en"]
+    assert second.success
+    assert second.reused_segments == 2
+    texts = [p.text for p in Document(str(output)).paragraphs]
+    assert texts[:2] == [first.translation_memory[t] for t in PARAGRAPHS[:2]]
+    assert texts[2] != PARAGRAPHS[2]
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Testes da coleta de lixo dos artefatos em disco"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from storage_gc import StorageGC
+
+
+@pytest.fixture
+def gc(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    return StorageGC(str(data), str(tmp_path / "checkpoints"), str(data / "storage_index.json"))
+
+
+def job_dir(gc, name, size=1000):
+    path = gc.data_dir / name
+    path.mkdir()
+    (path / "saida.docx").write_bytes(os.urandom(size))
+    return path
+
+
+def set_entry(gc, path, **fields):
+    index = gc._load_index()
+    index[str(path)].update(fields)
+    gc._save_index(index)
+
+
+def test_remove_expirados_menos_jobs_ativos(gc):
+    expired = job_dir(gc, "job_a")
+    active = job_dir(gc, "queue_job_b")
+    valid = job_dir(gc, "job_c")
+    gc.track(expired, "job", ttl_s=-1)
+    gc.track(active, "queue_job", ttl_s=-1)
+    gc.track(valid, "job")
+
+    report = gc.run(active_jobs=["b"])
+    assert report["removed"] == 1
+    assert report["reclaimed_bytes"] == 1000
+    assert not expired.exists()
+    assert active.exists() and valid.exists()
+
+
+def test_checkpoint_segue_o_job_dono(gc):
+    gc.checkpoint_dir.mkdir()
+    checkpoint = gc.checkpoint_dir / "abc_relatorio.jsonl"
+    checkpoint.write_text("{}\n")
+    owner = job_dir(gc, "job_abc")
+    gc.track(owner, "job")
+    gc.run()
+    assert checkpoint.exists()
+
+    gc.release_jobs(["abc"])
+    gc.run()
+    assert not owner.exists()
+    assert not checkpoint.exists()
+
+
+def test_adota_artefatos_fora_do_indice(gc):
+    orphan = job_dir(gc, "job_orfao")
+    old = time.time() - 7 * 24 * 3600
+    os.utime(orphan, (old, old))
+    gc.run()
+    assert not orphan.exists()
+
+
+def test_cota_despeja_os_menos_acessados(gc, monkeypatch):
+    monkeypatch.setattr("storage_gc.STORAGE_QUOTA_MB", 1)
+    monkeypatch.setattr("storage_gc.STORAGE_MIN_AGE_S", 0)
+    now = time.time()
+    paths = [job_dir(gc, f"job_{i}", 400_000) for i in range(4)]
+    for i, path in enumerate(paths):
+        gc.track(path, "job")
+        set_entry(gc, path, last_access=now - 100 + i)
+    # Acessado por último, embora criado primeiro
+    set_entry(gc, paths[0], last_access=now)
+
+    report = gc.run()
+    assert report["evicted"] == 2
+    assert [path.exists() for path in paths] == [True, False, False, True]
+    assert report["total_bytes"] <= report["quota_bytes"]
+
+
+def test_cota_poupa_jobs_ativos_e_recentes(gc, monkeypatch):
+    monkeypatch.setattr("storage_gc.STORAGE_QUOTA_MB", 1)
+    monkeypatch.setattr("storage_gc.STORAGE_MIN_AGE_S", 1800)
+    old = job_dir(gc, "job_velho", 600_000)
+    active = job_dir(gc, "job_ativo", 600_000)
+    recent = job_dir(gc, "job_recente", 600_000)
+    for path in (old, active, recent):
+        gc.track(path, "job")
+    for path in (old, active):
+        set_entry(gc, path, created_at=time.time() - 3600)
+
+    report = gc.run(active_jobs=["ativo"])
+    assert report["evicted"] == 1
+    assert not old.exists()
+    assert active.exists() and recent.exists()
+
+
+def test_track_nao_espera_a_medicao(gc, monkeypatch):
+    job_dir(gc, "job_a")
+    new = job_dir(gc, "job_novo")
+    measure = StorageGC._disk_size
+    tracked = []
+
+    def slow_size(path):
+        # Um pedido registra seu diretório enquanto a coleta mede o disco
+        if not tracked:
+            thread = threading.Thread(target=lambda: tracked.append(gc.track(new, "job")))
+            thread.start()
+            thread.join(timeout=5)
+            assert tracked, "track() bloqueado pela medição"
+        return measure(path)
+
+    monkeypatch.setattr(StorageGC, "_disk_size", staticmethod(slow_size))
+    gc.run()
+    assert new.exists()
+    assert gc._load_index()[str(new)]["expires_at"] > time.time()
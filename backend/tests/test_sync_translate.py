@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Testes da tradução direta (/api/translate)"""
+
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+from docx import Document
+from fastapi.testclient import TestClient
+
+import main
+
+
+def docx_bytes(text: str) -> bytes:
+    doc = Document()
+    doc.add_paragraph(text)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def post_translate(client, text="Um parágrafo curto para traduzir."):
+    return client.post("/api/translate",
+                       files={"files": ("doc.docx", docx_bytes(text), "application/octet-stream")},
+                       data={"idioma_origem": "pt", "idioma_destino": "en"})
+
+
+def free_slots() -> int:
+    acquired = 0
+    while main.translate_slots.acquire(blocking=False):
+        acquired += 1
+    for _ in range(acquired):
+        main.translate_slots.release()
+    return acquired
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def test_traducao_direta(client, monkeypatch):
+    add = main.download_tokens.add
+    threads = []
+
+    def record_add(token, info):
+        threads.append(threading.current_thread().name)
+        add(token, info)
+
+    monkeypatch.setattr(main.download_tokens, "add", record_add)
+    response = post_translate(client)
+    assert response.status_code == 200, response.text
+    assert response.json()["files_count"] == 1
+    assert free_slots() == main.SYNC_TRANSLATE_CONCURRENCY
+
+    # Token gravado na thread da tradução, não no event loop
+    assert len(threads) == 1 and threads[0].startswith("translate")
+    # ZIP por padrão, mesmo com um único arquivo; format=file entrega o DOCX
+    token = response.json()["token"]
+    download = client.get(f"/api/download/{token}")
+    assert download.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(download.content)) as zf:
+        assert len(zf.namelist()) == 1
+    Document(io.BytesIO(client.get(f"/api/download/{token}?format=file").content))
+    assert client.get(f"/api/download/{token}?format=tar").status_code == 400
+
+
+def test_falha_ao_preparar_o_job_libera_o_slot(client, monkeypatch):
+    def broken_track(path, kind):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(main.storage_gc, "track", broken_track)
+    for _ in range(main.SYNC_TRANSLATE_CONCURRENCY + 1):
+        assert post_translate(client).status_code == 500
+    assert free_slots() == main.SYNC_TRANSLATE_CONCURRENCY
+
+
+def test_413_informa_o_limite_total_configurado(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_MB", 1)
+    before = job_dirs("job_*")
+    # DOCX válido de ~600 KB (parte sem compressão): o primeiro cabe, o segundo estoura o total
+    buffer = io.BytesIO(docx_bytes("Texto."))
+    with zipfile.ZipFile(buffer, "a") as package:
+        package.writestr("word/media/dados.bin", os.urandom(600 * 1024), compress_type=zipfile.ZIP_STORED)
+    part = buffer.getvalue()
+    response = client.post("/api/translate",
+                           files=[("files", ("a.docx", part, "application/octet-stream")),
+                                  ("files", ("b.docx", part, "application/octet-stream"))],
+                           data={"idioma_origem": "pt", "idioma_destino": "en"})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Tamanho total dos arquivos excede o limite de 1MB"
+    assert free_slots() == main.SYNC_TRANSLATE_CONCURRENCY
+    assert job_dirs("job_*") == before
+
+
+def job_dirs(pattern):
+    return set(main.DATA_DIR.glob(pattern))
+
+
+@pytest.mark.parametrize("url, data, pattern", [
+    ("/api/translate", {"idioma_origem": "pt", "idioma_destino": "en"}, "job_*"),
+    ("/api/queue/submit", {"sourceLang": "pt", "targetLang": "en"}, "queue_job_*"),
+])
+def test_upload_recusado_nao_deixa_diretorio(client, url, data, pattern):
+    before = job_dirs(pattern)
+    response = client.post(url, files=[("files", ("a.docx", docx_bytes("Texto."), "application/octet-stream")),
+                                       ("files", ("b.docx", b"nao e um docx", "application/octet-stream"))],
+                           data=data)
+    assert response.status_code == 400
+    assert job_dirs(pattern) == before
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Testes dos backends de tradução (prompt, cache de prompt e formatos de resposta)"""
+
+import json
+
+import pytest
+
+import translation_backends as tb
+from translation_backends import MockBackend, OpenAIBackend, build_messages, prefix_tokens
+
+
+def test_prefixo_estavel_entre_lotes():
+    first = build_messages({"r1": "Olá"}, "pt", "en", {"r1": {"source": "Oi", "translation": "Hi"}})
+    second = build_messages({"r9": "Outro texto"}, "pt", "en")
+    assert first[0] == second[0]
+    assert "Olá" not in first[0]["content"] and "Olá" in first[1]["content"]
+    assert build_messages({"r1": "Olá"}, "pt", "es")[0] != first[0]
+
+
+def test_mock_reporta_tokens_em_cache_a_partir_do_segundo_lote(monkeypatch):
+    monkeypatch.setattr(tb, "MOCK_CACHE_MIN_TOKENS", 50)
+    backend = MockBackend(latency_s=0)
+    first = backend.translate_batch({"r1": "um texto"}, "pt", "en", "m")
+    second = backend.translate_batch({"r2": "outro texto"}, "pt", "en", "m")
+    other_pair = backend.translate_batch({"r3": "texto"}, "pt", "es", "m")
+    assert first.usage.cached_tokens == 0
+    assert second.usage.cached_tokens > 0 and second.usage.cached_tokens % 128 == 0
+    assert second.usage.cached_tokens <= second.usage.prompt_tokens
+    assert other_pair.usage.cached_tokens == 0
+
+
+def test_mock_sem_cache_abaixo_do_prefixo_minimo(monkeypatch):
+    monkeypatch.setattr(tb, "MOCK_CACHE_MIN_TOKENS", 100_000)
+    backend = MockBackend(latency_s=0)
+    for i in range(3):
+        assert backend.translate_batch({f"r{i}": "texto"}, "pt", "en", "m").usage.cached_tokens == 0
+
+
+def test_prompt_cache_key_so_com_prefixo_que_o_provedor_aceita(monkeypatch):
+    tokens = prefix_tokens("pt", "en", tb.output_format("gpt-4.1"))
+    monkeypatch.setattr(tb, "PROMPT_CACHE_MIN_TOKENS", tokens + 1)
+    assert "extra_body" not in OpenAIBackend._request({"r1": "x"}, "pt", "en", "gpt-4.1", {})
+
+    monkeypatch.setattr(tb, "PROMPT_CACHE_MIN_TOKENS", tokens)
+    key = OpenAIBackend._request({"r1": "x"}, "pt", "en", "gpt-4.1", {})["extra_body"]["prompt_cache_key"]
+    assert key == OpenAIBackend._request({"r2": "y"}, "pt", "en", "gpt-4.1", {})["extra_body"]["prompt_cache_key"]
+
+    monkeypatch.setattr(tb, "PROMPT_CACHE_KEY", False)
+    assert "extra_body" not in OpenAIBackend._request({"r1": "x"}, "pt", "en", "gpt-4.1", {})
+
+
+def test_formato_full_por_padrao_e_compacto_por_modelo(monkeypatch):
+    monkeypatch.setattr(tb, "OUTPUT_FORMAT_BY_MODEL", {"gpt-4.1-mini": "compact", "o4-mini": "positional"})
+    assert tb.output_format("gpt-4.1") == "full"
+    assert tb.output_format("gpt-4.1-mini") == "compact"
+    assert tb.output_format("gpt-4.1-mini-2025-04-14") == "compact"
+    assert tb.output_format("o4-mini") == "positional"
+    monkeypatch.setattr(tb, "OUTPUT_FORMAT_BY_MODEL", {"gpt-4.1": "desconhecido"})
+    assert tb.output_format("gpt-4.1") == "full"
+
+
+def test_encode_decode_ida_e_volta():
+    translations = {"r7": "um", "r2": "dois", "r9": "três"}
+    for fmt in tb.OUTPUT_FORMATS:
+        assert tb.decode_translations(tb.encode_translations(translations, fmt), list(translations), fmt) == translations
+
+
+def test_compacto_mapeia_ids_do_lote_fora_de_ordem():
+    result = tb.decode_translations({"t": [{"i": 1, "t": "B"}, {"i": 0, "t": "A"}]}, ["r10", "r20"], "compact")
+    assert result == {"r10": "A", "r20": "B"}
+
+
+@pytest.mark.parametrize("result_json, fmt", [
+    ({"t": [{"i": 0, "t": "A"}]}, "compact"),
+    ({"t": [{"i": 0, "t": "A"}, {"i": 0, "t": "B"}]}, "compact"),
+    ({"t": [{"i": 0, "t": "A"}, {"i": 2, "t": "B"}]}, "compact"),
+    ({"t": ["A"]}, "positional"),
+    ({"t": ["A", "B", "C"]}, "positional"),
+])
+def test_validacao_de_contagem_e_ids(result_json, fmt):
+    with pytest.raises(ValueError):
+        tb.decode_translations(result_json, ["r1", "r2"], fmt)
+
+
+def test_mock_usa_o_formato_do_modelo_e_reduz_tokens_de_saida(monkeypatch):
+    monkeypatch.setattr(tb, "OUTPUT_FORMAT_BY_MODEL", {"compacto": "compact", "posicional": "positional"})
+    backend = MockBackend(latency_s=0)
+    segments = {f"r{i}": "sim" for i in range(30)}
+    tokens = {model: backend.translate_batch(segments, "pt", "en", model).usage.completion_tokens
+              for model in ("gpt-4.1", "compacto", "posicional")}
+    assert tokens["posicional"] < tokens["compacto"] < tokens["gpt-4.1"]
+    request = OpenAIBackend._request(segments, "pt", "en", "compacto", {})
+    assert request["response_format"]["json_schema"]["schema"] is tb.COMPACT_SCHEMA
+    assert '"id": 0' in request["messages"][1]["content"]
+
+
+@pytest.mark.parametrize("fmt", tb.OUTPUT_FORMATS)
+def test_prefixo_padrao_alcanca_o_minimo_do_cache(fmt):
+    # Margem sobre o mínimo: a estimativa (4 caracteres por token) não é o tokenizador do provedor
+    assert prefix_tokens("pt", "en", fmt) >= 1.15 * tb.PROMPT_CACHE_MIN_TOKENS
+    assert prefix_tokens("ja", "zh", fmt) >= 1.15 * tb.PROMPT_CACHE_MIN_TOKENS
+
+
+def test_configuracao_padrao_envia_prompt_cache_key():
+    assert tb.PROMPT_CACHE_MIN_TOKENS == 1024 and tb.output_format("gpt-4.1") == "full"
+    assert "prompt_cache_key" in OpenAIBackend._request({"r1": "x"}, "pt", "en", "gpt-4.1", {})["extra_body"]
+    # O mock, com o mínimo padrão, passa a reportar cache a partir do segundo lote
+    backend = MockBackend(latency_s=0)
+    backend.translate_batch({"r1": "um texto"}, "pt", "en", "gpt-4.1")
+    assert backend.translate_batch({"r2": "outro"}, "pt", "en", "gpt-4.1").usage.cached_tokens >= 1024
+
+
+def test_exemplo_do_prompt_segue_o_formato():
+    for fmt in tb.OUTPUT_FORMATS:
+        prompt = tb.build_system_prompt("pt", "en", fmt)
+        example = prompt.split("Resposta: ", 1)[1].split("\n", 1)[0]
+        assert tb.decode_translations(json.loads(example), list(tb.EXAMPLE_SEGMENTS), fmt) == tb.EXAMPLE_TRANSLATIONS
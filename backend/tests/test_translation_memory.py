@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Testes da memória de tradução"""
+
+import itertools
+
+import translation_memory
+from translation_memory import TranslationMemory, substitute_numbers
+
+SOURCE = "O contrato vence em 12 meses e custa 1.500 reais por mês."
+TRANSLATION = "The contract expires in 12 months and costs 1.500 reais per month."
+
+
+def test_substitute_numbers_troca_os_numeros_alterados():
+    text = "O contrato vence em 24 meses e custa 1.500 reais por mês."
+    assert substitute_numbers(text, SOURCE, TRANSLATION) == \
+        "The contract expires in 24 months and costs 1.500 reais per month."
+
+
+def test_substitute_numbers_recusa_textos_diferentes_e_formatos_alterados():
+    assert substitute_numbers("Outro trecho com 12 meses de prazo.", SOURCE, TRANSLATION) is None
+    # O número alterado não aparece na tradução como no original
+    assert substitute_numbers("O contrato vence em 24 meses e custa 1.500 reais por mês.", SOURCE,
+                              "The contract expires in one year and costs 1,500 reais per month.") is None
+    # O mesmo número mudou para valores diferentes
+    assert substitute_numbers("Prazo de 3 ou 4 dias", "Prazo de 2 ou 2 dias", "Term of 2 or 2 days") is None
+
+
+def test_lookup_exato_semelhante_e_reuso(tmp_path):
+    memory = TranslationMemory(str(tmp_path))
+    memory.add("pt", "en", {SOURCE: TRANSLATION})
+
+    exact = memory.lookup("pt", "en", SOURCE)
+    assert exact.similarity == 1.0 and memory.reuse(SOURCE, exact) == TRANSLATION
+
+    numbers = "O contrato vence em 36 meses e custa 1.500 reais por mês."
+    match = memory.lookup("pt", "en", numbers)
+    assert match.source == SOURCE
+    assert memory.reuse(numbers, match) == TRANSLATION.replace("12", "36")
+
+    similar = "O contrato vence em 12 meses e custa 1.500 reais por semana."
+    match = memory.lookup("pt", "en", similar)
+    assert match is not None and match.similarity < 1.0
+    assert memory.reuse(similar, match) is None
+
+    assert memory.lookup("pt", "es", SOURCE) is None
+    assert memory.lookup("pt", "en", "Um trecho completamente diferente de qualquer outro.") is None
+
+
+def test_outro_processo_le_o_log(tmp_path):
+    writer = TranslationMemory(str(tmp_path))
+    reader = TranslationMemory(str(tmp_path))
+    assert reader.lookup("pt", "en", SOURCE) is None
+    writer.add("pt", "en", {SOURCE: TRANSLATION})
+    assert reader.lookup("pt", "en", SOURCE).translation == TRANSLATION
+
+
+def test_consolidacao_deixa_folga_e_nao_roda_a_cada_gravacao(tmp_path, monkeypatch):
+    monkeypatch.setattr(translation_memory, "TM_MAX_ENTRIES", 10)
+    monkeypatch.setattr(translation_memory, "TM_COMPACT_KEEP", 0.5)
+    memory = TranslationMemory(str(tmp_path))
+    compactions = []
+    original = memory._compact
+    monkeypatch.setattr(memory, "_compact", lambda pair, index: (compactions.append(len(index.entries)),
+                                                                 original(pair, index)))
+
+    for i in range(20):
+        memory.add("pt", "en", {f"Cláusula número {i:03d} do contrato de prestação": f"Clause {i}"})
+
+    # A 11ª entrada consolida para 5; a próxima só depois de mais 6
+    assert compactions == [11, 11]
+    log = memory._log_file(memory._pair_key("pt", "en")).read_text(encoding="utf-8").splitlines()
+    assert len(log) == 8
+    assert memory.lookup("pt", "en", "Cláusula número 019 do contrato de prestação").translation == "Clause 19"
+    # As mais antigas saíram da memória (resta só a semelhante, com outro número)
+    oldest = "Cláusula número 000 do contrato de prestação"
+    assert memory.lookup("pt", "en", oldest).source != oldest
+
+
+def test_consolidacao_mantem_as_usadas_mais_recentemente(tmp_path, monkeypatch):
+    monkeypatch.setattr(translation_memory, "TM_MAX_ENTRIES", 10)
+    monkeypatch.setattr(translation_memory, "TM_COMPACT_KEEP", 0.5)
+    monkeypatch.setattr(translation_memory.time, "time", itertools.count(1000).__next__)
+    memory = TranslationMemory(str(tmp_path))
+    other = TranslationMemory(str(tmp_path))
+    clause = "Cláusula número {:03d} do contrato de prestação".format
+
+    for i in range(10):
+        memory.add("pt", "en", {clause(i): f"Clause {i}"})
+        # A primeira entrada é consultada o tempo todo, por outro processo
+        assert other.lookup("pt", "en", clause(0)).translation == "Clause 0"
+    # O acerto vai para o log com a próxima gravação desse processo
+    other.add("pt", "en", {SOURCE: TRANSLATION})
+
+    assert memory.lookup("pt", "en", clause(0)).source == clause(0)
+    log = memory._log_file(memory._pair_key("pt", "en")).read_text(encoding="utf-8")
+    assert '"h"' not in log and len(log.splitlines()) == 5
+    for i in range(1, 7):
+        assert memory.lookup("pt", "en", clause(i)).source != clause(i)
+    for i in (8, 9):
+        assert memory.lookup("pt", "en", clause(i)).translation == f"Clause {i}"
+
+
+def test_memoria_separada_por_cliente(tmp_path):
+    memory = TranslationMemory(str(tmp_path))
+    memory.add("pt", "en", {SOURCE: TRANSLATION}, client_id="acme")
+    assert memory.lookup("pt", "en", SOURCE, client_id="acme").translation == TRANSLATION
+    # Nem reuso nem referência para outro cliente
+    assert memory.lookup("pt", "en", SOURCE, client_id="beta") is None
+    assert memory.lookup("pt", "en", SOURCE.replace("mês", "semana"), client_id="beta") is None
+    assert memory.lookup("pt", "en", SOURCE) is None
+
+
+def test_memoria_compartilhada_quando_configurada(tmp_path, monkeypatch):
+    monkeypatch.setattr(translation_memory, "TM_SCOPE", "shared")
+    memory = TranslationMemory(str(tmp_path))
+    memory.add("pt", "en", {SOURCE: TRANSLATION}, client_id="acme")
+    assert memory.lookup("pt", "en", SOURCE, client_id="beta").translation == TRANSLATION
+    assert (tmp_path / "pt__en.jsonl").exists()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Testes do tradutor de PPTX/XLSX (translate_multi) com o backend mock"""
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+import translator_core_pro
+from translator_core_pro import translate_file_multi
+
+CELLS = ["Receita bruta", "Despesas operacionais", "Receita bruta", 1234, "12,5%", "Lucro líquido"]
+# Células de texto (números não são coletados)
+ELEMENTS = sum(isinstance(value, str) for value in CELLS)
+
+
+@pytest.fixture
+def xlsx_path(tmp_path):
+    wb = Workbook()
+    for row, value in enumerate(CELLS, 1):
+        wb.active.cell(row=row, column=1, value=value)
+    path = tmp_path / "planilha.xlsx"
+    wb.save(str(path))
+    return path
+
+
+def cells(path):
+    return [row[0] for row in load_workbook(str(path)).active.iter_rows(values_only=True)]
+
+
+def test_textos_unicos_num_lote_por_idioma(xlsx_path, tmp_path):
+    outputs = {lang: str(tmp_path / f"saida_{lang}.xlsx") for lang in ("en", "es")}
+    progress = []
+    results = translate_file_multi(str(xlsx_path), outputs, "pt",
+                                   progress_callback=lambda segments, tokens: progress.append(segments))
+
+    for lang, result in results.items():
+        assert result.success and not result.errors
+        assert result.translated_elements == result.original_elements == ELEMENTS
+        # Três textos distintos traduzíveis, uma única chamada
+        assert result.usage["requests"] == 1
+        assert cells(outputs[lang]) == [f"[{lang}] {v}" if isinstance(v, str) and v != "12,5%" else v
+                                        for v in CELLS]
+    # "Receita bruta" aparece duas vezes: 4 segmentos por idioma
+    assert max(progress) == 8
+
+
+def test_lote_com_falha_aparece_no_resultado(xlsx_path, tmp_path, monkeypatch):
+    original = translator_core_pro.pedir_traducao_structured
+
+    def flaky(lote, target_lang, source_lang, model):
+        if any(item["text"] == "Lucro líquido" for item in lote):
+            raise Exception("limite de requisições")
+        return original(lote, target_lang, source_lang, model)
+
+    monkeypatch.setattr(translator_core_pro, "pedir_traducao_structured", flaky)
+    monkeypatch.setattr(translator_core_pro, "BATCH_TOKEN_BUDGET", 1)
+    output = tmp_path / "saida.xlsx"
+    result = translate_file_multi(str(xlsx_path), {"en": str(output)}, "pt")["en"]
+
+    # Falha parcial: o documento sai, mas o erro não é engolido
+    assert result.success
+    assert result.errors == ["Erro no lote 3 (en): limite de requisições"]
+    assert result.translated_elements == ELEMENTS - 1
+    assert cells(output)[-1] == "Lucro líquido"
+
+
+def test_sem_nenhum_lote_traduzido_o_idioma_falha(xlsx_path, tmp_path, monkeypatch):
+    def down(lote, target_lang, source_lang, model):
+        raise Exception("serviço indisponível")
+
+    monkeypatch.setattr(translator_core_pro, "pedir_traducao_structured", down)
+    output = tmp_path / "saida.xlsx"
+    result = translate_file_multi(str(xlsx_path), {"en": str(output)}, "pt")["en"]
+    assert not result.success
+    assert "serviço indisponível" in "; ".join(result.errors)
+    assert not output.exists()
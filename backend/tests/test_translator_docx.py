@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Testes do tradutor de DOCX com o backend mock"""
+
+import pytest
+from docx import Document
+
+import translator_openai_official
+from translation_memory import TranslationMemory
+from translator_openai_official import translate_docx_multi
+
+PARAGRAPHS = [
+    "Cláusula primeira: o contratante pagará o valor acordado até o quinto dia útil.",
+    "Cláusula segunda: a vigência deste contrato é de doze meses a partir da assinatura.",
+]
+
+
+@pytest.fixture
+def docx_path(tmp_path):
+    doc = Document()
+    for text in PARAGRAPHS:
+        doc.add_paragraph(text)
+    path = tmp_path / "contrato.docx"
+    doc.save(str(path))
+    return path
+
+
+@pytest.fixture
+def memory(tmp_path, monkeypatch):
+    memory = TranslationMemory(str(tmp_path / "tm"))
+    monkeypatch.setattr(translator_openai_official, "translation_memory", memory)
+    return memory
+
+
+def translate(docx_path, tmp_path, name, client_id):
+    return translate_docx_multi(str(docx_path), {"en": str(tmp_path / f"{name}.docx")}, "pt",
+                                checkpoint_paths={"en": str(tmp_path / f"{name}.jsonl")},
+                                client_id=client_id)["en"]
+
+
+def test_traduz_e_aplica_no_documento(docx_path, tmp_path, memory):
+    result = translate(docx_path, tmp_path, "saida", "acme")
+    assert result.success and result.translated_segments == len(PARAGRAPHS)
+    assert result.usage["requests"] == 1
+    texts = [p.text for p in Document(str(tmp_path / "saida.docx")).paragraphs]
+    assert texts == [f"[en] {text}" for text in PARAGRAPHS]
+
+
+def test_memoria_reaproveitada_so_pelo_mesmo_cliente(docx_path, tmp_path, memory):
+    assert translate(docx_path, tmp_path, "a1", "acme").memory_segments == 0
+
+    again = translate(docx_path, tmp_path, "a2", "acme")
+    assert again.memory_segments == len(PARAGRAPHS)
+    assert again.usage["requests"] == 0
+
+    other = translate(docx_path, tmp_path, "b1", "beta")
+    assert other.memory_segments == 0
+    assert other.usage["requests"] == 1
+
+
+def test_translate_text_batch_respeita_o_orcamento_de_tokens(monkeypatch):
+    import translator_core
+    lotes = []
+    original = translator_core.pedir_traducao_structured
+
+    def spy(lote, target_lang, source_lang, model):
+        lotes.append(len(lote))
+        return original(lote, target_lang, source_lang, model)
+
+    monkeypatch.setattr(translator_core, "pedir_traducao_structured", spy)
+    monkeypatch.setattr(translator_core, "BATCH_TOKEN_BUDGET", 10)
+    texts = ["um texto de uns trinta caracteres", "", "outro texto de uns trinta chars"]
+    result = translator_core.translate_text_batch(texts, "pt", "en")
+    assert result == {"text_0": "[en] um texto de uns trinta caracteres", "text_1": "",
+                      "text_2": "[en] outro texto de uns trinta chars"}
+    assert lotes == [1, 1]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Testes da contabilidade de tokens e custo"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from translation_backends import Usage, split_usage
+from usage_ledger import UsageLedger, model_prices, usage_cost, usage_summary
+
+
+def test_split_usage_preserva_a_soma():
+    usage = Usage(requests=1, prompt_tokens=1001, cached_tokens=256, completion_tokens=333)
+    parts = split_usage(usage, [3, 1, 1])
+    for name in ("requests", "prompt_tokens", "cached_tokens", "completion_tokens"):
+        assert sum(getattr(p, name) for p in parts) == getattr(usage, name)
+    assert parts[0].prompt_tokens == 601
+    # A requisição dividida conta para um só job
+    assert sum(p.requests for p in parts) == 1
+
+
+def test_split_usage_sem_pesos():
+    parts = split_usage(Usage(requests=1, prompt_tokens=10), [0, 0])
+    assert sum(p.prompt_tokens for p in parts) == 10
+
+
+def test_usage_cost_cobra_cache_a_parte():
+    usage = Usage(requests=1, prompt_tokens=1_000_000, cached_tokens=400_000, completion_tokens=100_000)
+    # gpt-4.1: 2.00 entrada, 0.50 cache, 8.00 saída por milhão
+    assert usage_cost("gpt-4.1", usage) == pytest.approx(0.6 * 2.00 + 0.4 * 0.50 + 0.1 * 8.00)
+    assert model_prices("gpt-4.1-2025-04-14") == model_prices("gpt-4.1")
+    assert model_prices("gpt-4.1-mini-2025-04-14") == model_prices("gpt-4.1-mini")
+    assert usage_cost("modelo-sem-preco", usage) is None
+
+
+def test_usage_summary_lista_modelos_sem_preco():
+    summary = usage_summary({"gpt-4.1": Usage(requests=1, prompt_tokens=1000),
+                             "local": Usage(requests=2, completion_tokens=50)})
+    assert summary["requests"] == 3
+    assert summary["unpriced_models"] == ["local"]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    ledger = UsageLedger(str(tmp_path / "usage"))
+    ledger.record("acme", "job1", "contrato.docx", ["en"], "gpt-4.1",
+                  usage_summary({"gpt-4.1": Usage(requests=1, prompt_tokens=1000, completion_tokens=500)}), 10)
+    monkeypatch.setattr(main, "usage_ledger", ledger)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "segredo")
+    return TestClient(main.app)
+
+
+def test_relatorio_exige_token_de_administracao(client):
+    assert client.get("/api/usage/report").status_code == 403
+    assert client.get("/api/usage/report", headers={"Authorization": "Bearer errado"}).status_code == 403
+
+    response = client.get("/api/usage/report", headers={"Authorization": "Bearer segredo"})
+    assert response.status_code == 200
+    report = response.json()
+    assert [c["client_id"] for c in report["clients"]] == ["acme"]
+    assert report["top_documents"][0]["tokens_per_segment"] == 150.0
+
+
+def test_relatorio_desligado_sem_token_configurado(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    assert client.get("/api/usage/report", headers={"Authorization": "Bearer "}).status_code == 403
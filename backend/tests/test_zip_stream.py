@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Testes do ZIP montado sob demanda"""
+
+import io
+import os
+import zipfile
+
+import pytest
+
+from zip_stream import ZipPlan, file_crc32, file_digest, zip_member
+
+
+@pytest.fixture
+def arquivos(tmp_path):
+    paths = []
+    for name, size in (("relatorio.docx", 300_000), ("tradução.xlsx", 1234), ("vazio.pptx", 0)):
+        path = tmp_path / name
+        path.write_bytes(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def test_digest_e_crc_batem_com_zlib(arquivos):
+    path = arquivos[0]
+    digest = file_digest(path)
+    assert digest["crc32"] == file_crc32(path)
+    assert digest["size"] == path.stat().st_size
+
+
+def test_tamanho_do_plano_e_o_do_zip_gerado(arquivos):
+    plan = ZipPlan([zip_member(path) for path in arquivos])
+    data = b"".join(plan.iter_bytes())
+    assert len(data) == plan.size
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        infos = zf.infolist()
+        assert [info.filename for info in infos] == [path.name for path in arquivos]
+        for info, path in zip(infos, arquivos):
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert info.file_size == path.stat().st_size
+            assert zf.read(info) == path.read_bytes()
+
+
+def test_faixas_concatenadas_reproduzem_o_zip(arquivos):
+    plan = ZipPlan([zip_member(path) for path in arquivos])
+    data = b"".join(plan.iter_bytes())
+    # Cortes dentro de cabeçalhos, de membros e do diretório central
+    cuts = [0, 10, 31, 5000, plan.size - 40, plan.size]
+    pieces = [b"".join(plan.iter_bytes(lo, hi - 1)) for lo, hi in zip(cuts, cuts[1:])]
+    assert b"".join(pieces) == data
+    assert b"".join(plan.iter_bytes(plan.size - 22)) == data[-22:]
+
+
+def test_limite_de_membros(arquivos, monkeypatch):
+    monkeypatch.setattr("zip_stream.ZIP_MAX_MEMBERS", 2)
+    with pytest.raises(ValueError):
+        ZipPlan([zip_member(path) for path in arquivos])
@@ -0,0 +1,295 @@
+"""
+Rastreamento distribuído (spans compatíveis com OpenTelemetry)
+
+Um pedido, o job da fila que ele gera, cada arquivo e cada lote enviado
+ao modelo (com as tentativas) viram spans de um mesmo trace. O contexto
+segue o padrão W3C (cabeçalho traceparent): chega no request HTTP, é
+guardado no job e retomado pelo worker que o processa, em qualquer
+processo. Os spans são exportados em OTLP/JSON, para um collector
+(OTLP/HTTP) ou para arquivo (uma requisição de exportação por linha, o
+formato lido pelo receiver otlpjsonfile do collector).
+"""
+
+import contextvars
+import json
+import os
+import queue
+import re
+import secrets
+import socket
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Destino dos spans: none (desligado), file ou otlp
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACING_DIR = os.getenv("TRACING_DIR", "data/traces")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/") + "/v1/traces"
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "tradutor-universal-api")
+# Intervalo máximo entre exportações e spans por exportação
+TRACING_FLUSH_S = float(os.getenv("TRACING_FLUSH_S", "2"))
+TRACING_BATCH_SIZE = int(os.getenv("TRACING_BATCH_SIZE", "512"))
+# Spans aguardando exportação (acima disso são descartados)
+TRACING_QUEUE_SIZE = int(os.getenv("TRACING_QUEUE_SIZE", "10000"))
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Tipos de span do OTLP
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Contexto de um cabeçalho traceparent (W3C) ou None se inválido"""
+    match = _TRACEPARENT_RE.match((value or "").strip().lower())
+    if not match or set(match.group(1)) == {"0"} or set(match.group(2)) == {"0"}:
+        return None
+    return SpanContext(match.group(1), match.group(2))
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict) -> List[Dict]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+class Span:
+    """Um span em andamento ou concluído"""
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str] = None,
+                 kind: str = "internal", attributes: Dict = None, links: Iterable[SpanContext] = ()):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict = dict(attributes or {})
+        self.links = list(links)
+        self.events: List[Dict] = []
+        self.status_code = 0  # 0 = não definido, 1 = ok, 2 = erro
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: Dict = None):
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": dict(attributes or {})})
+
+    def record_exception(self, error: BaseException):
+        self.add_event("exception", {"exception.type": type(error).__name__, "exception.message": str(error)})
+        self.status_code = 2
+        self.status_message = str(error)[:500]
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": [{"name": e["name"], "timeUnixNano": str(e["time_ns"]),
+                        "attributes": _otlp_attributes(e["attributes"])} for e in self.events],
+            "links": [{"traceId": link.trace_id, "spanId": link.span_id} for link in self.links],
+            "status": {"code": self.status_code, **({"message": self.status_message} if self.status_message else {})}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+class _NoopSpan:
+    """Span usado com o rastreamento desligado"""
+    context = None
+
+    @property
+    def name(self) -> str:
+        return ""
+
+    @name.setter
+    def name(self, value):
+        pass
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+class Tracer:
+    """
+    Cria spans e os exporta em segundo plano
+
+    O span atual fica num ContextVar: segue chamadas aninhadas, tarefas
+    asyncio e threads iniciadas com contextvars.copy_context(). Entre
+    processos (a fila), o contexto vai como traceparent no job. A
+    exportação é em lotes numa thread própria; se o destino falhar, os
+    spans do lote são descartados com um aviso, sem afetar a tradução.
+    """
+
+    def __init__(self, exporter: str = TRACING_EXPORTER, traces_dir: str = TRACING_DIR,
+                 endpoint: str = OTLP_ENDPOINT):
+        self.exporter = exporter if exporter in ("file", "otlp") else "none"
+        self.traces_dir = Path(traces_dir)
+        self.endpoint = endpoint
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=TRACING_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._dropped = 0
+        self._resource = {"attributes": _otlp_attributes({
+            "service.name": SERVICE_NAME,
+            "host.name": socket.gethostname(),
+            "process.pid": os.getpid()
+        })}
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter != "none"
+
+    @contextmanager
+    def span(self, name: str, attributes: Dict = None,
+             parent: Union[SpanContext, str, None] = None, kind: str = "internal",
+             links: Iterable[SpanContext] = ()):
+        """
+        Span em volta do bloco; parent (contexto ou traceparent) substitui o
+        span atual como pai. Exceções marcam o span com erro e seguem adiante.
+        """
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        if isinstance(parent, str):
+            parent = parse_traceparent(parent)
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current else None
+        context = SpanContext(parent.trace_id if parent else secrets.token_hex(16), secrets.token_hex(8))
+        span = Span(name, context, parent.span_id if parent else None, kind, attributes,
+                    [link for link in links if link])
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._enqueue(span)
+
+    def current_context(self) -> Optional[SpanContext]:
+        span = _current_span.get()
+        return span.context if span else None
+
+    def current_traceparent(self) -> Optional[str]:
+        """traceparent do span atual (para propagar a outro processo) ou None"""
+        context = self.current_context()
+        return context.traceparent if context else None
+
+    # ----- Exportação -----
+
+    def _enqueue(self, span: Span):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+                if self._dropped % 1000 == 1:
+                    logger.warning(f"Fila de spans cheia: {self._dropped} span(s) descartado(s)")
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._export_loop, daemon=True, name="trace-exporter")
+                self._thread.start()
+
+    def _export_loop(self):
+        while not self._stop.is_set():
+            batch = self._drain(timeout=TRACING_FLUSH_S)
+            if batch:
+                self._export(batch)
+
+    def _drain(self, timeout: float = 0.0) -> List[Span]:
+        batch: List[Span] = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < TRACING_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, spans: List[Span]):
+        payload = {"resourceSpans": [{
+            "resource": self._resource,
+            "scopeSpans": [{"scope": {"name": "tradutor"}, "spans": [s.to_otlp() for s in spans]}]
+        }]}
+        try:
+            if self.exporter == "file":
+                self.traces_dir.mkdir(parents=True, exist_ok=True)
+                path = self.traces_dir / f"spans-{socket.gethostname()}-{os.getpid()}.jsonl"
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            else:
+                response = httpx.post(self.endpoint, json=payload, timeout=5.0)
+                response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Erro ao exportar {len(spans)} span(s): {e}")
+
+    def flush(self):
+        """Exporta imediatamente os spans pendentes"""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            self._export(batch)
+
+    def shutdown(self):
+        """Para a exportação em segundo plano e exporta o que restou"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=TRACING_FLUSH_S + 5)
+        if self.enabled:
+            self.flush()
+
+# Instância global do rastreamento
+tracer = Tracer()
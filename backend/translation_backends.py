@@ -0,0 +1,630 @@
+# -*- coding: utf-8 -*-
+"""
+Backends de tradução (modelo de linguagem por trás dos tradutores)
+
+Todos os tradutores enviam lotes id → texto por uma única interface e
+recebem id → tradução mais o uso de tokens. O backend OpenAI chama a API
+com Structured Outputs; o backend mock é local e determinístico (latência,
+taxa de erro e contagem de tokens configuráveis), para testes e benchmarks
+sem rede. A escolha vem de TRANSLATION_BACKEND (openai | mock).
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+from config import get_openai_client, get_async_openai_client, close_async_openai_client, DEFAULT_MODEL
+from document_stats import estimate_tokens
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "openai")
+# Backend mock: latência fixa por requisição, latência por token de saída e fração de requisições com erro
+MOCK_LATENCY_S = float(os.getenv("MOCK_LATENCY_S", "0.05"))
+MOCK_LATENCY_PER_TOKEN_S = float(os.getenv("MOCK_LATENCY_PER_TOKEN_S", "0"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+MOCK_SEED = os.getenv("MOCK_SEED", "0")
+
+# Envia prompt_cache_key (desligar para APIs compatíveis que rejeitam o parâmetro)
+PROMPT_CACHE_KEY = os.getenv("PROMPT_CACHE_KEY", "1") == "1"
+# Prefixo mínimo, em tokens, para o provedor usar o cache de prompt (1024 na OpenAI);
+# o prefixo padrão (instruções, diretrizes, exemplo e schema) fica acima disso em todos os formatos
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+# Backend mock: prefixo mínimo para o cache de prompt simulado
+MOCK_CACHE_MIN_TOKENS = int(os.getenv("MOCK_CACHE_MIN_TOKENS", str(PROMPT_CACHE_MIN_TOKENS)))
+
+# Formato da resposta: full (id e translated_text), compact (chaves curtas e ids numéricos do lote)
+# ou positional (só as traduções, na ordem dos segmentos). Os compactos são ligados por modelo em
+# OUTPUT_FORMAT_BY_MODEL (ex.: {"gpt-4.1-mini": "compact"}), depois de medidos com o modelo
+OUTPUT_FORMATS = ("full", "compact", "positional")
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "full")
+OUTPUT_FORMAT_BY_MODEL: Dict[str, str] = json.loads(os.getenv("OUTPUT_FORMAT_BY_MODEL", "{}"))
+
+SYSTEM_PROMPT = "Você é um tradutor profissional especializado. Siga exatamente as instruções fornecidas."
+
+# Resposta completa (formato full): {"translations": [{"id": ..., "translated_text": ...}]}
+TRANSLATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "translations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "translated_text": {"type": "string"}
+                },
+                "required": ["id", "translated_text"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["translations"],
+    "additionalProperties": False
+}
+
+# Resposta compacta: {"t": [{"i": <posição do segmento no lote>, "t": <tradução>}]}
+COMPACT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "t": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "i": {"type": "integer"},
+                    "t": {"type": "string"}
+                },
+                "required": ["i", "t"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["t"],
+    "additionalProperties": False
+}
+
+# Resposta posicional: {"t": [<tradução>, ...]} na ordem dos segmentos
+POSITIONAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "t": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["t"],
+    "additionalProperties": False
+}
+
+OUTPUT_SCHEMAS = {"full": TRANSLATION_SCHEMA, "compact": COMPACT_SCHEMA, "positional": POSITIONAL_SCHEMA}
+
+# Instrução de resposta de cada formato (fim do prefixo estável do prompt)
+OUTPUT_INSTRUCTIONS = {
+    "full": 'Responda APENAS em JSON no formato especificado, com um item por segmento e o mesmo "id".',
+    "compact": 'Responda APENAS em JSON no formato especificado: em "t", um item por segmento, '
+               'com "i" igual ao "id" do segmento e "t" com a tradução.',
+    "positional": 'Responda APENAS em JSON no formato especificado: em "t", exatamente uma tradução por '
+                  'segmento, na mesma ordem dos segmentos.',
+}
+
+def match_model(model: str, names) -> Optional[str]:
+    """Nome configurado para o modelo: o próprio ou, para versões datadas (gpt-5-2025-08-07), o nome base mais longo"""
+    if model in names:
+        return model
+    matches = [name for name in names if model.startswith(name + "-")]
+    return max(matches, key=len) if matches else None
+
+def output_format(model: str) -> str:
+    """Formato da resposta para o modelo (OUTPUT_FORMAT_BY_MODEL, senão OUTPUT_FORMAT)"""
+    name = match_model(model or DEFAULT_MODEL, OUTPUT_FORMAT_BY_MODEL)
+    fmt = OUTPUT_FORMAT_BY_MODEL[name] if name else OUTPUT_FORMAT
+    return fmt if fmt in OUTPUT_FORMATS else "full"
+
+def encode_translations(translations: Dict[str, str], fmt: str) -> Dict:
+    """Resposta no formato fmt (ids do lote na ordem de translations); usada pelo backend mock"""
+    if fmt == "compact":
+        return {"t": [{"i": i, "t": text} for i, text in enumerate(translations.values())]}
+    if fmt == "positional":
+        return {"t": list(translations.values())}
+    return {"translations": [{"id": k, "translated_text": v} for k, v in translations.items()]}
+
+def decode_translations(result_json: Dict, ids: List[str], fmt: str) -> Dict[str, str]:
+    """
+    id do segmento → tradução a partir da resposta no formato fmt
+
+    Nos formatos compact e positional, a resposta precisa trazer exatamente
+    uma tradução por segmento; do contrário levanta ValueError (e o lote é
+    tentado de novo), em vez de atribuir traduções aos segmentos errados.
+    """
+    if fmt == "full":
+        return {item["id"]: item["translated_text"] for item in result_json["translations"]}
+    items = result_json["t"]
+    if len(items) != len(ids):
+        raise ValueError(f"Resposta com {len(items)} tradução(ões) para {len(ids)} segmento(s)")
+    if fmt == "positional":
+        return dict(zip(ids, items))
+    positions = sorted(item["i"] for item in items)
+    if positions != list(range(len(ids))):
+        raise ValueError(f"Resposta com ids fora do lote ou repetidos ({len(ids)} segmento(s))")
+    return {ids[item["i"]]: item["t"] for item in items}
+
+@dataclass
+class Usage:
+    """Uso de tokens de uma ou mais requisições"""
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+
+    def add(self, other: "Usage"):
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.cached_tokens += other.cached_tokens
+        self.completion_tokens += other.completion_tokens
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+def split_usage(usage: Usage, weights: List[int]) -> List[Usage]:
+    """
+    Divide o uso proporcionalmente aos pesos (lotes compartilhados entre jobs)
+
+    A soma é preservada; com isso, uma requisição dividida entre jobs conta
+    para um só deles (os demais ficam só com os tokens).
+    """
+    total = sum(weights) or 1
+    parts = [Usage() for _ in weights]
+    for name in ("requests", "prompt_tokens", "cached_tokens", "completion_tokens"):
+        value = getattr(usage, name)
+        remaining = value
+        for part, weight in zip(parts[:-1], weights[:-1]):
+            share = round(value * weight / total)
+            setattr(part, name, share)
+            remaining -= share
+        setattr(parts[-1], name, remaining)
+    return parts
+
+class UsageMeter:
+    """
+    Uso por modelo das chamadas feitas dentro de metered()
+
+    O medidor segue o contexto: threads iniciadas com
+    contextvars.copy_context() e tarefas do loop assíncrono somam no mesmo
+    medidor. Medidores aninhados repassam o uso ao de fora.
+    """
+
+    def __init__(self, parent: Optional["UsageMeter"] = None):
+        self.parent = parent
+        self._lock = threading.Lock()
+        self._by_model: Dict[str, Usage] = {}
+
+    def add(self, model: str, usage: Usage):
+        with self._lock:
+            self._by_model.setdefault(model, Usage()).add(usage)
+        if self.parent:
+            self.parent.add(model, usage)
+
+    def by_model(self) -> Dict[str, Usage]:
+        with self._lock:
+            return {model: Usage(**usage.to_dict()) for model, usage in self._by_model.items()}
+
+_current_meter: contextvars.ContextVar[Optional[UsageMeter]] = contextvars.ContextVar("usage_meter", default=None)
+
+@contextmanager
+def metered(meter: Optional[UsageMeter] = None):
+    """Mede o uso das chamadas ao modelo feitas no bloco"""
+    meter = meter or UsageMeter()
+    meter.parent = meter.parent or _current_meter.get()
+    token = _current_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _current_meter.reset(token)
+
+def run_metered(meter: UsageMeter, fn, *args):
+    """fn(*args) medido em meter (para executores)"""
+    with metered(meter):
+        return fn(*args)
+
+def record_usage(model: str, usage: Usage):
+    """Soma o uso ao medidor do contexto atual, se houver"""
+    meter = _current_meter.get()
+    if meter:
+        meter.add(model, usage)
+
+@dataclass
+class BatchResult:
+    translations: Dict[str, str]
+    usage: Usage = field(default_factory=Usage)
+
+# Regras fixas de tradução (parte do prefixo estável; o tamanho do prefixo
+# decide se o provedor usa o cache de prompt, ver PROMPT_CACHE_MIN_TOKENS)
+TRANSLATION_GUIDELINES = """DIRETRIZES DE TRADUÇÃO:
+
+1. Segmentos de documento
+- Cada segmento é um trecho de texto de um documento (parágrafo, célula, caixa de texto ou parte de uma frase)
+- Uma frase pode estar dividida em vários segmentos consecutivos por causa da formatação (negrito, itálico, hiperlink); traduza cada parte de modo que, lidas em sequência, formem uma frase natural no idioma de destino
+- Nunca mova texto de um segmento para outro, nunca junte nem divida segmentos; a tradução de cada "id" contém apenas o conteúdo daquele segmento
+- Se a ordem das palavras no idioma de destino exigir, redistribua a frase entre as partes da melhor forma possível, mantendo em cada parte o termo que ela destacava no original
+- Títulos, itens de lista e células de tabela são traduzidos como tais, sem pontuação final que o original não tenha
+
+2. Números, datas, valores e unidades
+- Mantenha os números exatamente como no original, inclusive separadores de milhar e decimais, numeração de cláusulas e itens (3.2, 4.1.a, §2º)
+- Não converta moedas, unidades de medida, fusos horários ou formatos de data
+- Números por extenso entre parênteses, como "30 (trinta)", são traduzidos por extenso no idioma de destino, mantendo o algarismo
+
+3. Nomes, siglas e referências
+- Nomes de pessoas, empresas, marcas, produtos e sistemas ficam como no original
+- Órgãos, leis e normas só são traduzidos quando existe tradução oficial consagrada; na dúvida, mantenha o original
+- Siglas ficam como no original; não expanda nem crie siglas novas
+
+4. Conteúdo que não se traduz
+- URLs, endereços de e-mail, caminhos de arquivo, código, fórmulas e identificadores ficam idênticos
+- Marcadores e variáveis como {0}, {{nome}}, %s, %d, <b>, </b> e [1] ficam idênticos e na mesma posição relativa
+- Um segmento que já está no idioma de destino, ou que não tem texto traduzível, é devolvido sem alterações
+
+5. Estilo
+- Mantenha o registro do original (jurídico, técnico, comercial, informal) e o tratamento (formal ou informal)
+- Use a mesma tradução para o mesmo termo em todos os segmentos do lote
+- Preserve maiúsculas de ênfase (TÍTULOS EM CAIXA ALTA continuam em caixa alta)
+- Use as aspas, os espaços antes de pontuação e as demais convenções tipográficas do idioma de destino
+- Não acrescente notas, comentários, explicações, alternativas nem texto que não esteja no original
+
+6. Traduções de referência ("ref")
+- "ref" traz o texto de origem ("source") e a tradução aprovada ("translation") de um trecho parecido já traduzido
+- Compare o "text" do segmento com o "source" da referência: reaproveite a redação e a terminologia da tradução aprovada nas partes iguais e traduza apenas as diferenças (números, nomes, palavras trocadas)
+- A referência nunca substitui o segmento: se o sentido mudou, a tradução acompanha o novo texto
+- Segmentos sem "ref" seguem as mesmas escolhas de termos feitas nos segmentos com "ref" do lote
+
+7. Conferência final
+- Há exatamente uma tradução para cada segmento recebido, e nenhuma a mais
+- Nenhuma tradução ficou vazia quando o segmento tinha texto
+- Números, marcadores, URLs e nomes conferem com o original
+- A resposta é apenas o JSON, sem texto antes ou depois e sem blocos de código"""
+
+# Exemplo fixo do formato de resposta (português → inglês), montado pelo mesmo codificador do mock
+EXAMPLE_SEGMENTS = {
+    "s1": "Cláusula 3.2 – Prazo de entrega",
+    "s2": "O fornecedor entregará os",
+    "s3": "equipamentos",
+    "s4": "em até 30 (trinta) dias úteis, conforme www.exemplo.com.br/prazos.",
+    "s5": "O prazo poderá ser prorrogado por 15 (quinze) dias mediante aviso prévio.",
+}
+EXAMPLE_REFS = {
+    "s5": {"source": "O prazo poderá ser prorrogado por 10 (dez) dias mediante aviso prévio.",
+           "translation": "The period may be extended by 10 (ten) days upon prior notice."},
+}
+EXAMPLE_TRANSLATIONS = {
+    "s1": "Clause 3.2 – Delivery period",
+    "s2": "The supplier shall deliver the",
+    "s3": "equipment",
+    "s4": "within 30 (thirty) business days, as per www.exemplo.com.br/prazos.",
+    "s5": "The period may be extended by 15 (fifteen) days upon prior notice.",
+}
+
+def build_system_prompt(source_lang: str, target_lang: str, fmt: str = "full") -> str:
+    """
+    Prefixo estável do prompt: instruções, diretrizes e formato com exemplo,
+    depois o par de idiomas
+
+    Igual em todos os lotes do mesmo par de idiomas (nada do lote entra
+    aqui), para o cache de prompt do provedor reaproveitar o prefixo entre
+    lotes, jobs e processos.
+    """
+    example_in = build_batch_prompt(EXAMPLE_SEGMENTS, EXAMPLE_REFS, fmt)
+    example_out = json.dumps(encode_translations(EXAMPLE_TRANSLATIONS, fmt), ensure_ascii=False)
+    return f"""{SYSTEM_PROMPT}
+
+INSTRUÇÕES CRÍTICAS:
+- Traduza integralmente o "text" de cada segmento
+- NÃO resuma, NÃO omita, NÃO abrevie nenhum conteúdo
+- Preserve EXATAMENTE todos os números, datas, siglas e formatação
+- Mantenha a mesma estrutura e pontuação
+- Traduza PALAVRA POR PALAVRA quando necessário para fidelidade total
+- Para termos técnicos, use a tradução padrão mais precisa
+- Quando houver "ref" (tradução anterior de um trecho semelhante), mantenha a mesma terminologia e redação e adapte apenas o que mudou
+
+{TRANSLATION_GUIDELINES}
+
+FORMATO:
+Os segmentos chegam na mensagem do usuário como uma lista JSON de objetos {{"id", "text"[, "ref"]}}.
+{OUTPUT_INSTRUCTIONS[fmt]}
+
+Exemplo (português → inglês, apenas para ilustrar o formato, a divisão de uma frase em segmentos e o uso de "ref"):
+Entrada: {example_in}
+Resposta: {example_out}
+
+Idioma de origem: {source_lang}
+Idioma de destino: {target_lang}"""
+
+def build_batch_prompt(segments: Dict[str, str], refs: Optional[Dict[str, Dict]] = None, fmt: str = "full") -> str:
+    """
+    Parte variável do prompt: os segmentos do lote
+
+    refs traz, por id, a tradução anterior de um trecho semelhante. Fora do
+    formato full, os ids vão como a posição do segmento no lote (0, 1, ...).
+    """
+    refs = refs or {}
+    segmentos = []
+    for i, (seg_id, text) in enumerate(segments.items()):
+        segmento = {"id": seg_id if fmt == "full" else i, "text": text}
+        if refs.get(seg_id):
+            segmento["ref"] = refs[seg_id]
+        segmentos.append(segmento)
+    return json.dumps(segmentos, ensure_ascii=False)
+
+def build_messages(segments: Dict[str, str], source_lang: str, target_lang: str,
+                   refs: Optional[Dict[str, Dict]] = None, fmt: str = "full") -> List[Dict[str, str]]:
+    """Mensagens de um lote: prefixo estável (system) e segmentos (user)"""
+    return [
+        {"role": "system", "content": build_system_prompt(source_lang, target_lang, fmt)},
+        {"role": "user", "content": build_batch_prompt(segments, refs, fmt)}
+    ]
+
+def prefix_tokens(source_lang: str, target_lang: str, fmt: str = "full") -> int:
+    """Tokens estimados do prefixo estável (mensagem system e schema da resposta)"""
+    return estimate_tokens(build_system_prompt(source_lang, target_lang, fmt)) + \
+        estimate_tokens(json.dumps(OUTPUT_SCHEMAS[fmt]))
+
+def prompt_cache_key(model: str, source_lang: str, target_lang: str, fmt: str = "full") -> str:
+    """Chave de roteamento do cache de prompt: lotes com o mesmo prefixo vão ao mesmo cache"""
+    prefix = build_system_prompt(source_lang, target_lang, fmt)
+    return "tradutor-" + hashlib.sha256(f"{model}|{prefix}".encode('utf-8')).hexdigest()[:16]
+
+def is_rate_limit(error: Exception) -> bool:
+    """Erro de limite de taxa (HTTP 429) do provedor"""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Espera pedida pelo provedor (cabeçalho Retry-After) ou None"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after")) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class TranslationBackend:
+    """
+    Interface dos backends: um lote id → texto por chamada
+
+    translate_batch levanta exceção em falha (as novas tentativas ficam
+    com quem chama). O uso acumulado fica em stats(). translate_batch_async
+    é a mesma chamada para o loop assíncrono; backends sem cliente
+    assíncrono próprio rodam a versão síncrona numa thread.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage = Usage()
+        self._errors = 0
+
+    def translate_batch(self, segments: Dict[str, str], source_lang: str, target_lang: str,
+                        model: Optional[str] = None, refs: Optional[Dict[str, Dict]] = None) -> BatchResult:
+        model = model or DEFAULT_MODEL
+        start = time.perf_counter()
+        try:
+            result = self._translate(segments, source_lang, target_lang, model, refs)
+        except Exception as e:
+            self._record_error(e, model, start)
+            raise
+        self._record(result, model, start)
+        return result
+
+    async def translate_batch_async(self, segments: Dict[str, str], source_lang: str, target_lang: str,
+                                    model: Optional[str] = None,
+                                    refs: Optional[Dict[str, Dict]] = None) -> BatchResult:
+        model = model or DEFAULT_MODEL
+        start = time.perf_counter()
+        try:
+            result = await self._translate_async(segments, source_lang, target_lang, model, refs)
+        except Exception as e:
+            self._record_error(e, model, start)
+            raise
+        self._record(result, model, start)
+        return result
+
+    def _record(self, result: BatchResult, model: str, start: float):
+        labels = {"backend": self.name, "model": model}
+        metrics.observe("translation_api_request_duration_seconds", time.perf_counter() - start,
+                        {**labels, "outcome": "ok"})
+        metrics.inc("translation_api_requests_total", {**labels, "outcome": "ok"})
+        for kind in ("prompt", "cached", "completion"):
+            tokens = getattr(result.usage, f"{kind}_tokens")
+            if tokens:
+                metrics.inc("translation_api_tokens_total", {**labels, "kind": kind}, tokens)
+        with self._lock:
+            self._usage.add(result.usage)
+        record_usage(model, result.usage)
+
+    def _record_error(self, error: Exception, model: str, start: float):
+        labels = {"backend": self.name, "model": model}
+        outcome = "rate_limited" if is_rate_limit(error) else "error"
+        metrics.observe("translation_api_request_duration_seconds", time.perf_counter() - start,
+                        {**labels, "outcome": outcome})
+        metrics.inc("translation_api_requests_total", {**labels, "outcome": outcome})
+        if outcome == "rate_limited":
+            metrics.inc("translation_api_rate_limited_total", labels)
+        with self._lock:
+            self._errors += 1
+
+    def _translate(self, segments: Dict[str, str], source_lang: str, target_lang: str, model: str,
+                   refs: Optional[Dict[str, Dict]]) -> BatchResult:
+        raise NotImplementedError
+
+    async def _translate_async(self, segments: Dict[str, str], source_lang: str, target_lang: str, model: str,
+                               refs: Optional[Dict[str, Dict]]) -> BatchResult:
+        return await asyncio.to_thread(self._translate, segments, source_lang, target_lang, model, refs)
+
+    async def aclose(self):
+        """Libera recursos do loop assíncrono (conexões)"""
+
+    def stats(self) -> Dict[str, int]:
+        """Requisições, tokens e erros acumulados desde o início (ou o último reset)"""
+        with self._lock:
+            return {**self._usage.to_dict(), "errors": self._errors}
+
+    def reset_stats(self):
+        with self._lock:
+            self._usage = Usage()
+            self._errors = 0
+
+class OpenAIBackend(TranslationBackend):
+    """Chat Completions com Structured Outputs"""
+
+    name = "openai"
+
+    @staticmethod
+    def _request(segments, source_lang, target_lang, model, refs) -> Dict:
+        """
+        Parâmetros da chamada; prompt_cache_key só vai quando o prefixo
+        estável alcança PROMPT_CACHE_MIN_TOKENS (abaixo disso o provedor não
+        usa o cache e a chave só concentraria os lotes numa mesma máquina)
+        """
+        fmt = output_format(model)
+        cacheable = PROMPT_CACHE_KEY and prefix_tokens(source_lang, target_lang, fmt) >= PROMPT_CACHE_MIN_TOKENS
+        return dict(
+            model=model,
+            messages=build_messages(segments, source_lang, target_lang, refs, fmt),
+            response_format={
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "translation_result",
+                    "schema": OUTPUT_SCHEMAS[fmt]
+                }
+            },
+            temperature=0.1,  # Baixa para consistência
+            max_tokens=200000,
+            **({"extra_body": {"prompt_cache_key": prompt_cache_key(model, source_lang, target_lang, fmt)}}
+               if cacheable else {})
+        )
+
+    def _translate(self, segments, source_lang, target_lang, model, refs):
+        client = get_openai_client()
+        if not client:
+            raise Exception("Cliente OpenAI não disponível")
+        response = client.chat.completions.create(**self._request(segments, source_lang, target_lang, model, refs))
+        return self._parse(response, list(segments), output_format(model))
+
+    async def _translate_async(self, segments, source_lang, target_lang, model, refs):
+        client = get_async_openai_client()
+        if not client:
+            raise Exception("Cliente OpenAI não disponível")
+        response = await client.chat.completions.create(**self._request(segments, source_lang, target_lang, model, refs))
+        return self._parse(response, list(segments), output_format(model))
+
+    async def aclose(self):
+        await close_async_openai_client()
+
+    @staticmethod
+    def _parse(response, ids: List[str], fmt: str) -> BatchResult:
+        result_json = json.loads(response.choices[0].message.content)
+        usage = Usage(requests=1)
+        if response.usage:
+            details = getattr(response.usage, "prompt_tokens_details", None)
+            usage.prompt_tokens = response.usage.prompt_tokens or 0
+            usage.completion_tokens = response.usage.completion_tokens or 0
+            usage.cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        return BatchResult(decode_translations(result_json, ids, fmt), usage)
+
+class MockBackend(TranslationBackend):
+    """
+    Backend local e determinístico
+
+    A tradução é "[<idioma>] <texto>". Os tokens de entrada são estimados
+    sobre as mesmas mensagens do backend OpenAI; os de saída, sobre o JSON
+    da resposta no formato configurado para o modelo. O cache de prompt é simulado como o do provedor: o prefixo
+    (mensagem system) já visto conta como em cache se tiver ao menos
+    MOCK_CACHE_MIN_TOKENS tokens. Se um lote falha ou não depende só do conteúdo do lote e do
+    número da tentativa, não da ordem entre threads.
+    """
+
+    name = "mock"
+
+    def __init__(self, latency_s: float = MOCK_LATENCY_S, latency_per_token_s: float = MOCK_LATENCY_PER_TOKEN_S,
+                 error_rate: float = MOCK_ERROR_RATE, seed: str = MOCK_SEED):
+        super().__init__()
+        self.latency_s = latency_s
+        self.latency_per_token_s = latency_per_token_s
+        self.error_rate = error_rate
+        self.seed = str(seed)
+        self._attempts: Dict[str, int] = {}
+        self._cached_prefixes: set = set()
+
+    def _fails(self, segments: Dict[str, str], target_lang: str) -> bool:
+        if self.error_rate <= 0:
+            return False
+        key = hashlib.sha256(json.dumps([target_lang, segments], sort_keys=True).encode('utf-8')).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        draw = hashlib.sha256(f"{self.seed}|{key}|{attempt}".encode('utf-8')).digest()
+        return int.from_bytes(draw[:8], 'big') / 2 ** 64 < self.error_rate
+
+    def _simulate(self, segments, source_lang, target_lang, model, refs) -> Tuple[BatchResult, float]:
+        """Resultado do lote e a latência simulada"""
+        fmt = output_format(model)
+        system, user = (m["content"] for m in build_messages(segments, source_lang, target_lang, refs, fmt))
+        completion = json.dumps(encode_translations({seg_id: f"[{target_lang}] {text}"
+                                                     for seg_id, text in segments.items()}, fmt), ensure_ascii=False)
+        translations = decode_translations(json.loads(completion), list(segments), fmt)
+        usage = Usage(requests=1, prompt_tokens=estimate_tokens(system) + estimate_tokens(user),
+                      completion_tokens=estimate_tokens(completion))
+        usage.cached_tokens = self._cached(system)
+        return BatchResult(translations, usage), self.latency_s + self.latency_per_token_s * usage.completion_tokens
+
+    def _cached(self, prefix: str) -> int:
+        """Tokens do prefixo servidos do cache simulado: a partir da segunda vez, em blocos de 128"""
+        tokens = estimate_tokens(prefix)
+        key = hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+        with self._lock:
+            seen = key in self._cached_prefixes
+            self._cached_prefixes.add(key)
+        if not seen or tokens < MOCK_CACHE_MIN_TOKENS:
+            return 0
+        return tokens // 128 * 128
+
+    def _translate(self, segments, source_lang, target_lang, model, refs):
+        result, latency = self._simulate(segments, source_lang, target_lang, model, refs)
+        time.sleep(latency)
+        if self._fails(segments, target_lang):
+            raise Exception("Erro simulado pelo backend mock")
+        return result
+
+    async def _translate_async(self, segments, source_lang, target_lang, model, refs):
+        result, latency = self._simulate(segments, source_lang, target_lang, model, refs)
+        await asyncio.sleep(latency)
+        if self._fails(segments, target_lang):
+            raise Exception("Erro simulado pelo backend mock")
+        return result
+
+BACKENDS = {"openai": OpenAIBackend, "mock": MockBackend}
+
+_backend: Optional[TranslationBackend] = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> TranslationBackend:
+    """Backend configurado (TRANSLATION_BACKEND), criado no primeiro uso"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_cls = BACKENDS.get(TRANSLATION_BACKEND)
+            if backend_cls is None:
+                logger.warning(f"TRANSLATION_BACKEND desconhecido: {TRANSLATION_BACKEND}; usando openai")
+                backend_cls = OpenAIBackend
+            _backend = backend_cls()
+            logger.info(f"Backend de tradução: {_backend.name}")
+        return _backend
+
+def set_backend(backend: TranslationBackend):
+    """Troca o backend em uso (testes e benchmarks)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Memória de tradução ligada (0 desliga consultas e gravações)
+TM_ENABLED = os.getenv("TRANSLATION_MEMORY", "1") != "0"
+# Similaridade mínima para enviar a tradução anterior como referência no lote
+TM_HINT_THRESHOLD = float(os.getenv("TM_HINT_THRESHOLD", "0.75"))
+# Similaridade (com números mascarados) a partir da qual a tradução é reaproveitada sem o modelo;
+# abaixo de 1.0 só vale para trechos que diferem apenas em números
+TM_REUSE_THRESHOLD = float(os.getenv("TM_REUSE_THRESHOLD", "1.0"))
+# Trechos curtos demais não entram na memória (semelhança pouco informativa)
+TM_MIN_CHARS = int(os.getenv("TM_MIN_CHARS", "20"))
+# Entradas por par de idiomas: acima disso o log é consolidado, mantendo as usadas mais recentemente
+TM_MAX_ENTRIES = int(os.getenv("TM_MAX_ENTRIES", "200000"))
+# Escopo da memória: client (cada cliente só reaproveita as próprias traduções) ou shared (todos)
+TM_SCOPE = os.getenv("TM_SCOPE", "client")
+# Fração de TM_MAX_ENTRIES mantida na consolidação (folga até a próxima)
+TM_COMPACT_KEEP = float(os.getenv("TM_COMPACT_KEEP", "0.9"))
+
+# MinHash: 32 funções (2 digests BLAKE2b de 16 valores), LSH com 8 bandas de 4
+_PERM_SALTS = (b"tm-0", b"tm-1")
+_BANDS = 8
+_ROWS = 4
+_SHINGLE = 3
+# Candidatos do LSH verificados por consulta (os de mais bandas em comum)
+_MAX_CANDIDATES = 20
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_SPACE_RE = re.compile(r"\s+")
+
+def mask_numbers(text: str) -> str:
+    """Texto normalizado com números trocados por um marcador"""
+    return _SPACE_RE.sub(" ", _NUMBER_RE.sub("#", text)).strip().lower()
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """Assinatura MinHash dos trigramas de caracteres do texto normalizado"""
+    normalized = mask_numbers(text)
+    shingles = {normalized[i:i + _SHINGLE] for i in range(max(1, len(normalized) - _SHINGLE + 1))}
+    rows = []
+    for shingle in shingles:
+        data = shingle.encode('utf-8')
+        values = ()
+        for salt in _PERM_SALTS:
+            values += struct.unpack('<16I', hashlib.blake2b(data, digest_size=64, salt=salt).digest())
+        rows.append(values)
+    return tuple(min(column) for column in zip(*rows))
+
+def similarity(a: str, b: str) -> float:
+    """Semelhança entre dois trechos (números não contam como diferença)"""
+    return SequenceMatcher(None, mask_numbers(a), mask_numbers(b), autojunk=False).ratio()
+
+def substitute_numbers(text: str, source: str, translation: str) -> Optional[str]:
+    """
+    Adapta a tradução de source para text quando os dois diferem só em números
+
+    Cada número alterado precisa aparecer na tradução tantas vezes quanto no
+    original (senão a tradução mudou o formato e a troca não é segura).
+    Retorna None se não for possível.
+    """
+    if mask_numbers(text) != mask_numbers(source):
+        return None
+    old_numbers = _NUMBER_RE.findall(source)
+    new_numbers = _NUMBER_RE.findall(text)
+    if old_numbers == new_numbers:
+        return translation
+
+    mapping: Dict[str, str] = {}
+    for old, new in zip(old_numbers, new_numbers):
+        if old != new and mapping.setdefault(old, new) != new:
+            return None  # o mesmo número mudou para valores diferentes
+    target_numbers = _NUMBER_RE.findall(translation)
+    for old in mapping:
+        if target_numbers.count(old) != old_numbers.count(old):
+            return None
+    return _NUMBER_RE.sub(lambda m: mapping.get(m.group(0), m.group(0)), translation)
+
+@dataclass
+class MemoryMatch:
+    source: str
+    translation: str
+    similarity: float
+
+class _PairIndex:
+    """Entradas e índice LSH de um par de idiomas"""
+
+    def __init__(self):
+        self.entries: List[Tuple[str, str]] = []
+        # Último uso de cada entrada (gravação ou acerto numa consulta), paralelo a entries
+        self.last_used: List[float] = []
+        self.by_source: Dict[str, int] = {}
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self.log_inode: Optional[int] = None
+        self.log_offset = 0
+        self.log_lines = 0
+
+    def add(self, source: str, translation: str, at: float = 0.0):
+        idx = self.by_source.get(source)
+        if idx is not None:
+            self.entries[idx] = (source, translation)
+            self.last_used[idx] = max(self.last_used[idx], at)
+            return
+        idx = len(self.entries)
+        self.entries.append((source, translation))
+        self.last_used.append(at)
+        self.by_source[source] = idx
+        signature = minhash(source)
+        for band in range(_BANDS):
+            key = (band, signature[band * _ROWS:(band + 1) * _ROWS])
+            self.buckets.setdefault(key, []).append(idx)
+
+    def touch(self, source: str, at: float):
+        idx = self.by_source.get(source)
+        if idx is not None:
+            self.last_used[idx] = max(self.last_used[idx], at)
+
+    def candidates(self, text: str) -> List[int]:
+        """Entradas com ao menos uma banda em comum, as de mais bandas primeiro"""
+        signature = minhash(text)
+        hits: Dict[int, int] = {}
+        for band in range(_BANDS):
+            for idx in self.buckets.get((band, signature[band * _ROWS:(band + 1) * _ROWS]), ()):
+                hits[idx] = hits.get(idx, 0) + 1
+        return sorted(hits, key=hits.get, reverse=True)[:_MAX_CANDIDATES]
+
+class TranslationMemory:
+    """
+    Memória de tradução com busca aproximada
+
+    Pares (trecho original, tradução) ficam num log JSONL por par de
+    idiomas em data/translation_memory/, dentro de clients/<hash do
+    cliente>/ com TM_SCOPE=client: o texto de um cliente nunca é
+    reaproveitado nem enviado como referência para outro. Em memória, cada par tem um índice
+    LSH sobre assinaturas MinHash dos trigramas do texto (números
+    mascarados): uma consulta olha só os baldes da assinatura, sem varrer a
+    memória, e confirma os candidatos pela semelhança de sequência. Outros
+    processos (workers do uvicorn) leem o log a partir do último offset.
+
+    Cada entrada guarda o último uso: a gravação ("at") ou um acerto numa
+    consulta. Os acertos vão para o log como linhas {"s", "h"} junto com a
+    próxima gravação do par, e a consolidação mantém as entradas usadas mais
+    recentemente, não as inseridas por último.
+    """
+
+    def __init__(self, base_dir: str = "data/translation_memory"):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._pairs: Dict[str, _PairIndex] = {}
+        # Acertos ainda não gravados no log, por par: trecho → momento do acerto
+        self._hits: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def _pair_key(source_lang: str, target_lang: str, client_id: Optional[str] = None) -> str:
+        """Log do par de idiomas no escopo do cliente (caminho relativo, sem extensão)"""
+        safe = lambda lang: "".join(c for c in (lang or "auto") if c.isalnum() or c in "-_")
+        pair = f"{safe(source_lang)}__{safe(target_lang)}"
+        if TM_SCOPE == "shared":
+            return pair
+        client = hashlib.sha256((client_id or "").encode('utf-8')).hexdigest()[:16]
+        return f"clients/{client}/{pair}"
+
+    def _log_file(self, pair: str) -> Path:
+        return self.base_dir / f"{pair}.jsonl"
+
+    @contextmanager
+    def _file_lock(self, pair: str):
+        """Lock entre processos para escrita no log"""
+        self._log_file(pair).parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.base_dir / f"{pair}.lock", 'a') as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def _index(self, pair: str) -> _PairIndex:
+        """Índice do par, atualizado com o que outros processos gravaram"""
+        index = self._pairs.get(pair)
+        if index is None:
+            index = self._pairs[pair] = _PairIndex()
+        self._catch_up(pair, index)
+        return self._pairs[pair]
+
+    def _catch_up(self, pair: str, index: _PairIndex):
+        log_file = self._log_file(pair)
+        try:
+            stat = os.stat(log_file)
+        except FileNotFoundError:
+            return
+
+        if index.log_inode is not None and (stat.st_ino != index.log_inode or stat.st_size < index.log_offset):
+            # Log consolidado por outro processo: reconstruir
+            index = self._pairs[pair] = _PairIndex()
+
+        index.log_inode = stat.st_ino
+        if stat.st_size == index.log_offset:
+            return
+
+        with open(log_file, 'rb') as f:
+            f.seek(index.log_offset)
+            data = f.read()
+
+        # Apenas linhas completas; uma escrita em andamento fica para depois
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                if "h" in entry:
+                    index.touch(entry["s"], entry["h"])
+                else:
+                    index.add(entry["s"], entry["t"], entry.get("at", 0.0))
+                index.log_lines += 1
+            except (json.JSONDecodeError, KeyError):
+                logger.warning("Linha inválida na memória de tradução ignorada")
+        index.log_offset += end
+
+    def add(self, source_lang: str, target_lang: str, pairs: Dict[str, str], client_id: Optional[str] = None):
+        """Grava pares (trecho original → tradução) na memória do cliente"""
+        pairs = {s: t for s, t in pairs.items() if len(s) >= TM_MIN_CHARS and t}
+        if not TM_ENABLED or not pairs:
+            return
+        pair = self._pair_key(source_lang, target_lang, client_id)
+        with self._lock:
+            index = self._index(pair)
+            novos = {s: t for s, t in pairs.items()
+                     if s not in index.by_source or index.entries[index.by_source[s]][1] != t}
+            if not novos:
+                return
+            now = time.time()
+            hits = {s: at for s, at in self._hits.pop(pair, {}).items() if s not in novos}
+            lines = [{"s": s, "t": t, "at": now} for s, t in novos.items()]
+            lines += [{"s": s, "h": at} for s, at in hits.items()]
+            try:
+                with self._file_lock(pair):
+                    self._catch_up(pair, index)
+                    index = self._pairs[pair]
+                    with open(self._log_file(pair), 'ab') as f:
+                        f.write(b"".join(json.dumps(line, ensure_ascii=False).encode('utf-8') + b"\n"
+                                         for line in lines))
+                        f.flush()
+                        index.log_offset = f.tell()
+                        index.log_inode = os.fstat(f.fileno()).st_ino
+                for s, t in novos.items():
+                    index.add(s, t, now)
+                for s, at in hits.items():
+                    index.touch(s, at)
+                index.log_lines += len(lines)
+                if index.log_lines > 2 * len(index.entries) or len(index.entries) > TM_MAX_ENTRIES:
+                    self._compact(pair, index)
+            except OSError as e:
+                # Os acertos voltam para a próxima gravação
+                for s, at in hits.items():
+                    self._hits.setdefault(pair, {}).setdefault(s, at)
+                logger.warning(f"Erro ao gravar memória de tradução: {e}")
+
+    def _compact(self, pair: str, index: _PairIndex):
+        """
+        Regrava o log só com a versão mais recente de cada trecho
+
+        Com a memória acima de TM_MAX_ENTRIES, ficam as TM_COMPACT_KEEP usadas
+        mais recentemente (gravadas ou encontradas numa consulta): a próxima
+        consolidação só vem depois de novas entradas, não a cada gravação.
+        """
+        keep = TM_MAX_ENTRIES if len(index.entries) <= TM_MAX_ENTRIES else max(1, int(TM_MAX_ENTRIES * TM_COMPACT_KEEP))
+        # Menos usadas primeiro; no empate (logs sem "at"), a ordem de inserção
+        order = sorted(range(len(index.entries)), key=lambda idx: (index.last_used[idx], idx))[-keep:]
+        entries = [(*index.entries[idx], index.last_used[idx]) for idx in sorted(order)]
+        with self._file_lock(pair):
+            tmp = self._log_file(pair).with_suffix('.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(b"".join(json.dumps({"s": s, "t": t, "at": at}, ensure_ascii=False).encode('utf-8') + b"\n"
+                                 for s, t, at in entries))
+            os.replace(tmp, self._log_file(pair))
+        self._pairs[pair] = _PairIndex()
+        self._catch_up(pair, self._pairs[pair])
+        logger.info(f"Memória de tradução {pair} consolidada: {len(entries)} entradas")
+
+    def lookup(self, source_lang: str, target_lang: str, text: str,
+               client_id: Optional[str] = None) -> Optional[MemoryMatch]:
+        """Tradução anterior do cliente mais semelhante ao trecho (acima de TM_HINT_THRESHOLD) ou None"""
+        if not TM_ENABLED or len(text) < TM_MIN_CHARS:
+            return None
+        pair = self._pair_key(source_lang, target_lang, client_id)
+        with self._lock:
+            index = self._index(pair)
+            exact = index.by_source.get(text)
+            if exact is not None:
+                self._hit(pair, index, text)
+                return MemoryMatch(*index.entries[exact], similarity=1.0)
+            candidates = [index.entries[idx] for idx in index.candidates(text)]
+
+        best = None
+        for source, translation in candidates:
+            score = similarity(text, source)
+            if score >= TM_HINT_THRESHOLD and (best is None or score > best.similarity):
+                best = MemoryMatch(source, translation, score)
+        if best is not None:
+            with self._lock:
+                self._hit(pair, self._pairs[pair], best.source)
+        return best
+
+    def _hit(self, pair: str, index: _PairIndex, source: str):
+        """Marca o uso da entrada agora; vai para o log na próxima gravação do par"""
+        now = time.time()
+        index.touch(source, now)
+        self._hits.setdefault(pair, {})[source] = now
+
+    def reuse(self, text: str, match: MemoryMatch) -> Optional[str]:
+        """Tradução pronta para o trecho, sem o modelo, quando a semelhança permite"""
+        if match.source == text:
+            return match.translation
+        if match.similarity < TM_REUSE_THRESHOLD:
+            return None
+        return substitute_numbers(text, match.source, match.translation)
+
+# Instância global da memória de tradução
+translation_memory = TranslationMemory()
@@ -5,44 +5,27 @@ Core de tradução simplificado - Versão 2.0
 
 import logging
 from typing import List, Dict, Optional
-from config import get_openai_client, DEFAULT_MODEL
+from config import DEFAULT_MODEL, BATCH_TOKEN_BUDGET
+from translator_openai_official import montar_lotes, pedir_traducao_structured
 
 logger = logging.getLogger(__name__)
 
 def translate_text_batch(texts: List[str], source_lang: str, target_lang: str, model: str = None) -> Dict[str, str]:
-    """Traduz lista de textos"""
+    """Traduz lista de textos em lotes de até BATCH_TOKEN_BUDGET tokens (com novas tentativas)"""
     if not texts:
         return {}
     
-    client = get_openai_client()
-    if not client:
-        raise Exception("Cliente OpenAI não disponível")
-    
     model = model or DEFAULT_MODEL
-    result = {}
+    result = {f"text_{i}": text for i, text in enumerate(texts)}
+    items = [{"id": key, "text": text} for key, text in result.items() if text.strip()]
     
-    for i, text in enumerate(texts):
-        if not text.strip():
-            result[f"text_{i}"] = text
-            continue
-            
+    for lote in montar_lotes(items, BATCH_TOKEN_BUDGET):
         try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": f"Traduza o texto de {source_lang} para {target_lang}. Mantenha a formatação original."},
-                    {"role": "user", "content": text}
-                ],
-                max_tokens=1000,
-                temperature=0.3
-            )
-            
-            result[f"text_{i}"] = response.choices[0].message.content
-            logger.info(f"Texto {i+1}/{len(texts)} traduzido")
-            
+            translated = pedir_traducao_structured(lote, target_lang, source_lang, model)
+            result.update({item["id"]: translated[item["id"]] for item in lote if item["id"] in translated})
+            logger.info(f"{len(translated)}/{len(lote)} textos traduzidos")
         except Exception as e:
-            logger.error(f"Erro traduzindo texto {i}: {e}")
-            result[f"text_{i}"] = text  # Retorna original em caso de erro
+            logger.error(f"Erro traduzindo lote de textos: {e}")  # Mantém os originais do lote
     
     return result
 
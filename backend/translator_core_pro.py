@@ -6,13 +6,27 @@ Tradutor profissional para documentos - Versão 2.0
 import os
 import logging
 import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Tuple
 from dataclasses import dataclass
 from docx import Document
 from pptx import Presentation
 from openpyxl import load_workbook
-from config import get_openai_client, DEFAULT_MODEL
+from config import DEFAULT_MODEL, BATCH_TOKEN_BUDGET
+from translation_backends import get_backend, UsageMeter, run_metered
+from translator_openai_official import montar_lotes, pedir_traducao_structured
+from cancellation import check_cancelled
+from usage_ledger import usage_summary
+from document_stats import estimate_tokens
+from segments import is_translatable
+
+# Callback de progresso: (segmentos concluídos, tokens concluídos)
+ProgressCallback = Callable[[int, int], None]
+# Elemento traduzível: (texto original, função que grava o texto traduzido)
+Element = Tuple[str, Callable[[str], None]]
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +38,10 @@ class TranslationResult:
     processing_time: float = 0.0
     errors: List[str] = None
     warnings: List[str] = None
+    # Segundos por etapa (parse, collect, translate, apply, save), somados entre idiomas
+    stage_times: Dict[str, float] = None
+    # Requisições, tokens (entrada, em cache, saída) e custo estimado das chamadas ao modelo
+    usage: Dict = None
     
     def __post_init__(self):
         if self.errors is None:
@@ -35,9 +53,7 @@ class DocumentTranslator:
     """Tradutor profissional de documentos"""
     
     def __init__(self):
-        self.client = get_openai_client()
-        if not self.client:
-            raise Exception("Cliente OpenAI não disponível")
+        self.backend = get_backend()
     
     def translate_text(self, text: str, source_lang: str, target_lang: str, model: str = None) -> str:
         """Traduz texto individual"""
@@ -49,17 +65,8 @@ class DocumentTranslator:
             model = model or DEFAULT_MODEL
             logger.info(f"Traduzindo texto: '{text[:50]}...' de {source_lang} para {target_lang} usando {model}")
             
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": f"Traduza de {source_lang} para {target_lang}. Preserve formatação e quebras de linha. Retorne APENAS a tradução, sem explicações."},
-                    {"role": "user", "content": text}
-                ],
-                max_tokens=2000,
-                temperature=0.2
-            )
-            
-            translated = response.choices[0].message.content.strip()
+            result = self.backend.translate_batch({"0": text}, source_lang, target_lang, model)
+            translated = result.translations.get("0", text).strip()
             logger.info(f"Tradução bem sucedida: '{translated[:50]}...'")
             return translated
             
@@ -67,7 +74,8 @@ class DocumentTranslator:
             logger.error(f"Erro na tradução de '{text[:50]}...': {e}")
             return text
     
-    def translate_docx(self, input_path: str, output_path: str, source_lang: str, target_lang: str, model: str = None) -> TranslationResult:
+    def translate_docx(self, input_path: str, output_path: str, source_lang: str, target_lang: str, model: str = None,
+                       progress_callback: Optional[ProgressCallback] = None) -> TranslationResult:
         """Traduz documento DOCX"""
         start_time = time.time()
         result = TranslationResult(success=False)
@@ -76,6 +84,7 @@ class DocumentTranslator:
             doc = Document(input_path)
             original_count = 0
             translated_count = 0
+            tokens_done = 0
             
             # Traduzir parágrafos
             logger.info(f"Processando {len(doc.paragraphs)} parágrafos...")
@@ -94,6 +103,10 @@ class DocumentTranslator:
                     else:
                         logger.warning(f"Parágrafo não foi traduzido: '{original_text[:50]}...'")
                         translated_count += 1  # Contar mesmo se não traduzir
+                    
+                    tokens_done += estimate_tokens(original_text)
+                    if progress_callback:
+                        progress_callback(translated_count, tokens_done)
             
             # Traduzir tabelas
             for table in doc.tables:
@@ -105,6 +118,10 @@ class DocumentTranslator:
                             translated_text = self.translate_text(original_text, source_lang, target_lang, model)
                             cell.text = translated_text
                             translated_count += 1
+                            
+                            tokens_done += estimate_tokens(original_text)
+                            if progress_callback:
+                                progress_callback(translated_count, tokens_done)
             
             doc.save(output_path)
             
@@ -119,7 +136,8 @@ class DocumentTranslator:
         
         return result
     
-    def translate_pptx(self, input_path: str, output_path: str, source_lang: str, target_lang: str, model: str = None) -> TranslationResult:
+    def translate_pptx(self, input_path: str, output_path: str, source_lang: str, target_lang: str, model: str = None,
+                       progress_callback: Optional[ProgressCallback] = None) -> TranslationResult:
         """Traduz apresentação PPTX"""
         start_time = time.time()
         result = TranslationResult(success=False)
@@ -128,6 +146,7 @@ class DocumentTranslator:
             prs = Presentation(input_path)
             original_count = 0
             translated_count = 0
+            tokens_done = 0
             
             for slide in prs.slides:
                 for shape in slide.shapes:
@@ -137,6 +156,10 @@ class DocumentTranslator:
                         translated_text = self.translate_text(original_text, source_lang, target_lang, model)
                         shape.text = translated_text
                         translated_count += 1
+                        
+                        tokens_done += estimate_tokens(original_text)
+                        if progress_callback:
+                            progress_callback(translated_count, tokens_done)
             
             prs.save(output_path)
             
@@ -151,7 +174,8 @@ class DocumentTranslator:
         
         return result
     
-    def translate_xlsx(self, input_path: str, output_path: str, source_lang: str, target_lang: str, model: str = None) -> TranslationResult:
+    def translate_xlsx(self, input_path: str, output_path: str, source_lang: str, target_lang: str, model: str = None,
+                       progress_callback: Optional[ProgressCallback] = None) -> TranslationResult:
         """Traduz planilha XLSX"""
         start_time = time.time()
         result = TranslationResult(success=False)
@@ -160,6 +184,7 @@ class DocumentTranslator:
             wb = load_workbook(input_path)
             original_count = 0
             translated_count = 0
+            tokens_done = 0
             
             for sheet_name in wb.sheetnames:
                 sheet = wb[sheet_name]
@@ -171,6 +196,10 @@ class DocumentTranslator:
                             translated_text = self.translate_text(original_text, source_lang, target_lang, model)
                             cell.value = translated_text
                             translated_count += 1
+                            
+                            tokens_done += estimate_tokens(original_text)
+                            if progress_callback:
+                                progress_callback(translated_count, tokens_done)
             
             wb.save(output_path)
             
@@ -185,20 +214,170 @@ class DocumentTranslator:
         
         return result
 
+    @staticmethod
+    def collect_elements(file_ext: str, document) -> List[Element]:
+        """Elementos com texto do documento, na mesma granularidade dos métodos por formato"""
+        elements: List[Element] = []
+        
+        if file_ext == '.docx':
+            for paragraph in document.paragraphs:
+                if paragraph.text.strip():
+                    elements.append((paragraph.text, lambda t, p=paragraph: setattr(p, "text", t)))
+            for table in document.tables:
+                for row in table.rows:
+                    for cell in row.cells:
+                        if cell.text.strip():
+                            elements.append((cell.text, lambda t, c=cell: setattr(c, "text", t)))
+        elif file_ext == '.pptx':
+            for slide in document.slides:
+                for shape in slide.shapes:
+                    if hasattr(shape, "text") and shape.text.strip():
+                        elements.append((shape.text, lambda t, s=shape: setattr(s, "text", t)))
+        elif file_ext == '.xlsx':
+            for sheet_name in document.sheetnames:
+                for row in document[sheet_name].iter_rows():
+                    for cell in row:
+                        if cell.value and isinstance(cell.value, str) and cell.value.strip():
+                            elements.append((cell.value, lambda t, c=cell: setattr(c, "value", t)))
+        
+        return elements
+    
+    def translate_multi(self, input_path: str, output_paths: Dict[str, str], source_lang: str,
+                        model: str = None, progress_callback: Optional[ProgressCallback] = None
+                        ) -> Dict[str, TranslationResult]:
+        """
+        Traduz um documento para vários idiomas (um arquivo por idioma)
+        
+        O documento é lido e os elementos coletados uma vez; textos repetidos
+        são traduzidos uma vez por idioma, em lotes de até BATCH_TOKEN_BUDGET
+        tokens (com novas tentativas), e elementos sem texto traduzível
+        (números, URLs, e-mails) são mantidos. Os idiomas rodam em paralelo;
+        as traduções são aplicadas e salvas idioma a idioma. O progresso é a
+        soma de todos os idiomas. Lotes que falham vão para result.errors
+        (os textos ficam no original); sem nenhum lote traduzido, o idioma
+        falha.
+        """
+        start_time = time.time()
+        target_langs = list(output_paths)
+        file_ext = Path(input_path).suffix.lower()
+        loaders = {'.docx': Document, '.pptx': Presentation, '.xlsx': load_workbook}
+        
+        if file_ext not in loaders:
+            result = TranslationResult(success=False)
+            result.errors.append(f"Formato de arquivo não suportado: {file_ext}")
+            return {lang: result for lang in target_langs}
+        
+        stage_times = {"parse": 0.0, "collect": 0.0, "translate": 0.0, "apply": 0.0, "save": 0.0}
+        try:
+            mark = time.perf_counter()
+            document = loaders[file_ext](input_path)
+            stage_times["parse"] = time.perf_counter() - mark
+            mark = time.perf_counter()
+            elements = self.collect_elements(file_ext, document)
+        except Exception as e:
+            logger.error(f"Erro processando {file_ext.upper().lstrip('.')}: {e}")
+            return {lang: TranslationResult(success=False, errors=[f"Erro {file_ext.upper().lstrip('.')}: {e}"])
+                    for lang in target_langs}
+        
+        # Textos distintos e traduzíveis, compartilhados entre idiomas
+        textos = list(dict.fromkeys(text for text, _ in elements if is_translatable(text)))
+        ocorrencias: Dict[str, int] = {}
+        for text, _ in elements:
+            ocorrencias[text] = ocorrencias.get(text, 0) + 1
+        stage_times["collect"] = time.perf_counter() - mark
+        logger.info(f"{len(elements)} elementos ({len(textos)} textos únicos traduzíveis) "
+                    f"para {len(target_langs)} idioma(s)")
+        
+        progress_lock = threading.Lock()
+        done = {"segments": 0, "tokens": 0}
+        
+        items = [{"id": f"t{i}", "text": text} for i, text in enumerate(textos)]
+        lotes = montar_lotes(items, BATCH_TOKEN_BUDGET)
+        
+        def translate_lang(lang: str) -> Tuple[Dict[str, str], List[str]]:
+            traducoes: Dict[str, str] = {}
+            errors: List[str] = []
+            for i, lote in enumerate(lotes):
+                check_cancelled()
+                try:
+                    logger.info(f"Traduzindo lote {i+1}/{len(lotes)} ({len(lote)} textos) para {lang}")
+                    traduzidos = pedir_traducao_structured(lote, lang, source_lang, model or DEFAULT_MODEL)
+                except Exception as e:
+                    error_msg = f"Erro no lote {i+1} ({lang}): {e}"
+                    logger.error(error_msg)
+                    errors.append(error_msg)
+                    continue
+                lote_ok = [item for item in lote if item["id"] in traduzidos]
+                traducoes.update({item["text"]: traduzidos[item["id"]].strip() for item in lote_ok})
+                with progress_lock:
+                    done["segments"] += sum(ocorrencias[item["text"]] for item in lote_ok)
+                    done["tokens"] += sum(estimate_tokens(item["text"]) for item in lote_ok)
+                    segments, tokens = done["segments"], done["tokens"]
+                if progress_callback:
+                    progress_callback(segments, tokens)
+            return traducoes, errors
+        
+        results: Dict[str, TranslationResult] = {}
+        meters = {lang: UsageMeter() for lang in target_langs}
+        with ThreadPoolExecutor(max_workers=max(1, len(target_langs)), thread_name_prefix="file-lang") as executor:
+            futures = {lang: executor.submit(contextvars.copy_context().run, run_metered, meters[lang],
+                                             translate_lang, lang)
+                       for lang in target_langs}
+            
+            # Aplicar e salvar um idioma por vez (o documento é compartilhado)
+            for lang in target_langs:
+                result = TranslationResult(success=False)
+                try:
+                    mark = time.perf_counter()
+                    traducoes, errors = futures[lang].result()
+                    stage_times["translate"] += time.perf_counter() - mark
+                    result.errors.extend(errors)
+                    if textos and not traducoes:
+                        raise RuntimeError("nenhum texto foi traduzido")
+                    mark = time.perf_counter()
+                    for text, apply in elements:
+                        apply(traducoes.get(text, text))
+                    stage_times["apply"] += time.perf_counter() - mark
+                    mark = time.perf_counter()
+                    document.save(output_paths[lang])
+                    stage_times["save"] += time.perf_counter() - mark
+                    
+                    result.success = True
+                    result.stage_times = stage_times
+                    result.original_elements = len(elements)
+                    # Elementos sem texto traduzível contam como concluídos
+                    result.translated_elements = sum(1 for text, _ in elements
+                                                     if text in traducoes or not is_translatable(text))
+                    result.processing_time = time.time() - start_time
+                except Exception as e:
+                    result.errors.append(f"Erro {file_ext.upper().lstrip('.')} ({lang}): {str(e)}")
+                    logger.error(f"Erro processando {file_ext} para {lang}: {e}")
+                result.usage = usage_summary(meters[lang].by_model())
+                results[lang] = result
+        
+        return results
+
 def translate_file_professional(input_path: str, output_path: str, glossary_path: Optional[str], 
-                               use_ai: bool, source_lang: str, target_lang: str, model: str = None) -> TranslationResult:
+                               use_ai: bool, source_lang: str, target_lang: str, model: str = None,
+                               progress_callback: Optional[ProgressCallback] = None) -> TranslationResult:
     """Função principal de tradução de arquivos"""
     
     translator = DocumentTranslator()
     file_ext = Path(input_path).suffix.lower()
     
     if file_ext == '.docx':
-        return translator.translate_docx(input_path, output_path, source_lang, target_lang, model)
+        return translator.translate_docx(input_path, output_path, source_lang, target_lang, model, progress_callback)
     elif file_ext == '.pptx':
-        return translator.translate_pptx(input_path, output_path, source_lang, target_lang, model)
+        return translator.translate_pptx(input_path, output_path, source_lang, target_lang, model, progress_callback)
     elif file_ext == '.xlsx':
-        return translator.translate_xlsx(input_path, output_path, source_lang, target_lang, model)
+        return translator.translate_xlsx(input_path, output_path, source_lang, target_lang, model, progress_callback)
     else:
         result = TranslationResult(success=False)
         result.errors.append(f"Formato de arquivo não suportado: {file_ext}")
-        return result
\ No newline at end of file
+        return result
+
+def translate_file_multi(input_path: str, output_paths: Dict[str, str], source_lang: str, model: str = None,
+                         progress_callback: Optional[ProgressCallback] = None) -> Dict[str, TranslationResult]:
+    """Tradução de um arquivo para vários idiomas de destino, com leitura e coleta compartilhadas"""
+    translator = DocumentTranslator()
+    return translator.translate_multi(input_path, output_paths, source_lang, model, progress_callback)
@@ -7,15 +7,27 @@ Usa Responses API com Structured Outputs para máxima confiabilidade
 import os
 import sys
 import json
+import asyncio
 import time
 import math
 import pathlib
 import logging
-from typing import List, Dict, Optional
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Callable, Tuple
 from dataclasses import dataclass
-from openai import OpenAI
 from docx import Document
 from tqdm import tqdm
+from request_coalescer import RequestCoalescer, COALESCE_MAX_JOB_TOKENS
+from segments import unique_segments, expand_translations
+from translation_memory import translation_memory
+from translation_backends import get_backend, is_rate_limit, retry_after, UsageMeter, run_metered
+from usage_ledger import usage_summary
+from async_translation import async_loop, TRANSLATION_ASYNC
+from metrics import metrics
+from tracing import tracer
+from cancellation import check_cancelled
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +36,7 @@ MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1")
 BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "80000"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "6"))
 RETRY_BASE_S = float(os.getenv("RETRY_BASE_S", "2.0"))
+CHECKPOINT_DIR = pathlib.Path(os.getenv("CHECKPOINT_DIR", ".checkpoints"))
 
 @dataclass
 class TranslationResult:
@@ -33,6 +46,15 @@ class TranslationResult:
     errors: List[str]
     warnings: List[str]
     checkpoint_path: Optional[str] = None
+    # Texto original → tradução dos segmentos traduzidos (base para a próxima versão)
+    translation_memory: Optional[Dict[str, str]] = None
+    reused_segments: int = 0
+    # Segmentos resolvidos pela memória de tradução, sem o modelo
+    memory_segments: int = 0
+    # Segundos por etapa (parse, collect, translate, apply, save), somados entre idiomas
+    stage_times: Optional[Dict[str, float]] = None
+    # Requisições, tokens (entrada, em cache, saída) e custo estimado das chamadas ao modelo
+    usage: Optional[Dict] = None
 
 def estimate_tokens(text: str) -> int:
     """Estimativa conservadora: ~4 chars = 1 token"""
@@ -113,81 +135,110 @@ def montar_lotes(items: List[Dict], token_budget: int = BATCH_TOKEN_BUDGET) -> L
     
     return lotes
 
-def pedir_traducao_structured(lote: List[Dict], target_lang: str, source_lang: str = "auto") -> Dict[str, str]:
+def pedir_traducao_structured(lote: List[Dict], target_lang: str, source_lang: str = "auto", model: str = None) -> Dict[str, str]:
     """
-    Usa Chat Completions API com Structured Outputs - método correto
+    Traduz um lote pelo backend configurado (Structured Outputs na OpenAI)
+    
+    Itens com "ref" levam a tradução anterior de um trecho semelhante como
+    referência no prompt. Com TRANSLATION_ASYNC, a chamada vai para o loop
+    assíncrono e esta thread só aguarda o resultado.
     """
-    client = OpenAI()
+    if TRANSLATION_ASYNC:
+        return async_loop.submit(pedir_traducao_async(lote, target_lang, source_lang, model)).result()
     
-    # JSON Schema para structured output
-    schema = {
-        "type": "object",
-        "properties": {
-            "translations": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "id": {"type": "string"},
-                        "translated_text": {"type": "string"}
-                    },
-                    "required": ["id", "translated_text"],
-                    "additionalProperties": False
-                }
-            }
-        },
-        "required": ["translations"],
-        "additionalProperties": False
-    }
-
-    # Prompt otimizado
-    prompt = f"""Você é um tradutor profissional especializado. Traduza integralmente cada segmento de texto de {source_lang} para {target_lang}.
-
-INSTRUÇÕES CRÍTICAS:
-- NÃO resuma, NÃO omita, NÃO abrevie nenhum conteúdo
-- Preserve EXATAMENTE todos os números, datas, siglas e formatação
-- Mantenha a mesma estrutura e pontuação
-- Traduza PALAVRA POR PALAVRA quando necessário para fidelidade total
-- Para termos técnicos, use a tradução padrão mais precisa
-
-Responda APENAS em JSON no formato especificado.
-
-SEGMENTOS PARA TRADUZIR:
-{json.dumps([{"id": item["id"], "text": item["text"]} for item in lote], ensure_ascii=False)}"""
+    segments = {item["id"]: item["text"] for item in lote}
+    refs = {item["id"]: item["ref"] for item in lote if item.get("ref")}
+    backend = get_backend()
+    
+    with tracer.span("translate.batch", atributos_lote(backend.name, segments, refs, source_lang, target_lang, model)) as batch_span:
+        # Retry com backoff exponencial
+        for attempt in range(MAX_RETRIES):
+            batch_span.set_attribute("batch.attempts", attempt + 1)
+            try:
+                with tracer.span("translate.attempt", {"batch.attempt": attempt + 1}, kind="client") as attempt_span:
+                    result = backend.translate_batch(segments, source_lang, target_lang, model or MODEL, refs)
+                    attempt_span.set_attributes({
+                        "usage.prompt_tokens": result.usage.prompt_tokens,
+                        "usage.cached_tokens": result.usage.cached_tokens,
+                        "usage.completion_tokens": result.usage.completion_tokens
+                    })
+                return result.translations
+                
+            except Exception as e:
+                wait_time = RETRY_BASE_S * (2 ** attempt)
+                logger.warning(f"Erro na tentativa {attempt + 1}: {e}")
+                
+                if attempt == MAX_RETRIES - 1:
+                    logger.error(f"Falha após {MAX_RETRIES} tentativas: {e}")
+                    raise
+                    
+                metrics.inc("translation_api_retries_total", {"backend": backend.name})
+                batch_span.add_event("retry", {"batch.attempt": attempt + 1, "retry.wait_s": wait_time})
+                logger.info(f"Aguardando {wait_time}s antes da próxima tentativa...")
+                time.sleep(wait_time)
 
-    # Retry com backoff exponencial
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {"role": "system", "content": "Você é um tradutor profissional especializado. Siga exatamente as instruções fornecidas."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={
-                    "type": "json_schema", 
-                    "json_schema": {
-                        "name": "translation_result", 
-                        "schema": schema
-                    }
-                },
-                temperature=0.1,  # Baixa para consistência
-                max_tokens=200000
-            )
-            
-            result_json = json.loads(response.choices[0].message.content)
-            return {item["id"]: item["translated_text"] for item in result_json["translations"]}
-            
-        except Exception as e:
-            wait_time = RETRY_BASE_S * (2 ** attempt)
-            logger.warning(f"Erro na tentativa {attempt + 1}: {e}")
+async def pedir_traducao_async(lote: List[Dict], target_lang: str, source_lang: str = "auto",
+                               model: str = None) -> Dict[str, str]:
+    """
+    pedir_traducao_structured no loop assíncrono (async_translation)
+    
+    Cada tentativa espera vaga no teto de requisições em voo e no limite de
+    taxa do processo; um 429 pausa os envios de todos os lotes pelo tempo
+    pedido pelo provedor. Cancelar a tarefa interrompe a espera ou a
+    requisição em andamento.
+    """
+    segments = {item["id"]: item["text"] for item in lote}
+    refs = {item["id"]: item["ref"] for item in lote if item.get("ref")}
+    backend = get_backend()
+    attributes = atributos_lote(backend.name, segments, refs, source_lang, target_lang, model)
+    # Entrada mais saída (a tradução tem tamanho próximo ao do original)
+    tokens = 2 * attributes["batch.estimated_tokens"]
+    
+    with tracer.span("translate.batch", attributes) as batch_span:
+        for attempt in range(MAX_RETRIES):
+            batch_span.set_attribute("batch.attempts", attempt + 1)
+            try:
+                async with async_loop.slot(tokens):
+                    with tracer.span("translate.attempt", {"batch.attempt": attempt + 1}, kind="client") as attempt_span:
+                        result = await backend.translate_batch_async(segments, source_lang, target_lang,
+                                                                     model or MODEL, refs)
+                        attempt_span.set_attributes({
+                            "usage.prompt_tokens": result.usage.prompt_tokens,
+                            "usage.cached_tokens": result.usage.cached_tokens,
+                            "usage.completion_tokens": result.usage.completion_tokens
+                        })
+                return result.translations
             
-            if attempt == MAX_RETRIES - 1:
-                logger.error(f"Falha após {MAX_RETRIES} tentativas: {e}")
-                raise
+            except Exception as e:
+                wait_time = RETRY_BASE_S * (2 ** attempt)
+                logger.warning(f"Erro na tentativa {attempt + 1}: {e}")
                 
-            logger.info(f"Aguardando {wait_time}s antes da próxima tentativa...")
-            time.sleep(wait_time)
+                if attempt == MAX_RETRIES - 1:
+                    logger.error(f"Falha após {MAX_RETRIES} tentativas: {e}")
+                    raise
+                
+                if is_rate_limit(e):
+                    wait_time = retry_after(e) or wait_time
+                    async_loop.limiter.pause(wait_time)
+                metrics.inc("translation_api_retries_total", {"backend": backend.name})
+                batch_span.add_event("retry", {"batch.attempt": attempt + 1, "retry.wait_s": wait_time})
+                await asyncio.sleep(wait_time)
+
+def atributos_lote(backend: str, segments: Dict[str, str], refs: Dict[str, Dict],
+                   source_lang: str, target_lang: str, model: Optional[str]) -> Dict:
+    """Atributos do span de um lote"""
+    return {
+        "translation.backend": backend,
+        "translation.model": model or MODEL,
+        "translation.source_lang": source_lang,
+        "translation.target_lang": target_lang,
+        "batch.segments": len(segments),
+        "batch.refs": len(refs),
+        "batch.estimated_tokens": sum(estimate_tokens(text) for text in segments.values())
+    }
+
+# Lotes compartilhados entre jobs pequenos da fila
+coalescer = RequestCoalescer(pedir_traducao_structured)
 
 def aplicar_traducoes_runs(doc: Document, traducoes: Dict[str, str]):
     """Aplica traduções preservando formatação run-a-run"""
@@ -218,117 +269,349 @@ def carregar_checkpoint(checkpoint_path: pathlib.Path) -> Dict[str, str]:
                     continue
     return traducoes
 
-def translate_docx_professional(
-    input_path: str, 
-    output_path: str, 
-    source_lang: str, 
-    target_lang: str
-) -> TranslationResult:
+def checkpoint_path_for(job_id: str, filename: str, target_lang: Optional[str] = None) -> pathlib.Path:
+    """Checkpoint de um arquivo dentro de um job (evita colisão entre jobs e idiomas)"""
+    suffix = f"_{target_lang}" if target_lang else ""
+    return CHECKPOINT_DIR / f"{job_id}_{pathlib.Path(filename).stem}{suffix}_runs.jsonl"
+
+def traduzir_pendentes(
+    pendentes: List[Dict],
+    source_lang: str,
+    target_lang: str,
+    model: Optional[str],
+    checkpoint_path: pathlib.Path,
+    coalesce: bool = False,
+    on_lote: Optional[Callable[[Dict[str, str], int, int, int], None]] = None
+) -> Tuple[Dict[str, str], List[str]]:
     """
-    Tradução profissional de DOCX seguindo orientações oficiais OpenAI
+    Traduz runs pendentes em lotes, gravando o checkpoint a cada lote
+    
+    Com coalesce, volumes pequenos vão para um lote compartilhado com outros
+    jobs. on_lote recebe (traduções do lote, tokens do lote, lote atual,
+    total de lotes). Retorna (traduções, erros dos lotes que falharam).
+    Levanta JobCancelled entre lotes se o job do contexto foi cancelado.
+    """
+    traducoes: Dict[str, str] = {}
+    errors: List[str] = []
+    tokens_pendentes = sum(estimate_tokens(r["text"]) for r in pendentes)
+    check_cancelled()
+    
+    # Documento pequeno: lote compartilhado com outros jobs
+    if coalesce and tokens_pendentes <= COALESCE_MAX_JOB_TOKENS:
+        logger.info(f"Agrupando {len(pendentes)} runs (~{tokens_pendentes} tokens) com outros jobs ({target_lang})")
+        traducoes_lote, erros_lote = coalescer.translate(pendentes, source_lang, target_lang, model or MODEL)
+        traducoes.update(traducoes_lote)
+        errors.extend(erros_lote)
+        if traducoes_lote:
+            salvar_checkpoint(checkpoint_path, traducoes_lote)
+        if on_lote:
+            on_lote(traducoes_lote, tokens_pendentes, 1, 1)
+        return traducoes, errors
+    
+    # Processar em lotes
+    lotes = montar_lotes(pendentes, BATCH_TOKEN_BUDGET)
+    logger.info(f"Processando {len(pendentes)} runs em {len(lotes)} lotes ({target_lang})")
+    
+    if TRANSLATION_ASYNC and len(lotes) > 1:
+        # Todos os lotes de uma vez no loop assíncrono; checkpoint e progresso aqui, na ordem de conclusão
+        futures = {async_loop.submit(pedir_traducao_async(lote, target_lang, source_lang, model)): (i, lote)
+                   for i, lote in enumerate(lotes)}
+        try:
+            for concluidos, future in enumerate(as_completed(futures), 1):
+                check_cancelled()
+                i, lote = futures[future]
+                try:
+                    traducoes_lote = future.result()
+                except Exception as e:
+                    error_msg = f"Erro no lote {i+1} ({target_lang}): {e}"
+                    logger.error(error_msg)
+                    errors.append(error_msg)
+                    continue
+                traducoes.update(traducoes_lote)
+                salvar_checkpoint(checkpoint_path, traducoes_lote)
+                if on_lote:
+                    on_lote(traducoes_lote, sum(estimate_tokens(item["text"]) for item in lote), concluidos, len(lotes))
+        finally:
+            # Falha aqui (checkpoint, progresso): não deixar lotes órfãos no loop
+            for future in futures:
+                future.cancel()
+        return traducoes, errors
+    
+    for i, lote in enumerate(tqdm(lotes, desc=f"Traduzindo lotes ({target_lang})")):
+        check_cancelled()
+        try:
+            logger.info(f"Traduzindo lote {i+1}/{len(lotes)} ({len(lote)} runs) para {target_lang}")
+            traducoes_lote = pedir_traducao_structured(lote, target_lang, source_lang, model)
+            traducoes.update(traducoes_lote)
+            
+            # Salvar checkpoint
+            salvar_checkpoint(checkpoint_path, traducoes_lote)
+            
+            if on_lote:
+                on_lote(traducoes_lote, sum(estimate_tokens(item["text"]) for item in lote), i + 1, len(lotes))
+            
+        except Exception as e:
+            error_msg = f"Erro no lote {i+1} ({target_lang}): {e}"
+            logger.error(error_msg)
+            errors.append(error_msg)
+            continue
+    
+    return traducoes, errors
+
+def consultar_memoria(pendentes: List[Dict], source_lang: str, target_lang: str,
+                      client_id: Optional[str] = None) -> Tuple[Dict[str, str], List[Dict]]:
+    """
+    Consulta a memória de tradução do cliente para os runs pendentes
+    
+    Retorna (traduções prontas, runs que ainda vão ao modelo). Trechos
+    iguais ou que diferem só em números são resolvidos direto; os apenas
+    semelhantes seguem com a tradução anterior em "ref" (referência no prompt).
+    """
+    prontas: Dict[str, str] = {}
+    restantes: List[Dict] = []
+    referencias = 0
+    for r in pendentes:
+        match = translation_memory.lookup(source_lang, target_lang, r["text"], client_id)
+        traducao = translation_memory.reuse(r["text"], match) if match else None
+        if traducao is not None:
+            prontas[r["id"]] = traducao
+        elif match:
+            restantes.append({**r, "ref": {"source": match.source, "translation": match.translation}})
+            referencias += 1
+        else:
+            restantes.append(r)
+    if pendentes:
+        resultados = {"hit": len(prontas), "hint": referencias, "miss": len(restantes) - referencias}
+        for resultado, quantidade in resultados.items():
+            if quantidade:
+                metrics.inc("cache_requests_total", {"cache": "translation_memory", "result": resultado}, quantidade)
+    if prontas or referencias:
+        logger.info(f"Memória de tradução ({target_lang}): {len(prontas)} runs reaproveitados, "
+                    f"{referencias} com referência")
+    return prontas, restantes
+
+def estimate_revision(input_path: str, previous: Dict[str, str]) -> Dict[str, int]:
+    """Segmentos e tokens de um DOCX que não constam da versão anterior (o que irá ao modelo)"""
+    doc = Document(input_path)
+    runs = [{"id": run_id, "text": run.text.strip()} for _, _, _, run, run_id in iter_runs_everywhere(doc)]
+    unicos, grupos = unique_segments(runs)
+    novos = [r for r in unicos if r["text"] not in previous]
+    return {
+        "segments": sum(len(grupos[r["id"]]) for r in novos),
+        "tokens": sum(estimate_tokens(r["text"]) for r in novos)
+    }
+
+def translate_docx_multi(
+    input_path: str,
+    output_paths: Dict[str, str],
+    source_lang: str,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    checkpoint_paths: Optional[Dict[str, str]] = None,
+    model: Optional[str] = None,
+    coalesce: bool = False,
+    previous: Optional[Dict[str, Dict[str, str]]] = None,
+    client_id: Optional[str] = None
+) -> Dict[str, TranslationResult]:
+    """
+    Tradução de um DOCX para vários idiomas de destino (um arquivo por idioma)
+    
+    Leitura do documento, coleta de runs, deduplicação e descarte de runs
+    sem texto traduzível são feitos uma vez; os lotes de cada idioma rodam
+    em paralelo. As traduções são aplicadas e salvas idioma a idioma sobre
+    o mesmo documento, restaurando o texto original dos runs sem tradução.
+    
+    progress_callback recebe a soma de todos os idiomas: (segmentos
+    concluídos, tokens concluídos, batches_done=, batches_total=).
+    previous traz, por idioma, as traduções de uma versão anterior do
+    documento (texto original → tradução): só runs novos ou alterados vão
+    ao modelo. A memória de tradução consultada e alimentada é a de
+    client_id. Retorna um TranslationResult por idioma.
     """
     start_time = time.time()
-    errors = []
-    warnings = []
+    target_langs = list(output_paths)
+    checkpoint_paths = checkpoint_paths or {}
+    previous = previous or {}
+    stage_times = {"parse": 0.0, "collect": 0.0, "translate": 0.0, "apply": 0.0, "save": 0.0}
     
     try:
-        # Paths
         input_path_obj = pathlib.Path(input_path)
-        output_path_obj = pathlib.Path(output_path)
-        checkpoint_path = pathlib.Path(".checkpoints") / f"{input_path_obj.stem}_runs.jsonl"
         
-        # Carregar documento
+        # Carregar documento (uma vez para todos os idiomas)
         logger.info(f"Carregando documento: {input_path}")
+        mark = time.perf_counter()
         doc = Document(input_path)
+        stage_times["parse"] = time.perf_counter() - mark
         
-        # Coletar runs para tradução
-        runs = coletar_runs(doc)
-        if not runs:
-            warnings.append("Nenhum texto encontrado para traduzir")
-            doc.save(output_path)
-            return TranslationResult(
-                success=True,
-                translated_segments=0,
-                processing_time=time.time() - start_time,
-                errors=errors,
-                warnings=warnings
-            )
-        
-        logger.info(f"Encontrados {len(runs)} runs de texto para traduzir")
+        # Runs com referência direta: aplicar um idioma não altera a coleta dos demais
+        mark = time.perf_counter()
+        run_refs = [(run_id, run, run.text) for _, _, _, run, run_id in iter_runs_everywhere(doc)]
+        runs = [{"id": run_id, "text": original.strip()} for run_id, _, original in run_refs]
+        unicos, grupos = unique_segments(runs)
+        stage_times["collect"] = time.perf_counter() - mark
+        if runs:
+            logger.info(f"Encontrados {len(runs)} runs de texto ({len(unicos)} únicos traduzíveis) "
+                        f"para {len(target_langs)} idioma(s)")
+    except Exception as e:
+        error_msg = f"Erro fatal na tradução: {e}"
+        logger.error(error_msg)
+        return {lang: TranslationResult(success=False, translated_segments=0,
+                                        processing_time=time.time() - start_time,
+                                        errors=[error_msg], warnings=[])
+                for lang in target_langs}
+    
+    # Progresso somado entre idiomas
+    progress_lock = threading.Lock()
+    progress = {lang: {"segments": 0, "tokens": 0, "batches": 0, "batches_total": 0} for lang in target_langs}
+    
+    def report(lang: str, segments: int, tokens: int, batches: int = None, batches_total: int = None):
+        with progress_lock:
+            state = progress[lang]
+            state["segments"] += segments
+            state["tokens"] += tokens
+            if batches is not None:
+                state["batches"], state["batches_total"] = batches, batches_total
+            totals = {k: sum(p[k] for p in progress.values()) for k in state}
+        if progress_callback:
+            progress_callback(totals["segments"], totals["tokens"],
+                              batches_done=totals["batches"], batches_total=totals["batches_total"])
+    
+    def ocorrencias(traducoes: Dict[str, str]) -> int:
+        return sum(len(grupos.get(rep_id, [rep_id])) for rep_id in traducoes)
+    
+    def translate_lang(lang: str) -> Tuple[Dict[str, str], List[str], Optional[str], Dict[str, int]]:
+        """Traduções (por representante), erros, checkpoint e runs reaproveitados (revisão, memória)"""
+        checkpoint_path = pathlib.Path(checkpoint_paths[lang]) if checkpoint_paths.get(lang) \
+            else CHECKPOINT_DIR / f"{input_path_obj.stem}_{lang}_runs.jsonl"
         
         # Carregar checkpoint se existir
-        traducoes_existentes = carregar_checkpoint(checkpoint_path)
-        runs_pendentes = [r for r in runs if r["id"] not in traducoes_existentes]
+        existentes = carregar_checkpoint(checkpoint_path)
+        traducoes = {r["id"]: existentes[r["id"]] for r in unicos if r["id"] in existentes}
+        pendentes = [r for r in unicos if r["id"] not in existentes]
+        if traducoes:
+            logger.info(f"Carregados {len(traducoes)} runs do checkpoint ({lang})")
+            report(lang, ocorrencias(traducoes), sum(estimate_tokens(r["text"]) for r in unicos if r["id"] in traducoes))
         
-        if traducoes_existentes:
-            logger.info(f"Carregados {len(traducoes_existentes)} runs do checkpoint")
+        # Versão anterior do documento: runs com o mesmo texto não vão ao modelo
+        anterior = previous.get(lang) or {}
+        reaproveitadas = {r["id"]: anterior[r["text"]] for r in pendentes if r["text"] in anterior}
+        if reaproveitadas:
+            logger.info(f"Reaproveitados {len(reaproveitadas)} runs da versão anterior; "
+                        f"{len(pendentes) - len(reaproveitadas)} novos ou alterados ({lang})")
+            report(lang, ocorrencias(reaproveitadas),
+                   sum(estimate_tokens(r["text"]) for r in pendentes if r["id"] in reaproveitadas))
+            traducoes.update(reaproveitadas)
+            pendentes = [r for r in pendentes if r["id"] not in reaproveitadas]
         
-        if not runs_pendentes:
-            logger.info("Todas as traduções já existem no checkpoint")
-            aplicar_traducoes_runs(doc, traducoes_existentes)
-            doc.save(output_path)
-            return TranslationResult(
-                success=True,
-                translated_segments=len(runs),
-                processing_time=time.time() - start_time,
-                errors=errors,
-                warnings=warnings,
-                checkpoint_path=str(checkpoint_path)
-            )
+        # Memória de tradução: trechos iguais ou quase iguais de outros documentos
+        memoria, pendentes = consultar_memoria(pendentes, source_lang, lang, client_id) if pendentes else ({}, pendentes)
+        if memoria:
+            report(lang, ocorrencias(memoria), sum(estimate_tokens(r["text"]) for r in unicos if r["id"] in memoria))
+            traducoes.update(memoria)
+        reaproveitados = {"revision": len(reaproveitadas), "memory": len(memoria)}
+        for origem, quantidade in reaproveitados.items():
+            if quantidade:
+                metrics.inc("translation_segments_reused_total", {"source": origem}, quantidade)
+        if not pendentes:
+            return traducoes, [], str(checkpoint_path), reaproveitados
         
-        # Processar em lotes
-        lotes = montar_lotes(runs_pendentes, BATCH_TOKEN_BUDGET)
-        logger.info(f"Processando {len(runs_pendentes)} runs em {len(lotes)} lotes")
+        def on_lote(traducoes_lote: Dict[str, str], tokens: int, lote: int, total: int):
+            report(lang, ocorrencias(traducoes_lote), tokens, lote, total)
         
-        traducoes_completas = traducoes_existentes.copy()
+        novas, errors = traduzir_pendentes(pendentes, source_lang, lang, model, checkpoint_path, coalesce, on_lote)
+        traducoes.update(novas)
+        translation_memory.add(source_lang, lang, {r["text"]: novas[r["id"]] for r in pendentes if r["id"] in novas},
+                               client_id)
+        return traducoes, errors, str(checkpoint_path), reaproveitados
+    
+    results: Dict[str, TranslationResult] = {}
+    meters = {lang: UsageMeter() for lang in target_langs}
+    with ThreadPoolExecutor(max_workers=max(1, len(target_langs)), thread_name_prefix="docx-lang") as executor:
+        futures = {lang: executor.submit(contextvars.copy_context().run, run_metered, meters[lang], translate_lang, lang)
+                   for lang in target_langs}
         
-        for i, lote in enumerate(tqdm(lotes, desc="Traduzindo lotes")):
+        # Aplicar e salvar um idioma por vez (o documento é compartilhado)
+        for lang in target_langs:
+            warnings = [] if runs else ["Nenhum texto encontrado para traduzir"]
             try:
-                logger.info(f"Traduzindo lote {i+1}/{len(lotes)} ({len(lote)} runs)")
-                traducoes_lote = pedir_traducao_structured(lote, target_lang, source_lang)
-                traducoes_completas.update(traducoes_lote)
+                mark = time.perf_counter()
+                traducoes, errors, checkpoint_path, reused = futures[lang].result()
+                stage_times["translate"] += time.perf_counter() - mark
                 
-                # Salvar checkpoint
-                salvar_checkpoint(checkpoint_path, traducoes_lote)
+                logger.info(f"Aplicando traduções ao documento ({lang})...")
+                mark = time.perf_counter()
+                completas = expand_translations(traducoes, grupos)
+                for run_id, run, original in run_refs:
+                    run.text = completas.get(run_id, original)
+                stage_times["apply"] += time.perf_counter() - mark
+                
+                # Salvar documento final
+                output_path_obj = pathlib.Path(output_paths[lang])
+                garantir_diretorio(output_path_obj)
+                mark = time.perf_counter()
+                doc.save(str(output_path_obj))
+                stage_times["save"] += time.perf_counter() - mark
                 
+                # Runs sem texto traduzível contam como concluídos
+                sem_traducao = sum(len(ids) for rep_id, ids in grupos.items() if rep_id not in traducoes)
+                results[lang] = TranslationResult(
+                    success=True,
+                    translated_segments=len(runs) - sem_traducao,
+                    processing_time=time.time() - start_time,
+                    errors=errors,
+                    warnings=warnings,
+                    checkpoint_path=checkpoint_path,
+                    translation_memory={r["text"]: traducoes[r["id"]] for r in unicos if r["id"] in traducoes},
+                    reused_segments=reused["revision"],
+                    memory_segments=reused["memory"],
+                    stage_times=stage_times,
+                    usage=usage_summary(meters[lang].by_model())
+                )
             except Exception as e:
-                error_msg = f"Erro no lote {i+1}: {e}"
+                error_msg = f"Erro fatal na tradução ({lang}): {e}"
                 logger.error(error_msg)
-                errors.append(error_msg)
-                continue
-        
-        # Aplicar todas as traduções
-        logger.info("Aplicando traduções ao documento...")
-        aplicar_traducoes_runs(doc, traducoes_completas)
-        
-        # Salvar documento final
-        garantir_diretorio(output_path_obj)
-        doc.save(output_path)
-        
-        processing_time = time.time() - start_time
-        logger.info(f"Tradução concluída em {processing_time:.2f}s")
-        
-        return TranslationResult(
-            success=True,
-            translated_segments=len(traducoes_completas),
-            processing_time=processing_time,
-            errors=errors,
-            warnings=warnings,
-            checkpoint_path=str(checkpoint_path)
-        )
-        
-    except Exception as e:
-        error_msg = f"Erro fatal na tradução: {e}"
-        logger.error(error_msg)
-        errors.append(error_msg)
-        
-        return TranslationResult(
-            success=False,
-            translated_segments=0,
-            processing_time=time.time() - start_time,
-            errors=errors,
-            warnings=warnings
-        )
+                results[lang] = TranslationResult(
+                    success=False,
+                    translated_segments=0,
+                    processing_time=time.time() - start_time,
+                    errors=[error_msg],
+                    warnings=warnings,
+                    usage=usage_summary(meters[lang].by_model())
+                )
+    
+    logger.info(f"Tradução concluída em {time.time() - start_time:.2f}s ({', '.join(target_langs)})")
+    return results
+
+def translate_docx_professional(
+    input_path: str, 
+    output_path: str, 
+    source_lang: str, 
+    target_lang: str,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    checkpoint_path: Optional[str] = None,
+    model: Optional[str] = None,
+    coalesce: bool = False
+) -> TranslationResult:
+    """
+    Tradução profissional de DOCX seguindo orientações oficiais OpenAI
+    
+    progress_callback recebe (segmentos concluídos, tokens concluídos, batches_done=,
+    batches_total=) após cada lote.
+    Se o checkpoint_path já tiver lotes traduzidos (execução interrompida),
+    apenas os runs restantes são enviados ao modelo. Com coalesce, documentos
+    pequenos compartilham lotes com outros jobs do mesmo par de idiomas.
+    Textos repetidos são traduzidos uma vez e runs sem letras (números,
+    pontuação), URLs e e-mails são mantidos como no original.
+    """
+    checkpoint_path = checkpoint_path or str(CHECKPOINT_DIR / f"{pathlib.Path(input_path).stem}_runs.jsonl")
+    return translate_docx_multi(
+        input_path,
+        {target_lang: output_path},
+        source_lang,
+        progress_callback,
+        {target_lang: checkpoint_path},
+        model,
+        coalesce
+    )[target_lang]
 
 if __name__ == "__main__":
     if len(sys.argv) < 4:
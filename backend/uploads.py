@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Recebimento de uploads em streaming
+
+Os arquivos são gravados em disco bloco a bloco, com o limite de tamanho
+verificado a cada bloco e o SHA-256 calculado durante a cópia, sem manter
+o arquivo inteiro em memória. A validação de tipo usa apenas os bytes
+iniciais e o diretório central do zip OOXML.
+"""
+
+import os
+import hashlib
+import zipfile
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+import magic
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+HEADER_BYTES = 8192
+
+# Tipos permitidos
+ALLOWED_MIME_TYPES = {
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation': '.pptx',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': '.xlsx'
+}
+
+# Pelos bytes iniciais o libmagic às vezes só reconhece o zip
+ZIP_MIME_TYPES = {'application/zip', 'application/x-zip-compressed', 'application/octet-stream'}
+
+# Parte obrigatória de cada formato OOXML
+OOXML_MAIN_PARTS = {
+    '.docx': 'word/document.xml',
+    '.pptx': 'ppt/presentation.xml',
+    '.xlsx': 'xl/workbook.xml'
+}
+
+def safe_filename(filename: str) -> str:
+    """Nome do arquivo sem componentes de diretório"""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if name in ("", ".", ".."):
+        raise HTTPException(status_code=400, detail=f"Nome de arquivo inválido: {filename}")
+    return name
+
+async def save_upload(file: UploadFile, dest: Path, max_bytes: int, total_limit_mb: Optional[int] = None) -> Dict:
+    """
+    Grava o upload em dest, em blocos
+
+    Levanta 413 assim que o total passar de max_bytes (o arquivo parcial é
+    removido). Quando max_bytes é o que resta de um limite total do envio
+    (MAX_UPLOAD_MB), total_limit_mb é esse limite, informado na mensagem.
+    Hash e gravação de cada bloco rodam no threadpool, fora do event loop.
+    Retorna {"size", "sha256", "header"}.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    header = b""
+
+    try:
+        with open(dest, "wb") as out:
+            def consume(chunk: bytes):
+                sha256.update(chunk)
+                out.write(chunk)
+
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Tamanho total dos arquivos excede o limite de {total_limit_mb}MB"
+                        if total_limit_mb is not None
+                        else f"Tamanho de {file.filename} excede o limite de {max_bytes // (1024 * 1024)}MB"
+                    )
+
+                if len(header) < HEADER_BYTES:
+                    header += chunk[:HEADER_BYTES - len(header)]
+                await run_in_threadpool(consume, chunk)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+
+    return {"size": size, "sha256": sha256.hexdigest(), "header": header}
+
+async def hash_upload(file: Optional[UploadFile]) -> str:
+    """SHA-256 de um upload que não precisa ser gravado (ex.: glossário); "" se ausente"""
+    if file is None or not file.filename:
+        return ""
+    sha256 = hashlib.sha256()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+def validate_file_type(header: bytes, path: Path, filename: str) -> bool:
+    """
+    Valida tipo do arquivo pelos bytes iniciais e pelo diretório central do zip
+
+    Apenas a lista de partes do pacote é lida; o conteúdo não é descompactado.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    main_part = OOXML_MAIN_PARTS.get(ext)
+    if not main_part:
+        return False
+
+    try:
+        mime_type = magic.from_buffer(header, mime=True)
+        if mime_type not in ALLOWED_MIME_TYPES and mime_type not in ZIP_MIME_TYPES:
+            return False
+        if ALLOWED_MIME_TYPES.get(mime_type, ext) != ext:
+            return False
+    except Exception as e:
+        logger.warning(f"Erro na validação: {e}")
+
+    try:
+        with zipfile.ZipFile(path) as z:
+            names = set(z.namelist())
+    except zipfile.BadZipFile:
+        return False
+
+    return '[Content_Types].xml' in names and main_part in names
@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from translation_backends import Usage, match_model
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Preço por milhão de tokens (entrada, entrada em cache, saída), em USD
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "o4-mini": (1.10, 0.275, 4.40),
+}
+# Preços adicionais ou corrigidos: {"modelo": [entrada, cache, saída]}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("MODEL_PRICES", "{}")).items()})
+# Documentos mais caros listados no relatório
+USAGE_REPORT_TOP_N = int(os.getenv("USAGE_REPORT_TOP_N", "10"))
+
+USAGE_FIELDS = ("requests", "prompt_tokens", "cached_tokens", "completion_tokens")
+
+def model_prices(model: str) -> Optional[Tuple[float, float, float]]:
+    """Preços do modelo; versões datadas (gpt-5-2025-08-07) usam o nome base mais longo que casar"""
+    name = match_model(model, MODEL_PRICES)
+    return MODEL_PRICES[name] if name else None
+
+def usage_cost(model: str, usage: Usage) -> Optional[float]:
+    """Custo em USD (tokens em cache cobrados à parte) ou None se o modelo não tiver preço"""
+    prices = model_prices(model)
+    if prices is None:
+        return None
+    input_price, cached_price, output_price = prices
+    return ((usage.prompt_tokens - usage.cached_tokens) * input_price + usage.cached_tokens * cached_price
+            + usage.completion_tokens * output_price) / 1_000_000
+
+def usage_summary(by_model: Dict[str, Usage]) -> Dict:
+    """Tokens somados entre modelos e custo estimado"""
+    summary: Dict = {name: 0 for name in USAGE_FIELDS}
+    summary["cost_usd"] = 0.0
+    unpriced = []
+    for model, usage in by_model.items():
+        for name in USAGE_FIELDS:
+            summary[name] += getattr(usage, name)
+        cost = usage_cost(model, usage)
+        if cost is None:
+            unpriced.append(model)
+        else:
+            summary["cost_usd"] += cost
+    summary["cost_usd"] = round(summary["cost_usd"], 6)
+    if unpriced:
+        summary["unpriced_models"] = sorted(unpriced)
+    return summary
+
+def add_usage(total: Optional[Dict], summary: Optional[Dict]) -> Dict:
+    """Soma dois resumos de uso"""
+    result = dict(total or {name: 0 for name in USAGE_FIELDS})
+    result.setdefault("cost_usd", 0.0)
+    for name in USAGE_FIELDS:
+        result[name] = result.get(name, 0) + (summary or {}).get(name, 0)
+    result["cost_usd"] = round(result["cost_usd"] + (summary or {}).get("cost_usd", 0.0), 6)
+    unpriced = set(result.get("unpriced_models", [])) | set((summary or {}).get("unpriced_models", []))
+    if unpriced:
+        result["unpriced_models"] = sorted(unpriced)
+    return result
+
+class UsageLedger:
+    """
+    Registro do uso de tokens por documento traduzido
+
+    Cada documento (fila ou /api/translate) vira uma linha em
+    data/usage/usage-<AAAA-MM>.jsonl, com cliente, job, idiomas, tokens e
+    custo. Os jobs expiram da fila em 48 horas; o registro fica para os
+    relatórios por cliente. Escrita em append com lock entre processos.
+    """
+
+    def __init__(self, usage_dir: str = "data/usage"):
+        self.usage_dir = Path(usage_dir)
+        self.usage_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _month_file(self, timestamp: float) -> Path:
+        return self.usage_dir / f"usage-{time.strftime('%Y-%m', time.gmtime(timestamp))}.jsonl"
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.usage_dir / ".lock", 'a') as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def record(self, client_id: str, job_id: str, filename: str, target_langs: List[str], model: str,
+               usage: Dict, segments: int = 0):
+        """Registra o uso de um documento (sem tokens consumidos, não registra)"""
+        if not usage or not (usage.get("prompt_tokens") or usage.get("completion_tokens")):
+            return
+        now = time.time()
+        entry = {"ts": round(now, 3), "client_id": client_id, "job_id": job_id, "filename": filename,
+                 "target_langs": target_langs, "model": model, "segments": segments, **usage}
+        try:
+            with self._lock, self._file_lock():
+                with open(self._month_file(now), 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"Erro ao registrar uso de tokens: {e}")
+
+    def _entries(self, since: float, until: float) -> Iterable[Dict]:
+        for path in sorted(self.usage_dir.glob("usage-*.jsonl")):
+            month = path.stem[len("usage-"):]
+            # Arquivos de meses fora do período não são lidos
+            if month < time.strftime('%Y-%m', time.gmtime(since)) or month > time.strftime('%Y-%m', time.gmtime(until)):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if since <= entry.get("ts", 0) <= until:
+                        yield entry
+
+    def report(self, since: float, until: float, client_id: Optional[str] = None,
+               top_n: int = USAGE_REPORT_TOP_N) -> Dict:
+        """
+        Uso por cliente no período e os documentos mais caros
+
+        tokens_per_segment aponta documentos que consomem muito mais do que o
+        volume de texto justificaria (prompt repetido, muitos lotes pequenos).
+        """
+        clients: Dict[str, Dict] = {}
+        documents: List[Dict] = []
+        for entry in self._entries(since, until):
+            if client_id and entry.get("client_id") != client_id:
+                continue
+            usage = {name: entry.get(name, 0) for name in USAGE_FIELDS}
+            usage["cost_usd"] = entry.get("cost_usd", 0.0)
+            if entry.get("unpriced_models"):
+                usage["unpriced_models"] = entry["unpriced_models"]
+
+            client = clients.setdefault(entry.get("client_id") or "anonimo", {"jobs": set(), "documents": 0})
+            client["jobs"].add(entry.get("job_id"))
+            client["documents"] += 1
+            client["usage"] = add_usage(client.get("usage"), usage)
+
+            tokens = usage["prompt_tokens"] + usage["completion_tokens"]
+            documents.append({
+                "client_id": entry.get("client_id"),
+                "job_id": entry.get("job_id"),
+                "filename": entry.get("filename"),
+                "target_langs": entry.get("target_langs"),
+                "model": entry.get("model"),
+                "ts": entry.get("ts"),
+                "segments": entry.get("segments", 0),
+                "tokens_per_segment": round(tokens / entry["segments"], 1) if entry.get("segments") else None,
+                **usage
+            })
+
+        report_clients = []
+        for name, client in sorted(clients.items(), key=lambda kv: kv[1]["usage"]["cost_usd"], reverse=True):
+            usage = client["usage"]
+            report_clients.append({
+                "client_id": name,
+                "jobs": len(client["jobs"]),
+                "documents": client["documents"],
+                **usage,
+                "cached_ratio": round(usage["cached_tokens"] / usage["prompt_tokens"], 4) if usage["prompt_tokens"] else 0.0
+            })
+
+        documents.sort(key=lambda d: (d["cost_usd"], d["prompt_tokens"] + d["completion_tokens"]), reverse=True)
+        total = None
+        for client in report_clients:
+            total = add_usage(total, client)
+        return {
+            "since": since,
+            "until": until,
+            "total": total or add_usage(None, None),
+            "clients": report_clients,
+            "top_documents": documents[:top_n]
+        }
+
+# Instância global do registro de uso
+usage_ledger = UsageLedger()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+ZIP gerado sob demanda para download, sem arquivo intermediário
+
+DOCX, PPTX e XLSX já são pacotes zip comprimidos com deflate; comprimi-los
+de novo só gasta CPU. Os membros entram como STORED, com CRC e tamanho
+conhecidos de antemão, o que permite calcular o layout completo do ZIP
+(e o Content-Length) antes de enviar o primeiro byte.
+"""
+
+import time
+import struct
+import zlib
+import hashlib
+import zipfile
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+READ_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# Limites do formato ZIP sem extensões ZIP64
+ZIP_MAX_SIZE = 0xFFFFFFFF
+ZIP_MAX_MEMBERS = 0xFFFF
+
+@dataclass
+class ZipMember:
+    path: Path
+    arcname: str
+    size: int
+    crc: int
+    mtime: float
+
+def file_crc32(path: Path) -> int:
+    """CRC-32 de um arquivo, lido em blocos"""
+    crc = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xFFFFFFFF
+
+def file_digest(path: Path) -> Dict:
+    """
+    SHA-256 e CRC-32 de um arquivo numa única leitura
+    
+    Retorna {"sha256", "crc32", "size", "mtime"}; size e mtime permitem
+    reaproveitar o resultado enquanto o arquivo não mudar.
+    """
+    sha256 = hashlib.sha256()
+    crc = 0
+    path = Path(path)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            sha256.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+    stat = path.stat()
+    return {
+        "sha256": sha256.hexdigest(),
+        "crc32": crc & 0xFFFFFFFF,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime
+    }
+
+def iter_file_range(path: Path, offset: int, length: int) -> Iterator[bytes]:
+    """Bytes de um trecho do arquivo, em blocos"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise IOError(f"Arquivo encurtou durante o download: {path}")
+            remaining -= len(chunk)
+            yield chunk
+
+def zip_member(path: Path, arcname: Optional[str] = None, crc: Optional[int] = None) -> ZipMember:
+    """Descreve um arquivo como membro STORED do ZIP"""
+    path = Path(path)
+    stat = path.stat()
+    return ZipMember(
+        path=path,
+        arcname=arcname or path.name,
+        size=stat.st_size,
+        crc=file_crc32(path) if crc is None else crc,
+        mtime=stat.st_mtime
+    )
+
+def _dos_datetime(timestamp: float) -> Tuple[int, int]:
+    """Data e hora no formato MS-DOS usado pelos cabeçalhos ZIP"""
+    t = time.localtime(timestamp)
+    year = max(1980, t.tm_year)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+# Parte do ZIP: bytes prontos ou trecho de arquivo (caminho, tamanho)
+ZipPart = Union[bytes, Tuple[Path, int]]
+
+class ZipPlan:
+    """Layout de um ZIP com membros STORED, pronto para ser transmitido"""
+
+    def __init__(self, members: List[ZipMember]):
+        if len(members) > ZIP_MAX_MEMBERS:
+            raise ValueError("Arquivos demais para um ZIP sem ZIP64")
+
+        self.members = members
+        self.parts: List[ZipPart] = []
+        central = []
+        offset = 0
+
+        for member in members:
+            name = member.arcname.encode('utf-8')
+            # Bit 11: nome em UTF-8
+            flags = 0x800 if not member.arcname.isascii() else 0
+            dos_time, dos_date = _dos_datetime(member.mtime)
+
+            local_header = struct.pack(
+                '<IHHHHHIIIHH',
+                0x04034B50, 20, flags, zipfile.ZIP_STORED, dos_time, dos_date,
+                member.crc, member.size, member.size, len(name), 0
+            ) + name
+            central.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII',
+                0x02014B50, 20, 20, flags, zipfile.ZIP_STORED, dos_time, dos_date,
+                member.crc, member.size, member.size, len(name), 0, 0, 0, 0, 0, offset
+            ) + name)
+
+            self.parts.append(local_header)
+            self.parts.append((member.path, member.size))
+            offset += len(local_header) + member.size
+
+        central_directory = b"".join(central)
+        end_record = struct.pack(
+            '<IHHHHIIH',
+            0x06054B50, 0, 0, len(members), len(members), len(central_directory), offset, 0
+        )
+        self.parts.append(central_directory + end_record)
+        self.size = offset + len(central_directory) + len(end_record)
+
+        if self.size > ZIP_MAX_SIZE:
+            raise ValueError("ZIP maior que 4 GB não é suportado sem ZIP64")
+
+    def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes do ZIP no intervalo [start, end] (inclusivo), em blocos"""
+        end = self.size - 1 if end is None else min(end, self.size - 1)
+        position = 0
+
+        for part in self.parts:
+            length = len(part) if isinstance(part, bytes) else part[1]
+            part_start, part_end = position, position + length - 1
+            position += length
+
+            if part_end < start or length == 0:
+                continue
+            if part_start > end:
+                break
+
+            lo = max(start, part_start) - part_start
+            hi = min(end, part_end) - part_start + 1
+
+            if isinstance(part, bytes):
+                yield part[lo:hi]
+            else:
+                yield from iter_file_range(part[0], lo, hi - lo)
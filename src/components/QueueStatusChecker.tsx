@@ -1,8 +1,9 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Badge } from "@/components/ui/badge";
+import { Progress } from "@/components/ui/progress";
 import { Search, Download, Clock, FileText, CheckCircle, AlertCircle } from "lucide-react";
 import { useToast } from "@/hooks/use-toast";
 
@@ -19,14 +20,100 @@ interface QueueJob {
   expiresAt: number;
   downloadUrl?: string;
   error?: string;
+  progress?: {
+    segmentsDone: number;
+    segmentsTotal: number;
+    tokensDone: number;
+    tokensTotal: number;
+  } | null;
+  fileErrors?: Record<string, string>;
 }
 
+interface JobEvent {
+  type: 'status' | 'progress';
+  status: QueueJob['status'];
+  position?: number | null;
+  estimatedTime?: number | null;
+  currentFile?: string;
+  batchesDone?: number;
+  batchesTotal?: number;
+  segmentsDone?: number;
+  segmentsTotal?: number;
+  tokensDone?: number;
+  tokensTotal?: number;
+  error?: string | null;
+}
+
+// Intervalo do polling usado quando o navegador/proxy não suporta SSE
+const POLL_INTERVAL_MS = 10000;
+
 export const QueueStatusChecker = () => {
   const [jobId, setJobId] = useState('');
   const [jobInfo, setJobInfo] = useState<QueueJob | null>(null);
   const [loading, setLoading] = useState(false);
+  const [liveProgress, setLiveProgress] = useState<JobEvent | null>(null);
   const { toast } = useToast();
 
+  const isFinished = jobInfo?.status === 'completed' || jobInfo?.status === 'error';
+
+  // Acompanhar o job em tempo real via SSE, com polling como fallback
+  useEffect(() => {
+    if (!jobInfo || isFinished) return;
+
+    const id = jobInfo.id;
+    let source: EventSource | null = null;
+    let pollTimer: number | undefined;
+
+    const refresh = async () => {
+      const response = await fetch(`/api/queue/status/${id}`);
+      if (response.ok) {
+        const data: QueueJob = await response.json();
+        setJobInfo(data);
+      }
+    };
+
+    const startPolling = () => {
+      if (pollTimer === undefined) {
+        pollTimer = window.setInterval(refresh, POLL_INTERVAL_MS);
+      }
+    };
+
+    const onEvent = (message: MessageEvent) => {
+      const event: JobEvent = JSON.parse(message.data);
+      setLiveProgress((prev) => ({ ...prev, ...event }));
+
+      if (event.status === 'completed' || event.status === 'error') {
+        source?.close();
+        // Estado final completo (arquivos traduzidos e link de download)
+        refresh();
+      } else {
+        setJobInfo((prev) => prev && {
+          ...prev,
+          status: event.status,
+          position: event.position ?? prev.position,
+          estimatedTime: event.estimatedTime ?? prev.estimatedTime,
+        });
+      }
+    };
+
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+    } else {
+      source = new EventSource(`/api/queue/events/${id}`);
+      source.addEventListener('status', onEvent as EventListener);
+      source.addEventListener('progress', onEvent as EventListener);
+      source.onerror = () => {
+        source?.close();
+        startPolling();
+      };
+    }
+
+    return () => {
+      source?.close();
+      if (pollTimer !== undefined) window.clearInterval(pollTimer);
+    };
+  }, [jobInfo?.id, isFinished]);
+
   const checkStatus = async () => {
     if (!jobId.trim()) {
       toast({
@@ -55,6 +142,7 @@ export const QueueStatusChecker = () => {
       }
 
       const data = await response.json();
+      setLiveProgress(null);
       setJobInfo(data);
     } catch (error) {
       toast({
@@ -70,8 +158,9 @@ export const QueueStatusChecker = () => {
   const downloadFile = () => {
     if (jobInfo?.downloadUrl) {
       const a = document.createElement('a');
-      a.href = jobInfo.downloadUrl;
-      a.download = `traducao_${jobInfo.id}.zip`;
+      // Arquivo único sem ZIP (format=file); o nome vem do Content-Disposition
+      a.href = jobInfo.translatedFiles?.length === 1 ? `${jobInfo.downloadUrl}?format=file` : jobInfo.downloadUrl;
+      a.download = '';
       document.body.appendChild(a);
       a.click();
       document.body.removeChild(a);
@@ -185,6 +274,25 @@ export const QueueStatusChecker = () => {
               </div>
             </div>
 
+            {jobInfo.status === 'processing' && (() => {
+              const done = liveProgress?.tokensDone ?? jobInfo.progress?.tokensDone ?? 0;
+              const total = liveProgress?.tokensTotal || jobInfo.progress?.tokensTotal || 0;
+              const percent = total > 0 ? Math.min(100, Math.round((done / total) * 100)) : 0;
+              return (
+                <div className="space-y-2">
+                  <Progress value={percent} />
+                  <div className="flex justify-between text-xs text-muted-foreground">
+                    <span>
+                      {liveProgress?.currentFile ? `${liveProgress.currentFile} · ` : ''}
+                      {liveProgress?.batchesTotal ? `Lote ${liveProgress.batchesDone}/${liveProgress.batchesTotal} · ` : ''}
+                      {liveProgress?.segmentsDone ?? jobInfo.progress?.segmentsDone ?? 0} segmentos
+                    </span>
+                    <span>{percent}%</span>
+                  </div>
+                </div>
+              );
+            })()}
+
             {jobInfo.originalFiles.length > 0 && (
               <div className="space-y-2">
                 <h4 className="font-medium">Arquivos</h4>
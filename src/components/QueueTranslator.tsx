@@ -2,7 +2,8 @@ import React, { useState, useCallback } from 'react';
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
-import { Sparkles, ArrowRight, Clock, Users, Copy } from "lucide-react";
+import { Progress } from "@/components/ui/progress";
+import { Sparkles, ArrowRight, Clock, Users, Copy, Download } from "lucide-react";
 import { LanguageSelector } from "@/components/LanguageSelector";
 import { DocumentUpload } from "@/components/DocumentUpload";
 import { useToast } from "@/hooks/use-toast";
@@ -18,6 +19,7 @@ export const QueueTranslator = () => {
     submitToQueue,
     isSubmitting,
     currentJobId,
+    jobStatus,
     resetQueue,
     estimateTime,
     formatTime,
@@ -250,6 +252,28 @@ export const QueueTranslator = () => {
               </p>
             </div>
 
+            {jobStatus && (() => {
+              const done = jobStatus.tokensDone ?? 0;
+              const total = jobStatus.tokensTotal || 0;
+              const percent = jobStatus.status === 'completed'
+                ? 100
+                : total > 0 ? Math.min(100, Math.round((done / total) * 100)) : 0;
+              return (
+                <div className="space-y-2">
+                  <Progress value={percent} />
+                  <div className="flex justify-between text-xs text-muted-foreground">
+                    <span>
+                      {jobStatus.status === 'pending' && `Na fila${jobStatus.position ? ` · posição ${jobStatus.position}` : ''}`}
+                      {jobStatus.status === 'processing' && `${jobStatus.currentFile ? `${jobStatus.currentFile} · ` : ''}${jobStatus.segmentsDone ?? 0} segmentos`}
+                      {jobStatus.status === 'completed' && 'Concluído'}
+                      {jobStatus.status === 'error' && `Erro${jobStatus.error ? `: ${jobStatus.error}` : ''}`}
+                    </span>
+                    <span>{percent}%</span>
+                  </div>
+                </div>
+              );
+            })()}
+
             <div className="text-sm text-muted-foreground space-y-1">
               <p>✅ Sua tradução foi adicionada à fila de processamento</p>
               <p>⏱️ Você receberá os arquivos traduzidos em até {formatTime(getEstimatedTime())}</p>
@@ -258,6 +282,18 @@ export const QueueTranslator = () => {
             </div>
 
             <div className="flex gap-4 pt-4">
+              {jobStatus?.status === 'completed' && jobStatus.downloadUrl && (
+                <Button asChild className="flex-1">
+                  {/* Arquivo único sem ZIP (format=file); o nome vem do Content-Disposition */}
+                  <a
+                    href={jobStatus.translatedFiles?.length === 1 ? `${jobStatus.downloadUrl}?format=file` : jobStatus.downloadUrl}
+                    download
+                  >
+                    <Download className="mr-2 h-4 w-4" />
+                    Baixar Tradução
+                  </a>
+                </Button>
+              )}
               <Button
                 variant="outline"
                 onClick={resetQueue}
@@ -106,11 +106,12 @@ export const useDocumentTranslate = () => {
         const job: TranslationJob = {
           id: data.token,
           originalFileName: Array.from(files).map(f => f.name).join(', '),
-          translatedFileName: 'documentos_traduzidos.zip',
+          translatedFileName: data.files_count === 1 ? data.files[0].translated : 'documentos_traduzidos.zip',
           sourceLang,
           targetLang,
           status: 'completed',
-          translatedFileUrl: `${API_BASE}/download/${data.token}`,
+          // Arquivo único sem ZIP (format=file); vários arquivos vêm em ZIP
+          translatedFileUrl: `${API_BASE}/download/${data.token}${data.files_count === 1 ? '?format=file' : ''}`,
           createdAt: new Date().toISOString(),
           files: data.files,
         };
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useToast } from "@/hooks/use-toast";
 
 interface QueueJobResponse {
@@ -13,11 +13,86 @@ interface FileInfo {
   size: number;
 }
 
+export interface QueueJobStatus {
+  status: 'pending' | 'processing' | 'completed' | 'error';
+  position?: number | null;
+  estimatedTime?: number | null;
+  currentFile?: string;
+  segmentsDone?: number;
+  segmentsTotal?: number;
+  tokensDone?: number;
+  tokensTotal?: number;
+  translatedFiles?: string[];
+  downloadUrl?: string;
+  error?: string | null;
+}
+
+// Intervalo do polling usado quando o navegador/proxy não suporta SSE
+const POLL_INTERVAL_MS = 10000;
+
 export const useQueueTranslation = () => {
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [currentJobId, setCurrentJobId] = useState<string | null>(null);
+  const [jobStatus, setJobStatus] = useState<QueueJobStatus | null>(null);
   const { toast } = useToast();
 
+  const isFinished = jobStatus?.status === 'completed' || jobStatus?.status === 'error';
+
+  // Acompanhar o job enviado via SSE, com polling como fallback
+  useEffect(() => {
+    if (!currentJobId || isFinished) return;
+
+    const id = currentJobId;
+    let source: EventSource | null = null;
+    let pollTimer: number | undefined;
+
+    const stop = () => {
+      source?.close();
+      if (pollTimer !== undefined) window.clearInterval(pollTimer);
+      pollTimer = undefined;
+    };
+
+    const refresh = async () => {
+      const response = await fetch(`/api/queue/status/${id}`);
+      if (response.ok) {
+        const { progress, ...data } = await response.json();
+        setJobStatus((prev) => ({ ...prev, ...progress, ...data }));
+        if (data.status === 'completed' || data.status === 'error') stop();
+      }
+    };
+
+    const startPolling = () => {
+      if (pollTimer === undefined) {
+        pollTimer = window.setInterval(refresh, POLL_INTERVAL_MS);
+      }
+    };
+
+    const onEvent = (message: MessageEvent) => {
+      const event: QueueJobStatus = JSON.parse(message.data);
+      if (event.status === 'completed' || event.status === 'error') {
+        source?.close();
+        // Estado final completo (arquivos traduzidos e link de download)
+        refresh();
+      } else {
+        setJobStatus((prev) => ({ ...prev, ...event }));
+      }
+    };
+
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+    } else {
+      source = new EventSource(`/api/queue/events/${id}`);
+      source.addEventListener('status', onEvent as EventListener);
+      source.addEventListener('progress', onEvent as EventListener);
+      source.onerror = () => {
+        source?.close();
+        startPolling();
+      };
+    }
+
+    return stop;
+  }, [currentJobId, isFinished]);
+
   const submitToQueue = async (
     files: FileList,
     sourceLang: string,
@@ -64,6 +139,7 @@ export const useQueueTranslation = () => {
 
       const result: QueueJobResponse = await response.json();
       
+      setJobStatus({ status: 'pending', position: result.position, estimatedTime: result.estimatedTime });
       setCurrentJobId(result.jobId);
       
       toast({
@@ -109,12 +185,14 @@ export const useQueueTranslation = () => {
 
   const resetQueue = () => {
     setCurrentJobId(null);
+    setJobStatus(null);
   };
 
   return {
     submitToQueue,
     isSubmitting,
     currentJobId,
+    jobStatus,
     resetQueue,
     estimateTime,
     formatTime,